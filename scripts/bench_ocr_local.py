@@ -0,0 +1,132 @@
+"""
+Micro-benchmark del tier OCR local (EasyOCR) sobre los captchas etiquetados de data/dataset/.
+
+Compara modos de evaluación (sección `ocr:` del YAML) sobre las mismas imágenes y reporta
+latencia por captcha (media/p50/p95) y acierto contra la etiqueta del dataset.
+El modelo se carga una vez antes de medir, así no ensucia el primer captcha.
+
+Uso:
+    python scripts/bench_ocr_local.py                 # todos los modos, todo el dataset
+    python scripts/bench_ocr_local.py --limit 50 --modos secuencial lote
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.captcha_breaker import CaptchaBreaker, CaptchaImagen
+from src.utils.dataset_writer import captchas_etiquetados
+from src.utils.ocr_stats import StrategyStats
+
+# Modo → overrides de `ocr:` que se aplican sobre una configuración base todo-apagado
+MODOS = {
+    "secuencial": {"easyocr_batched": False},
+    "lote": {"easyocr_batched": True},
+    "reconocedor": {"easyocr_batched": True, "recognizer_fast_path": True},
+    "corte_temprano": {"early_exit": {"enabled": True, "quorum": 3, "high_conf": 0.9}},
+    "pool": {"pool": {"enabled": True}},
+}
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir_modo(breaker, captchas, overrides):
+    breaker.ocr_cfg = {**{k: False for m in MODOS.values() for k in m}, **overrides}
+    breaker.stats_easyocr = {"rapido": 0, "completo": 0}
+    # Historial en memoria: cada modo aprende desde cero y no toca data/ocr_estrategias.json
+    breaker.estrategias = StrategyStats(None)
+    if breaker._usar_pool():
+        breaker._obtener_pool().calentar()  # la carga de modelos de los procesos no cuenta
+    latencias, aciertos = [], 0
+    for path, etiqueta in captchas:
+        captcha = CaptchaImagen(path)
+        t0 = time.perf_counter()
+        lectura = breaker.solve_with_easyocr(captcha)
+        latencias.append(time.perf_counter() - t0)
+        aciertos += lectura == etiqueta
+        # La etiqueta hace de veredicto del portal para el orden aprendido del corte temprano
+        breaker.puntuar_estrategias(captcha.sha256, etiqueta)
+    return {
+        "captchas": len(captchas),
+        "acierto": round(aciertos / len(captchas), 3),
+        "latencia_s": {
+            "media": round(sum(latencias) / len(latencias), 3),
+            "p50": round(_percentil(latencias, 50), 3),
+            "p95": round(_percentil(latencias, 95), 3),
+        },
+        "caminos": dict(breaker.stats_easyocr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark del OCR local sobre data/dataset/")
+    parser.add_argument("--dataset", default=os.path.join(project_root, "data", "dataset"))
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=list(MODOS))
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    captchas = captchas_etiquetados(args.dataset, args.limit)
+    if not captchas:
+        print(f"No hay captchas etiquetados en {args.dataset}")
+        sys.exit(1)
+
+    # Aislado del estado de producción: sin granja Gemini, sin memo ni dataset precargados de
+    # data/dataset y con el historial de estrategias en una carpeta temporal
+    tmp_dir = tempfile.mkdtemp(prefix="bench_ocr_")
+    breaker = CaptchaBreaker(
+        warmup=False,
+        ocr_config={
+            "dataset": {"enabled": False},
+            "memo": {"enabled": False},
+            "early_exit": {"stats_path": os.path.join(tmp_dir, "ocr_estrategias.json")},
+        },
+        gemini_config={"enabled": False},
+    )
+    t0 = time.perf_counter()
+    _ = breaker.reader
+    print(f"EasyOCR cargado en {time.perf_counter() - t0:.1f}s. Midiendo {len(captchas)} captchas...\n")
+
+    resultados = {}
+    print(f"{'Modo':<14} {'acierto':>8} {'media':>8} {'p50':>8} {'p95':>8}")
+    print("-" * 50)
+    for modo in args.modos:
+        r = medir_modo(breaker, captchas, MODOS[modo])
+        resultados[modo] = r
+        lat = r["latencia_s"]
+        print(f"{modo:<14} {r['acierto']:>8.1%} {lat['media']:>8.3f} {lat['p50']:>8.3f} {lat['p95']:>8.3f}  {r['caminos']}")
+    breaker.cerrar()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Deltas contra el primer modo medido (la línea base)
+    base = resultados[args.modos[0]]
+    for modo, r in resultados.items():
+        r["delta_vs_" + args.modos[0]] = {
+            "acierto": round(r["acierto"] - base["acierto"], 3),
+            "latencia_media": round(r["latencia_s"]["media"] / base["latencia_s"]["media"], 3)
+            if base["latencia_s"]["media"] else None,
+        }
+
+    salida = args.out or os.path.join(
+        project_root, "benchmarks", "results", f"ocr_local_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump({"dataset": args.dataset, "modos": resultados}, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados: {salida}")
+
+
+if __name__ == "__main__":
+    main()
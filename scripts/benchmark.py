@@ -0,0 +1,234 @@
+"""
+Benchmark end-to-end del scraper contra el portal simulado (src/mock_portal.py).
+
+Genera un Excel sintético con formato SIAC (Chasis + Nro.Fabr.) de N VINs, corre DnpraScraper
+(o el WorkerPool con --workers) completo contra el portal local y guarda un JSON con:
+VINs/hora, p50/p95 de latencia por VIN, RSS de Chrome y del proceso, porcentaje del tiempo en OCR
+y tiempo de guardado del Excel. Sirve para comparar commits y configuraciones.
+
+Uso:
+    python scripts/benchmark.py --vins 100
+    python scripts/benchmark.py --vins 1000 --workers 3 --profile lean --engine http --label lean_http
+    python scripts/benchmark.py --vins 100 --latency-ms 300 1500 --error-rate 0.02
+    python scripts/benchmark.py --vins 100 --gemini --label con_gemini   # gasta cuota real de la granja
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.mock_portal import MockPortal
+from src.utils import tracing
+from src.utils.config_loader import load_config
+
+try:
+    import psutil
+except ImportError:  # Opcional: sólo para medir la RAM del proceso
+    psutil = None
+
+BENCH_DIR = os.path.join(project_root, "benchmarks")
+_VIN_CHARS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+_PREFIJOS = ("9BRK4AAG", "8AJBA3CD", "9BRKZAAG", "8AJCB3DB", "9BRB43BE")
+
+
+def generar_excel(path, n, seed=0):
+    """Excel sintético estilo SIAC: VINs de 17 caracteres y Nro.Fabr. con ~1/3 de importados."""
+    rnd = random.Random(seed)
+    vins, fabr = [], []
+    for i in range(n):
+        vin = rnd.choice(_PREFIJOS) + "".join(rnd.choice(_VIN_CHARS) for _ in range(3)) + f"{i:06d}"
+        vins.append(vin)
+        fabr.append(f"TPA{'2' if rnd.random() < 0.33 else '1'}{rnd.randrange(10000):04d}")
+    pd.DataFrame({
+        "Nro.Recepción": range(1, n + 1),
+        "Chasis": vins,
+        "Nro.Fabr.": fabr,
+        "Marca": rnd.choices(["TOYOTA", "FIAT", "CHEVROLET"], k=n),
+    }).to_excel(path, index=False)
+    return vins
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _p(valores, p):
+    return round(tracing._percentil(sorted(valores), p), 3) if valores else None
+
+
+def medir(registros, segundos, tiempos_guardado, rss_proceso_mb):
+    """Métricas del benchmark a partir de las trazas por intento de la corrida."""
+    por_vin = {}
+    ocr_s = 0.0
+    total_s = 0.0
+    rss_chrome = []
+    for r in registros:
+        por_vin[r["vin"]] = por_vin.get(r["vin"], 0.0) + r.get("total_s", 0.0)
+        total_s += r.get("total_s", 0.0)
+        ocr_s += sum(v for k, v in r.get("etapas", {}).items() if k.startswith("ocr."))
+        if r.get("chrome_rss_mb") is not None:
+            rss_chrome.append(r["chrome_rss_mb"])
+
+    resumen = tracing.resumir(registros)
+    latencias = list(por_vin.values())
+    return {
+        "vins": len(por_vin),
+        "intentos": len(registros),
+        "segundos": round(segundos, 1),
+        "vins_hora": round(len(por_vin) * 3600 / segundos, 1) if segundos > 0 else 0.0,
+        "latencia_vin_s": {"p50": _p(latencias, 50), "p95": _p(latencias, 95), "max": _p(latencias, 100)},
+        "ocr_share": round(ocr_s / total_s, 3) if total_s > 0 else None,
+        "rss_chrome_mb": {
+            "promedio": round(sum(rss_chrome) / len(rss_chrome), 1) if rss_chrome else None,
+            "max": round(max(rss_chrome), 1) if rss_chrome else None,
+        },
+        "rss_proceso_mb": rss_proceso_mb,
+        "excel_guardado_s": {
+            "n": len(tiempos_guardado),
+            "total": round(sum(tiempos_guardado), 3),
+            "p95": _p(tiempos_guardado, 95),
+        },
+        "etapas_p95_s": {k: round(v["p95"], 3) for k, v in resumen["etapas"].items()},
+        "tiers": resumen["tiers"],
+        "resultados": resumen["resultados"],
+    }
+
+
+def correr(args):
+    config = load_config(os.path.join(project_root, "config", "mis_ajustes.yaml"))
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_dir = os.path.join(BENCH_DIR, "tmp", f"{ts}_{args.vins}")
+    os.makedirs(run_dir, exist_ok=True)
+
+    excel = os.path.join(run_dir, f"recepci_bench_{args.vins}.xlsx")
+    generar_excel(excel, args.vins, seed=args.seed)
+
+    mock_cfg = config.setdefault("mock_portal", {})
+    mock_cfg["latency_ms"] = args.latency_ms
+    mock_cfg["error_rate"] = args.error_rate
+    mock_cfg["session_drop_rate"] = args.session_drop_rate
+    mock_cfg["seed"] = args.seed
+    portal = MockPortal(config, port=0).start()
+
+    cfg = copy.deepcopy(config)
+    cfg["general"]["start_url"] = portal.start_url
+    cfg["general"]["input_excel_path"] = excel  # absoluta: os.path.join la respeta
+    cfg["general"]["engine"] = args.engine
+    cfg.setdefault("browser", {})["profile"] = args.profile
+    cfg["tracing"] = {"enabled": True, "dir": os.path.join(run_dir, "trazas")}
+    # La cache real falsearía la medición: sólo con --cache, y aislada en la carpeta de la corrida
+    cfg["cache"] = {**cfg.get("cache", {}), "enabled": args.cache, "path": os.path.join(run_dir, "vin_cache.sqlite")}
+    # Lo que el OCR y la granja Gemini persisten también queda en la carpeta de la corrida: los captchas
+    # del portal simulado no ensucian data/dataset, el orden aprendido ni el estado real de las llaves
+    ocr_cfg = cfg.setdefault("ocr", {})
+    ocr_cfg["dataset"] = {**ocr_cfg.get("dataset", {}), "dir": os.path.join(run_dir, "dataset")}
+    # El memo se precarga del dataset y el portal simulado repite captchas: sólo con --memo, y como
+    # el dataset es el de la corrida arranca vacío (mide lo que la corrida misma memoriza)
+    ocr_cfg["memo"] = {**ocr_cfg.get("memo", {}), "enabled": args.memo}
+    corte = ocr_cfg.get("early_exit", {})
+    corte = corte if isinstance(corte, dict) else {"enabled": bool(corte)}
+    ocr_cfg["early_exit"] = {**corte, "stats_path": os.path.join(run_dir, "ocr_estrategias.json")}
+    # Gemini contra los captchas del portal simulado gasta cuota real: sólo con --gemini
+    cfg["gemini"] = {
+        **cfg.get("gemini", {}), "enabled": args.gemini, "estado_path": os.path.join(run_dir, "gemini_keys_state.json"),
+    }
+
+    inicio = time.time()
+    try:
+        if args.workers > 1:
+            from src.worker_pool import WorkerPool
+            pool = WorkerPool(cfg, args.workers)
+            pool.run()
+            data_handler = pool.data_handler
+        else:
+            from src.scraper import DnpraScraper
+            scraper = DnpraScraper(cfg)
+            scraper.start_scraping()
+            data_handler = scraper.data_handler
+    finally:
+        segundos = time.time() - inicio
+        portal.stop()
+
+    rss_proceso = None
+    if psutil is not None:
+        rss_proceso = round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+
+    registros = tracing.leer_trazas([os.path.join(run_dir, "trazas", "trace_*.jsonl")])
+    resultado = {
+        "fecha": ts,
+        "commit": _commit(),
+        "label": args.label,
+        "config": {
+            "vins": args.vins,
+            "workers": args.workers,
+            "engine": args.engine,
+            "profile": args.profile,
+            "latency_ms": args.latency_ms,
+            "error_rate": args.error_rate,
+            "session_drop_rate": args.session_drop_rate,
+            "pipeline": cfg.get("pipeline", {}).get("enabled", False),
+            "session": cfg.get("session", {}).get("enabled", False),
+            "cache": args.cache,
+            "memo": args.memo,
+            "gemini": args.gemini,
+        },
+        "portal": portal.stats,
+        "metricas": medir(registros, segundos, data_handler.tiempos_guardado, rss_proceso),
+    }
+
+    os.makedirs(os.path.join(BENCH_DIR, "results"), exist_ok=True)
+    nombre = f"{ts}_{args.label or args.engine}_{args.vins}.json"
+    salida = args.out or os.path.join(BENCH_DIR, "results", nombre)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    return salida, resultado
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end contra el portal simulado")
+    parser.add_argument("--vins", type=int, default=100, help="Tamaño del Excel sintético (ej. 100, 1000, 10000).")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--engine", choices=["selenium", "http"], default="selenium")
+    parser.add_argument("--profile", choices=["normal", "lean"], default="lean")
+    parser.add_argument("--latency-ms", type=int, nargs=2, metavar=("MIN", "MAX"), default=[0, 0])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--session-drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Usar la cache de resultados (vacía, propia de la corrida).")
+    parser.add_argument("--gemini", action="store_true", help="Usar la granja Gemini del .env (gasta cuota real).")
+    parser.add_argument("--memo", action="store_true", help="Usar el memo de captchas (vacío, propio de la corrida).")
+    parser.add_argument("--label", default=None, help="Etiqueta para el nombre del JSON de resultados.")
+    parser.add_argument("--out", default=None, help="Ruta del JSON (default: benchmarks/results/...).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    salida, resultado = correr(args)
+    m = resultado["metricas"]
+    print(f"\n{m['vins']} VINs en {m['segundos']}s → {m['vins_hora']} VINs/hora")
+    print(f"Latencia por VIN p50/p95: {m['latencia_vin_s']['p50']}s / {m['latencia_vin_s']['p95']}s")
+    print(f"OCR: {m['ocr_share']} del tiempo | RSS Chrome máx: {m['rss_chrome_mb']['max']} MB")
+    print(f"Excel: {m['excel_guardado_s']['n']} guardados, {m['excel_guardado_s']['total']}s en total")
+    print(f"Resultados: {salida}")
+
+
+if __name__ == "__main__":
+    main()
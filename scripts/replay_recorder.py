@@ -0,0 +1,98 @@
+"""
+Reproduce una grabación de Chrome DevTools Recorder (Recorder/*.json) contra el portal simulado.
+
+Levanta src/mock_portal.py en un puerto libre, reescribe las URLs del portal real hacia él y
+ejecuta los pasos con Selenium (navigate, click, change). El captcha grabado se acepta como
+comodín, así la grabación llega a la página de resultado.
+
+Uso:
+    python scripts/replay_recorder.py "Recorder/Recording 25_2_2026 at 04_02_49.json"
+"""
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.mock_portal import MockPortal
+
+
+def _localizador(selectores):
+    """Primer selector CSS o XPath de la grabación (los aria/ y text/ no los entiende Selenium)."""
+    for cadena in selectores:
+        sel = cadena[-1]
+        if sel.startswith("xpath/"):
+            return By.XPATH, sel[len("xpath/"):]
+        if not sel.startswith(("aria/", "text/", "pierce/")):
+            return By.CSS_SELECTOR, sel
+    raise ValueError(f"Sin selector CSS/XPath utilizable en {selectores}")
+
+
+def _captcha_grabado(pasos):
+    """Valor que se tipeó en el campo del código verificador (el último 'change' de 5 dígitos)."""
+    valores = [p.get("value", "") for p in pasos if p["type"] == "change"]
+    codigos = [v for v in valores if v.isdigit() and len(v) == 5]
+    return codigos[-1] if codigos else None
+
+
+def reproducir(path, headless=True):
+    with open(path, encoding="utf-8") as f:
+        grabacion = json.load(f)
+    pasos = grabacion["steps"]
+
+    portal = MockPortal(comodin=_captcha_grabado(pasos), port=0).start()
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    wait = WebDriverWait(driver, 10)
+    try:
+        for n, paso in enumerate(pasos, start=1):
+            tipo = paso["type"]
+            if tipo == "setViewport":
+                driver.set_window_size(paso["width"], paso["height"])
+                continue
+            if tipo == "navigate":
+                url = urlsplit(paso["url"])
+                destino = f"{portal.base_url}{url.path}" + (f"?{url.query}" if url.query else "")
+                print(f"[{n}] navigate {destino}")
+                driver.get(destino)
+                continue
+            if tipo not in ("click", "change"):
+                continue  # keyDown/keyUp/scroll no cambian el estado del formulario
+
+            driver.switch_to.default_content()
+            for indice in paso.get("frame", []):
+                iframe = wait.until(lambda d: d.find_elements(By.TAG_NAME, "iframe"))[indice]
+                driver.switch_to.frame(iframe)
+            elemento = wait.until(EC.presence_of_element_located(_localizador(paso["selectors"])))
+            if tipo == "click":
+                print(f"[{n}] click {paso['selectors'][0][-1]}")
+                driver.execute_script("arguments[0].click();", elemento)
+            else:
+                print(f"[{n}] change -> {paso['value']}")
+                elemento.clear()
+                elemento.send_keys(paso["value"])
+
+        driver.switch_to.default_content()
+        if driver.find_elements(By.TAG_NAME, "iframe"):
+            driver.switch_to.frame(0)
+        print("\nPágina final:\n" + driver.find_element(By.TAG_NAME, "body").text)
+        print(f"\nStats del portal simulado: {portal.stats}")
+    finally:
+        driver.quit()
+        portal.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    reproducir(sys.argv[1], headless="--visible" not in sys.argv)
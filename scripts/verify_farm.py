@@ -1,8 +1,14 @@
 import os
+import sys
 import json
-from google import genai
 from dotenv import load_dotenv
 
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.config_loader import load_config
+from src.utils.key_scheduler import crear_scheduler, llaves_gemini, sondear
+
 load_dotenv()
 
 def verify_farm():
@@ -10,43 +16,22 @@ def verify_farm():
         "farm_status": "starting",
         "keys": []
     }
-    
-    gemini_keys_str = os.getenv("GEMINI_API_KEYS")
-    if not gemini_keys_str:
+
+    keys = llaves_gemini()
+    if not keys:
         results["farm_status"] = "error: no keys found"
         with open("verify_farm_results.json", "w") as f:
             json.dump(results, f, indent=4)
         return
 
-    keys = [k.strip() for k in gemini_keys_str.split(",") if k.strip()]
     results["farm_status"] = "processing"
-    
-    for i, key in enumerate(keys):
-        key_info = {
-            "index": i + 1,
-            "key_prefix": key[:10] + "...",
-            "status": "unknown"
-        }
-        try:
-            client = genai.Client(api_key=key)
-            response = client.models.generate_content(
-                model='gemini-flash-latest',
-                contents=["Hi"]
-            )
-            key_info["status"] = "OK"
-            key_info["response"] = response.text.strip()
-        except Exception as e:
-            error_msg = str(e)
-            if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                key_info["status"] = "QUOTA_EXHAUSTED"
-            elif "403" in error_msg or "PERMISSION_DENIED" in error_msg:
-                key_info["status"] = "PERMISSION_DENIED"
-            else:
-                key_info["status"] = "ERROR"
-                key_info["error_details"] = error_msg[:100]
-        
-        results["keys"].append(key_info)
-    
+
+    # Mismo sondeo paralelo que hace el scraper al arrancar; actualiza data/gemini_keys_state.json
+    config = load_config(os.path.join(project_root, "config", "mis_ajustes.yaml"))
+    scheduler = crear_scheduler(keys, config.get("gemini", {}), project_root)
+    results["keys"] = sondear(scheduler, keys, saltar_bloqueadas=False)
+    results["estado"] = scheduler.estado()
+
     results["farm_status"] = "complete"
     with open("verify_farm_results.json", "w") as f:
         json.dump(results, f, indent=4)
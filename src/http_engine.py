@@ -0,0 +1,202 @@
+import base64
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import httpx
+
+from src.utils import tracing
+from src.utils.result_parser import clasificar_resultado
+
+
+class MarkupInesperadoError(Exception):
+    """El HTML del portal no tiene la forma esperada; el llamador debe caer a Selenium."""
+
+
+class _PaginaParser(HTMLParser):
+    """Extrae del HTML lo mínimo que necesita el motor: iframes, el formulario, sus inputs, imágenes y texto."""
+
+    _IGNORAR_TEXTO = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.iframes = []
+        self.form = None
+        self.inputs = []
+        self.imgs = []
+        self._texto = []
+        self._ignorando = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "iframe" and attrs.get("src"):
+            self.iframes.append(attrs["src"])
+        elif tag == "form" and self.form is None:
+            self.form = {"action": attrs.get("action") or "", "method": (attrs.get("method") or "get").lower()}
+        elif tag == "input":
+            self.inputs.append(attrs)
+        elif tag == "img" and attrs.get("src"):
+            self.imgs.append(attrs["src"])
+        elif tag in self._IGNORAR_TEXTO:
+            self._ignorando += 1
+        elif tag in ("br", "p", "div", "tr", "td"):
+            self._texto.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._IGNORAR_TEXTO and self._ignorando:
+            self._ignorando -= 1
+
+    def handle_data(self, data):
+        if not self._ignorando:
+            self._texto.append(data)
+
+    @property
+    def texto(self):
+        lineas = (" ".join(l.split()) for l in "".join(self._texto).splitlines())
+        return "\n".join(l for l in lineas if l)
+
+    def input(self, name):
+        for attrs in self.inputs:
+            if attrs.get("name") == name:
+                return attrs
+        return None
+
+    def captcha_src(self):
+        """Igual que en Selenium: la imagen con src base64 más grande es el captcha."""
+        candidatos = [src for src in self.imgs if src.startswith("data:image")]
+        return max(candidatos, key=len) if candidatos else None
+
+
+def parsear_html(html):
+    parser = _PaginaParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class HttpEngine:
+    """
+    Motor de consulta sin navegador para fabr_import2.php.
+    Habla directo con el formulario del iframe usando un cliente HTTP con pool de conexiones
+    (keep-alive) y cookie jar propio, y clasifica la respuesta igual que el flujo Selenium.
+    Ante HTML inesperado lanza MarkupInesperadoError para que el scraper use Selenium.
+    """
+
+    def __init__(self, config, captcha_breaker, logger=None):
+        http_cfg = config.get("http_engine", {})
+        self.start_url = config["general"]["start_url"]
+        self.captcha_breaker = captcha_breaker
+        self.max_captcha_retries = http_cfg.get("max_captcha_retries", 5)
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.client = httpx.Client(
+            timeout=http_cfg.get("timeout_seconds", 30),
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=http_cfg.get("max_keepalive", 4)),
+            headers={"User-Agent": http_cfg.get("user_agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)")},
+        )
+        # URL propia del iframe del formulario; se descubre una sola vez por sesión
+        self.form_url = None
+        # Última respuesta del portal al envío: la usa el control de ritmo (latencia y clase de falla)
+        self.ultima_latencia_s = None
+        self.ultimo_texto = ""
+
+    def close(self):
+        self.client.close()
+
+    def reiniciar_sesion(self):
+        """Olvida la URL del formulario y las cookies: la próxima consulta abre una sesión nueva."""
+        self.form_url = None
+        self.client.cookies.clear()
+
+    def _get(self, url):
+        resp = self.client.get(url)
+        resp.raise_for_status()
+        return resp
+
+    def _enviar_form(self, pagina, base_url, campos):
+        """Envía el formulario de la página con los inputs ocultos/prellenados más los campos dados."""
+        payload = {}
+        for attrs in pagina.inputs:
+            name = attrs.get("name")
+            tipo = (attrs.get("type") or "text").lower()
+            if not name or tipo in ("radio", "checkbox", "submit", "button", "image"):
+                continue
+            payload[name] = attrs.get("value", "")
+        payload.update(campos)
+
+        url = urljoin(base_url, pagina.form["action"])
+        if pagina.form["method"] == "post":
+            resp = self.client.post(url, data=payload)
+        else:
+            resp = self.client.get(url, params=payload)
+        resp.raise_for_status()
+        return resp
+
+    def _cargar_formulario(self, tipo):
+        """Devuelve (parser, url) de la página del formulario con el tipo de certificado ya seleccionado."""
+        if self.form_url is None:
+            resp = self._get(self.start_url)
+            pagina = parsear_html(resp.text)
+            # El formulario vive en un iframe: nos quedamos con su URL para no recargar la página exterior
+            self.form_url = urljoin(str(resp.url), pagina.iframes[0]) if pagina.iframes else str(resp.url)
+            self.logger.info(f"  -> [HTTP] URL del formulario: {self.form_url}")
+
+        resp = self._get(self.form_url)
+        pagina = parsear_html(resp.text)
+        if pagina.form is None or pagina.input("tcert") is None:
+            raise MarkupInesperadoError("No se encontró el formulario con el selector 'tcert'.")
+
+        # En el portal, elegir el radio del tipo recarga el formulario (aparece VIN + captcha)
+        if pagina.input("vin") is None or pagina.captcha_src() is None:
+            resp = self._enviar_form(pagina, str(resp.url), {"tcert": tipo})
+            pagina = parsear_html(resp.text)
+
+        if pagina.form is None or pagina.input("vin") is None or pagina.input("verificador") is None:
+            raise MarkupInesperadoError("El formulario no tiene los campos 'vin'/'verificador'.")
+        if pagina.captcha_src() is None:
+            raise MarkupInesperadoError("No se encontró la imagen base64 del captcha.")
+        return pagina, str(resp.url)
+
+    def consultar(self, vin, tipo="N"):
+        """
+        Consulta un VIN por HTTP. Devuelve (resultado, dominio) con la misma clasificación
+        que el flujo Selenium ("ERROR_CAPTCHA" si no se logró leer un captcha de 5 dígitos).
+        """
+        self.ultima_latencia_s = None
+        self.ultimo_texto = ""
+        for attempt in range(self.max_captcha_retries):
+            if attempt > 0:
+                tracing.contar("captcha_reintentos")
+            with tracing.span("http.formulario"):
+                pagina, url = self._cargar_formulario(tipo)
+
+            with tracing.span("captcha_extraccion"):
+                _, b64_data = pagina.captcha_src().split(",", 1)
+                img_bytes = base64.b64decode(b64_data)
+            self.logger.info(f"  -> [HTTP] Captcha descargado ({len(img_bytes)} bytes).")
+
+            codigo = self.captcha_breaker.solve(img_bytes)
+            if not (codigo and len(codigo) == 5):
+                # Pedir el formulario de nuevo equivale a "Cargar nuevo código"
+                self.logger.warning(f"  [HTTP] Captcha con longitud incorrecta '{codigo}' (intento {attempt+1}/{self.max_captcha_retries}).")
+                continue
+
+            campos = {"tcert": tipo, "vin": str(vin), "verificador": codigo}
+            boton = pagina.input("boton")
+            if boton is not None:
+                campos["boton"] = boton.get("value", "")
+            with tracing.span("envio"):
+                resp = self._enviar_form(pagina, url, campos)
+            self.ultima_latencia_s = resp.elapsed.total_seconds()
+
+            with tracing.span("resultado"):
+                texto = parsear_html(resp.text).texto
+                self.ultimo_texto = texto
+                if not texto:
+                    raise MarkupInesperadoError("La respuesta del portal vino vacía.")
+                clasificacion = clasificar_resultado(texto)
+            self.logger.info(f"  -> [HTTP] Resultado obtenido ({len(texto)} caracteres).")
+            return clasificacion
+
+        return "ERROR_CAPTCHA", ""
@@ -1,6 +1,7 @@
 import os
 import sys
 import logging
+import argparse
 from datetime import datetime
 
 # Añadir el raíz del proyecto al sys.path asumiendo que el script se ejecuta desde ahí
@@ -27,7 +28,29 @@ def setup_logging():
     )
     return logging.getLogger("Main")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scraper masivo DNPRA")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Cantidad de navegadores en paralelo (default: general.workers del YAML, o 1)."
+    )
+    parser.add_argument(
+        "--start-url", default=None,
+        help="Pisa general.start_url del YAML (ej. el portal simulado de src/mock_portal.py)."
+    )
+    parser.add_argument(
+        "--resumen-traza", nargs="+", metavar="JSONL",
+        help="No scrapea: imprime p50/p95/p99 por etapa y VINs/hora de una o más trazas (acepta globs)."
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    if args.resumen_traza:
+        from src.utils.tracing import imprimir_resumen
+        imprimir_resumen(args.resumen_traza)
+        return
+
     logger = setup_logging()
     logger.info("Iniciando proceso de scraping DNPRA...")
     
@@ -36,10 +59,18 @@ def main():
         config_path = os.path.join(project_root, "config", "mis_ajustes.yaml")
         config = load_config(config_path)
         logger.info("Configuración cargada correctamente.")
+        if args.start_url:
+            config["general"]["start_url"] = args.start_url
+            logger.info(f"Usando start_url: {args.start_url}")
         
-        # 2. Inicializar y correr Scraper
-        scraper = DnpraScraper(config)
-        scraper.start_scraping()
+        # 2. Inicializar y correr Scraper (un navegador o N workers en paralelo)
+        workers = args.workers or config.get("general", {}).get("workers", 1)
+        if workers > 1:
+            from src.worker_pool import WorkerPool
+            WorkerPool(config, workers).run()
+        else:
+            scraper = DnpraScraper(config)
+            scraper.start_scraping()
         
         # 3. Futuro: Transformación y Sincronización (ETL)
         logger.info("Proceso finalizado con éxito.")
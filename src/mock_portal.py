@@ -0,0 +1,393 @@
+"""
+Portal DNPRA simulado para pruebas end-to-end y benchmarks sin tocar el sitio real.
+
+Reproduce la página exterior con el iframe, el formulario tcert/vin/verificador y las páginas de
+resultado (dominio / Vigente / Vencido / "incorrecto" / "ya utilizado"). Los captchas salen de
+data/dataset/: la respuesta correcta es la etiqueta de 5 dígitos del índice del dataset (sin los
+que el portal real rechazó) y, para los archivos planos viejos, la del nombre
+({timestamp}_{5 dígitos}.png). Se pueden inyectar latencia, errores 5xx y caídas de sesión
+(sección `mock_portal:`).
+
+Uso:
+    python src/mock_portal.py --port 8765
+    python src/main.py --start-url "http://127.0.0.1:8765/portal_dnrpa/fabr_import2.php?EstadoCertificado=true"
+"""
+import argparse
+import base64
+import hashlib
+import html
+import logging
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+PORTAL_PATH = "/portal_dnrpa/fabr_import2.php"
+FORM_PATH = "/portal_dnrpa/form_certificado.php"
+CAPTCHA_PATH = "/portal_dnrpa/captcha_nuevo.php"
+
+# Sin dataset: un PNG 1x1 con etiqueta al azar (el flujo funciona, el OCR nunca acierta)
+_PNG_VACIO = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+_PAGINA_PORTAL = """<html>
+<head><title>DNRPA - Estado de Certificado de Fabricación / Importación</title></head>
+<body>
+<div id="encabezado"><h3>DNRPA (simulado)</h3></div>
+<iframe src="form_certificado.php" width="100%" height="600" frameborder="0"></iframe>
+</body>
+</html>"""
+
+_RADIOS = """<tr><td>* Tipo de certificado:
+<input type="radio" name="tcert" value="I"{chk_i} onclick="this.form.submit();"> Importado
+<input type="radio" name="tcert" value="N"{chk_n} onclick="this.form.submit();"> Nacional
+</td></tr>"""
+
+_PAGINA_TIPO = """<html><body>
+<div id="imprimir">
+<form name="formulario" method="post" action="form_certificado.php">
+<table><tbody>
+{radios}
+</tbody></table>
+</form>
+</div>
+</body></html>"""
+
+_PAGINA_FORM = """<html><head><script>
+function recargar() {{
+  fetch("captcha_nuevo.php", {{credentials: "same-origin"}})
+    .then(function (r) {{ return r.text(); }})
+    .then(function (src) {{ document.getElementById("captcha").src = src; }});
+}}
+</script></head><body>
+<div id="imprimir">
+<form name="formulario" method="post" action="form_certificado.php">
+<input type="hidden" name="token" value="{token}">
+<table><tbody>
+{radios}
+<tr><td>&nbsp;</td></tr>
+<tr><td><div>* VIN: <input type="text" name="vin" size="20" maxlength="17" value="{vin}"></div></td></tr>
+<tr><td><img id="captcha" src="{captcha}" alt="Código verificador"></td></tr>
+<tr><td><a href="#" title="Cargar nuevo código" onclick="recargar(); return false;">Cargar nuevo código</a></td></tr>
+<tr><td><div>* Código verificador: <input type="text" name="verificador" size="6"></div></td></tr>
+<tr><td><input type="submit" name="boton" value="Aceptar"> <input type="reset" value="Limpiar"></td></tr>
+</tbody></table>
+</form>
+</div>
+</body></html>"""
+
+_PAGINA_RESULTADO = """<html><body>
+<div id="imprimir">
+<p{clase}>{mensaje}</p>
+<a href="form_certificado.php">{link}</a>
+</div>
+</body></html>"""
+
+
+def cargar_captchas(dataset_dir):
+    """[(png_bytes, etiqueta)] del dataset, sólo los captchas con etiqueta de 5 dígitos."""
+    from src.utils.dataset_writer import captchas_etiquetados
+
+    captchas = []
+    for path, etiqueta in captchas_etiquetados(dataset_dir):
+        with open(path, "rb") as f:
+            captchas.append((f.read(), etiqueta))
+    return captchas
+
+
+def resultado_para_vin(vin):
+    """Respuesta determinística por VIN: ('dominio', patente) | ('vigente', '') | ('vencido', '')."""
+    h = int(hashlib.sha256(vin.encode("utf-8")).hexdigest(), 16)
+    tipo = ("dominio", "vigente", "vencido")[h % 3]
+    if tipo != "dominio":
+        return tipo, ""
+    letras = "ABCDEFGHJKLMNPRSTUVWXYZ"
+    patente = (
+        letras[h % 23] + letras[(h // 23) % 23] + f"{(h // 529) % 1000:03d}"
+        + letras[(h // 529000) % 23] + letras[(h // 12167000) % 23]
+    )
+    return tipo, patente
+
+
+class MockPortal:
+    """
+    Servidor HTTP del portal simulado (hilo propio). Estado por sesión (cookie PHPSESSID):
+    tipo elegido (persiste entre consultas de la misma sesión) y captcha vigente. Cada captcha sirve para un solo envío: reenviar el
+    formulario sin pedir uno nuevo responde "ya utilizado". Una sesión caída (o inexistente)
+    responde 403 con la página de sesión expirada.
+    """
+
+    def __init__(self, config=None, host=None, port=None, dataset_dir=None, comodin=None):
+        cfg = (config or {}).get("mock_portal", {})
+        self.host = host or cfg.get("host", "127.0.0.1")
+        self.port = port if port is not None else cfg.get("port", 8765)
+        self.latency_ms = cfg.get("latency_ms", [0, 0])
+        self.error_rate = cfg.get("error_rate", 0.0)
+        self.session_drop_rate = cfg.get("session_drop_rate", 0.0)
+        self.seed = cfg.get("seed")
+        # Código aceptado siempre (para reproducir grabaciones con un captcha fijo)
+        self.comodin = comodin or cfg.get("comodin")
+
+        dataset_dir = dataset_dir or os.path.join(project_root, cfg.get("dataset_dir", "data/dataset"))
+        self.captchas = cargar_captchas(dataset_dir)
+        if not self.captchas:
+            logger.warning(f"Sin captchas etiquetados en {dataset_dir}: se sirve una imagen vacía.")
+
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._sesiones = {}
+        self.stats = {"requests": 0, "errores_5xx": 0, "sesiones_caidas": 0, "consultas": 0, "captcha_ok": 0}
+        self._server = None
+        self._hilo = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def start_url(self):
+        return f"{self.base_url}{PORTAL_PATH}?EstadoCertificado=true"
+
+    # ------------------------------------------------------------------
+
+    def start(self):
+        portal = self
+
+        class _Handler(_PortalHandler):
+            pass
+        _Handler.portal = portal
+
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.port = self._server.server_address[1]
+        self._hilo = threading.Thread(target=self._server.serve_forever, name="mock-portal", daemon=True)
+        self._hilo.start()
+        logger.info(f"Portal simulado escuchando en {self.start_url} ({len(self.captchas)} captchas).")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+
+    def _sortear(self, prob):
+        with self._lock:
+            return prob > 0 and self._random.random() < prob
+
+    def _latencia(self):
+        lo, hi = self.latency_ms
+        if hi > 0:
+            with self._lock:
+                ms = self._random.uniform(lo, hi)
+            time.sleep(ms / 1000)
+
+    def _nuevo_captcha(self, sesion):
+        with self._lock:
+            if self.captchas:
+                png, etiqueta = self._random.choice(self.captchas)
+            else:
+                png, etiqueta = _PNG_VACIO, f"{self._random.randrange(100000):05d}"
+        sesion["captcha"] = etiqueta
+        return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+    def _sesion(self, sid, crear=False):
+        with self._lock:
+            if sid in self._sesiones:
+                return sid, self._sesiones[sid]
+            if not crear:
+                return None, None
+            sid = secrets.token_hex(8)
+            self._sesiones[sid] = {"tipo": None, "captcha": None}
+            return sid, self._sesiones[sid]
+
+    def _tirar_sesion(self, sid):
+        with self._lock:
+            self._sesiones.pop(sid, None)
+            self.stats["sesiones_caidas"] += 1
+
+    def _render_form(self, sesion, vin=""):
+        tipo = sesion["tipo"]
+        radios = _RADIOS.format(
+            chk_i=" checked" if tipo == "I" else "", chk_n=" checked" if tipo == "N" else ""
+        )
+        if tipo is None:
+            return _PAGINA_TIPO.format(radios=radios)
+        return _PAGINA_FORM.format(
+            radios=radios, token=secrets.token_hex(4), vin=html.escape(vin), captcha=self._nuevo_captcha(sesion)
+        )
+
+    def _render_resultado(self, sesion, vin, codigo):
+        with self._lock:
+            self.stats["consultas"] += 1
+            esperado, sesion["captcha"] = sesion["captcha"], None
+        if esperado is None:
+            return _PAGINA_RESULTADO.format(
+                clase=' class="error"', link="Volver",
+                mensaje="El código verificador ya utilizado. Solicite uno nuevo.",
+            )
+        if codigo != esperado and codigo != self.comodin:
+            return _PAGINA_RESULTADO.format(
+                clase=' class="error"', link="Volver",
+                mensaje="El código verificador ingresado es incorrecto.",
+            )
+
+        with self._lock:
+            self.stats["captcha_ok"] += 1
+        tipo, patente = resultado_para_vin(vin)
+        if tipo == "dominio":
+            mensaje = (
+                f"El certificado de fabricación correspondiente al VIN {html.escape(vin)} se encuentra "
+                f"<b>utilizado</b>, con el dominio {patente} inscripto en el RRSS 1234."
+            )
+        elif tipo == "vigente":
+            mensaje = f"El certificado correspondiente al VIN {html.escape(vin)} se encuentra VIGENTE."
+        else:
+            mensaje = f"El certificado correspondiente al VIN {html.escape(vin)} se encuentra VENCIDO."
+        return _PAGINA_RESULTADO.format(clase="", link="Nueva consulta", mensaje=mensaje)
+
+
+class _PortalHandler(BaseHTTPRequestHandler):
+    portal = None
+
+    def log_message(self, *args):
+        pass
+
+    def _sid(self):
+        m = re.search(r"PHPSESSID=([0-9a-f]+)", self.headers.get("Cookie", ""))
+        return m.group(1) if m else None
+
+    def _responder(self, cuerpo, sid=None, tipo="text/html; charset=utf-8", status=200):
+        body = cuerpo.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(body)))
+        if sid:
+            self.send_header("Set-Cookie", f"PHPSESSID={sid}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inyectar_fallas(self):
+        """Latencia y 5xx configurados. True si ya se respondió con error."""
+        portal = self.portal
+        with portal._lock:
+            portal.stats["requests"] += 1
+        portal._latencia()
+        if portal._sortear(portal.error_rate):
+            with portal._lock:
+                portal.stats["errores_5xx"] += 1
+            self._responder("<html><body><h1>503 Service Unavailable</h1></body></html>", status=503)
+            return True
+        return False
+
+    def do_GET(self):
+        if self._inyectar_fallas():
+            return
+        portal = self.portal
+        ruta = urlsplit(self.path).path
+        if ruta == PORTAL_PATH:
+            sid, _ = portal._sesion(None, crear=True)
+            self._responder(_PAGINA_PORTAL, sid=sid)
+        elif ruta == FORM_PATH:
+            # El iframe cargado directo también abre sesión (modo sesión persistente del scraper)
+            sid, sesion = portal._sesion(self._sid())
+            nueva = sid is None
+            if nueva:
+                sid, sesion = portal._sesion(None, crear=True)
+            # El tipo elegido queda en la sesión: una sesión que ya consultó recibe el formulario con el
+            # radio marcado y el captcha listo (supuesto del modo sesión; ver `session:` en el YAML).
+            # Como en el portal real, cargar el formulario invalida el captcha que tenía la sesión:
+            # un GET (ej. la pestaña precargada) que llega antes del envío hace fallar ese envío
+            sesion["captcha"] = None
+            self._responder(portal._render_form(sesion), sid=sid if nueva else None)
+        elif ruta == CAPTCHA_PATH:
+            _, sesion = portal._sesion(self._sid())
+            if sesion is None:
+                self.send_error(403)
+                return
+            self._responder(portal._nuevo_captcha(sesion), tipo="text/plain; charset=utf-8")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self._inyectar_fallas():
+            return
+        portal = self.portal
+        if urlsplit(self.path).path != FORM_PATH:
+            self.send_error(404)
+            return
+
+        largo = int(self.headers.get("Content-Length", 0))
+        campos = {k: v[0] for k, v in parse_qs(self.rfile.read(largo).decode("utf-8"), keep_blank_values=True).items()}
+        sid, sesion = portal._sesion(self._sid())
+
+        if sesion is not None and portal._sortear(portal.session_drop_rate):
+            portal._tirar_sesion(sid)
+            sesion = None
+        if sesion is None:
+            self._responder(_PAGINA_RESULTADO.format(
+                clase=' class="error"', link="Volver", mensaje="Su sesión ha expirado."
+            ), status=403)
+            return
+
+        if campos.get("tcert") in ("N", "I"):
+            sesion["tipo"] = campos["tcert"]
+        if "verificador" not in campos:
+            # Click en el radio: el formulario se recarga con VIN + captcha
+            self._responder(portal._render_form(sesion, vin=campos.get("vin", "")))
+            return
+        self._responder(portal._render_resultado(sesion, campos.get("vin", ""), campos["verificador"].strip()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal DNPRA simulado (pruebas y benchmarks offline)")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--latency-ms", type=int, nargs=2, metavar=("MIN", "MAX"), default=None)
+    parser.add_argument("--error-rate", type=float, default=None, help="Probabilidad de responder 503.")
+    parser.add_argument("--session-drop-rate", type=float, default=None, help="Probabilidad de tirar la sesión en un POST.")
+    args = parser.parse_args()
+
+    sys.path.append(project_root)
+    from src.utils.config_loader import load_config
+    config = load_config(os.path.join(project_root, "config", "mis_ajustes.yaml"))
+    cfg = config.setdefault("mock_portal", {})
+    if args.latency_ms is not None:
+        cfg["latency_ms"] = args.latency_ms
+    if args.error_rate is not None:
+        cfg["error_rate"] = args.error_rate
+    if args.session_drop_rate is not None:
+        cfg["session_drop_rate"] = args.session_drop_rate
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    portal = MockPortal(config, host=args.host, port=args.port).start()
+    print(f"start_url: {portal.start_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal.stop()
+        print(f"Stats: {portal.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
+import base64
 import logging
 import os
 import time
 import subprocess
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
@@ -13,68 +13,160 @@ from selenium.common.exceptions import (
     InvalidSessionIdException, TimeoutException
 )
 
+from src.http_engine import HttpEngine, MarkupInesperadoError
 from src.utils.captcha_breaker import CaptchaBreaker
 from src.utils.data_handler import DataHandler
+from src.utils.driver_pool import DriverManager
+from src.utils.journal import ResultWriter
+from src.utils import browser_profile, tracing
+from src.utils.rate_control import CLASES_DEGRADACION, RateController
+from src.utils.result_cache import crear_cache, resolver_desde_cache
+from src.utils.retry_queue import RetryQueue
+from src.utils.result_parser import clasificar_resultado, clase_de_falla
+from src.utils.waits import WaitEngine, poll_until
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def crear_data_handler(config):
+    """Construye el DataHandler del Excel de entrada configurado (rutas relativas a la raíz)."""
+    excel_rel_path = config["general"]["input_excel_path"]
+    return DataHandler(os.path.join(PROJECT_ROOT, excel_rel_path))
+
+
+def _chromedriver_corriendo():
+    try:
+        salida = subprocess.run(
+            ["tasklist", "/FI", "IMAGENAME eq chromedriver.exe"],
+            capture_output=True, text=True, timeout=5
+        ).stdout
+        return "chromedriver.exe" in salida.lower()
+    except Exception:
+        return False
+
+
+def ordenar_por_tipo(vins, tipos):
+    """Agrupa los VINs por tipo (N/I) conservando el orden original dentro de cada grupo."""
+    return sorted(vins, key=lambda v: tipos.get(str(v).strip(), "N"))
+
+
+def kill_stray_chromedrivers(timeout=2):
+    """Mata procesos de ChromeDriver colgados. NO toca chrome.exe para no cerrar las ventanas del usuario."""
+    for proc in ["chromedriver.exe"]:  # Solo chromedriver, chrome.exe se gestiona a través de driver.quit()
+        try:
+            subprocess.run(
+                ["taskkill", "/F", "/IM", proc],
+                capture_output=True, timeout=5
+            )
+        except Exception:
+            pass
+    # Esperar a que realmente desaparezcan (antes: sleep fijo de 2s)
+    poll_until(lambda: not _chromedriver_corriendo(), timeout, intervalo=0.2)
 
 
 class DnpraScraper:
-    def __init__(self, config):
+    def __init__(self, config, worker_id=None, rate_controller=None, key_scheduler=None):
         self.config = config
-        self.logger = logging.getLogger(__name__)
+        self.worker_id = worker_id
+        # En modo paralelo cada worker tiene su propio logger para distinguirlo en el log
+        logger_name = __name__ if worker_id is None else f"{__name__}.w{worker_id}"
+        self.logger = logging.getLogger(logger_name)
         self.driver = None
         self.wait = None
+        self.driver_manager = DriverManager(self.config, logger_=self.logger)
+        # Los chromedrivers colgados se matan una sola vez: en un re-arranque caería el repuesto
+        self._limpieza_hecha = False
+        # Esperas por condición del DOM (timeouts en `waits:` del YAML)
+        self.waits = WaitEngine(self.config, logger=self.logger)
+        # Ritmo AIMD + circuit breaker frente al portal (en modo paralelo lo comparte el WorkerPool)
+        self.rate = rate_controller or RateController(self.config)
+
+        # Traza por VIN en logs/trace_*.jsonl (resumen: python src/main.py --resumen-traza ...)
+        self.tracer = tracing.crear_tracer(self.config, PROJECT_ROOT, worker_id=worker_id)
+        tracing.set_tracer(self.tracer)
 
         # Inicializar el rompedor de captchas
         tesseract_cmd = os.getenv('TESSERACT_CMD_PATH', r"C:\Program Files\Tesseract-OCR\tesseract.exe")
-        self.captcha_breaker = CaptchaBreaker(tesseract_cmd_path=tesseract_cmd)
+        self.captcha_breaker = CaptchaBreaker(
+            tesseract_cmd_path=tesseract_cmd,
+            ocr_config=self.config.get("ocr", {}),
+            gemini_config=self.config.get("gemini", {}),
+            key_scheduler=key_scheduler,
+        )
 
         # Handler de Excel
-        self.project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        excel_rel_path = self.config["general"]["input_excel_path"]
-        excel_abs_path = os.path.join(self.project_root, excel_rel_path)
-        self.data_handler = DataHandler(excel_abs_path)
+        self.project_root = PROJECT_ROOT
+        self.data_handler = crear_data_handler(self.config)
+
+        # Directorio de trabajo propio (capturas de error) para no pisarse entre workers
+        if worker_id is None:
+            self.work_dir = os.path.join(self.project_root, "data")
+        else:
+            self.work_dir = os.path.join(self.project_root, "data", f"worker_{worker_id}")
+        os.makedirs(self.work_dir, exist_ok=True)
+
+        # Modo pipeline: OCR en un hilo aparte y precarga del próximo VIN en otra pestaña
+        self.pipeline_cfg = self.config.get("pipeline", {})
+        self._ocr_executor = None
+        if self.pipeline_cfg.get("enabled", False):
+            self._ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+        self._tab_precargada = None
+        self.pipeline_stats = {"vins": 0, "ocr_s": 0.0, "navegador_s": 0.0, "solapado_s": 0.0, "espera_s": 0.0, "precarga_s": 0.0}
+
+        # Métricas del navegador (tiempo de carga del formulario y RAM de Chrome) para comparar perfiles
+        self.browser_stats = {"cargas_ms": [], "rss_mb": []}
+
+        # Sesión persistente: se navega una vez al portal y después se carga directo la URL del iframe
+        self.session_cfg = self.config.get("session", {})
+        self._iframe_url = None
+        self.radio_reutilizado = 0
+
+        # Motor de consulta: "selenium" (Chrome completo) o "http" (POST directo, Selenium como fallback)
+        self.http_engine = None
+        if self.config.get("general", {}).get("engine", "selenium") == "http":
+            self.http_engine = HttpEngine(self.config, self.captcha_breaker, logger=self.logger)
+            self.logger.info("Motor HTTP activo (Selenium sólo como fallback).")
 
     def _kill_stray_processes(self):
         """Mata procesos de ChromeDriver colgados. NO toca chrome.exe para no cerrar las ventanas del usuario."""
-        for proc in ["chromedriver.exe"]:  # Solo chromedriver, chrome.exe se gestiona a través de driver.quit()
-            try:
-                subprocess.run(
-                    ["taskkill", "/F", "/IM", proc],
-                    capture_output=True, timeout=5
-                )
-            except Exception:
-                pass
-        time.sleep(2)
+        if self.worker_id is not None:
+            # En modo paralelo matar chromedriver.exe tiraría abajo las sesiones de los otros workers.
+            # La limpieza la hace una sola vez el coordinador antes de lanzarlos.
+            return
+        kill_stray_chromedrivers(timeout=self.waits.timeouts["chromedriver_kill"])
 
     def init_driver(self):
         """Inicializa Selenium de manera robusta, limpiando procesos previos."""
         self.logger.info("Inicializando el navegador...")
-        self._kill_stray_processes()
-
-        options = webdriver.ChromeOptions()
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        # options.add_argument("--headless")  # Descomentar para producción
-
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=options)
-        self.driver.maximize_window()
+        # Limpieza sólo en el primer arranque: después mataría al navegador de repuesto
+        if not self._limpieza_hecha:
+            self._kill_stray_processes()
+            self._limpieza_hecha = True
+
+        # Perfil del navegador ("normal"/"lean", ver `browser:`) y repuesto en caliente (ver `driver_pool:`)
+        self._set_driver(self.driver_manager.obtener())
+        perfil = self.config.get("browser", {}).get("profile", "normal")
+        self.logger.info(f"✅ Navegador listo (perfil '{perfil}').")
+
+    def _set_driver(self, driver):
+        self.driver = driver
         timeout = self.config.get("general", {}).get("timeout_seconds", 30)
         self.wait = WebDriverWait(self.driver, timeout=timeout)
-        self.logger.info("✅ Navegador listo.")
 
     def _reset_driver(self):
-        """Quita el driver viejo y lo re-inicializa limpiamente."""
+        """Cambia el driver caído por el de repuesto (o lanza uno nuevo) sin frenar en el camino crítico."""
+        self._tab_precargada = None
+        # Con un navegador nuevo no hay cookies: la próxima navegación vuelve a pasar por el portal
+        self._iframe_url = None
+        if self.driver is None:
+            # Primer uso (ej. fallback del motor HTTP): arranque normal
+            self.init_driver()
+            return
         self.logger.warning("Reseteando navegador...")
-        try:
-            if self.driver:
-                self.driver.quit()
-        except Exception:
-            pass
-        self.driver = None
-        self.wait = None
-        time.sleep(3)
-        self.init_driver()
+        viejo, self.driver, self.wait = self.driver, None, None
+        self._set_driver(self.driver_manager.reemplazar(viejo))
+        self.logger.info("✅ Navegador reemplazado.")
 
     def _is_driver_alive(self):
         """Verifica si el driver sigue activo."""
@@ -84,26 +176,51 @@ class DnpraScraper:
         except Exception:
             return False
 
-    def _navegar_y_cambiar_iframe(self, start_url):
-        """Navega a la URL y hace switch al iframe del formulario."""
-        self.driver.get(start_url)
-        time.sleep(2)
+    def _url_formulario(self, start_url):
+        """En modo sesión, una vez conocida la URL propia del iframe se va directo a ella."""
+        if self.session_cfg.get("enabled", False) and self._iframe_url:
+            return self._iframe_url
+        return start_url
 
-        # El formulario está DENTRO de un iframe. Hay que cambiar el contexto.
-        iframe = self.wait.until(
-            EC.presence_of_element_located((By.TAG_NAME, "iframe"))
-        )
-        self.driver.switch_to.frame(iframe)
+    def _navegar_y_cambiar_iframe(self, start_url):
+        """Navega a la URL (o toma la pestaña precargada) y hace switch al iframe del formulario."""
+        with tracing.span("navegar"):
+            destino = self._usar_tab_precargada()
+            if destino is None:
+                destino = self._url_formulario(start_url)
+                self.driver.get(destino)
+
+        with tracing.span("iframe"):
+            self._cambiar_a_formulario(destino == start_url)
         self.logger.info("  -> Dentro del iframe del formulario.")
-        time.sleep(1)
+
+        carga_ms = browser_profile.medir_carga_pagina(self.driver)
+        if carga_ms is not None:
+            self.browser_stats["cargas_ms"].append(carga_ms)
+            tracing.anotar(page_load_ms=carga_ms)
+
+    def _cambiar_a_formulario(self, dentro_de_iframe):
+        if dentro_de_iframe:
+            # El formulario está DENTRO de un iframe. Hay que cambiar el contexto.
+            iframe = self.wait.until(
+                EC.presence_of_element_located((By.TAG_NAME, "iframe"))
+            )
+            if self.session_cfg.get("enabled", False) and self._iframe_url is None:
+                self._iframe_url = iframe.get_attribute("src")
+                self.logger.info(f"  -> Sesión: URL del iframe recordada ({self._iframe_url}).")
+            self.driver.switch_to.frame(iframe)
+
+        # Iframe listo = documento cargado y el radio del tipo presente
+        radio_xpath = self.config["selectors"]["certificado_form"]["option_radio"]
+        self.waits.exigir("iframe", lambda: (
+            self.driver.execute_script("return document.readyState") == "complete"
+            and self.driver.find_elements(By.XPATH, radio_xpath)
+        ))
 
     def start_scraping(self):
         """Método principal que coordina el scraping masivo desde Excel."""
-        results = {}
-        dominios = {}
+        cache = None
         try:
-            self.init_driver()
-
             # Cargar VINs pendientes (FIFO)
             self.logger.info("Buscando VINs pendientes en Excel...")
             vins = self.data_handler.get_pending_vins()
@@ -113,245 +230,524 @@ class DnpraScraper:
                 return
 
             self.logger.info(f"Se encontraron {len(vins)} VINs pendientes.")
+            tipos = self.data_handler.get_tipo_map()
+            if self.session_cfg.get("reorder_by_tipo", False):
+                # Corridas largas del mismo tipo maximizan la reutilización del radio
+                vins = ordenar_por_tipo(vins, tipos)
+            # Journal durable por VIN + volcado al Excel en segundo plano (+ cache entre corridas)
+            cache = crear_cache(self.config, self.project_root)
+            writer = ResultWriter(self.data_handler, self.data_handler.journal, cache=cache)
+            try:
+                vins = resolver_desde_cache(cache, vins, tipos, writer, self.logger)
+                if vins:
+                    # Con el motor HTTP el navegador se levanta recién si hace falta el fallback
+                    if self.http_engine is None:
+                        self.init_driver()
+                    self.procesar_vins(vins, writer.registrar, tipos=tipos)
+            finally:
+                writer.cerrar()
 
-            start_url = self.config["general"]["start_url"]
-            selectors = self.config["selectors"]["certificado_form"]
-            consecutive_errors = 0
+            self.logger.info("Scraping masivo finalizado.")
 
-            for i, vin in enumerate(vins):
-                self.logger.info(f"[{i+1}/{len(vins)}] Procesando VIN: {vin}")
+        except Exception as e:
+            self.logger.error(f"Error crítico: {str(e)}", exc_info=True)
+            raise
+        finally:
+            if cache is not None:
+                cache.cerrar()
+            self.close()
 
+    def procesar_vins(self, vins, on_result, tipos=None):
+        """
+        Consulta una lista de VINs con este navegador.
+        Cada resultado se entrega a on_result(vin, resultado, dominio, **meta) con meta = tier de OCR,
+        worker y timestamps; quien llama decide cómo persistir (así en modo paralelo un único
+        proceso escribe el journal y el Excel).
+        tipos: {vin: 'N'|'I'} de DataHandler.get_tipo_map(); sin dato se consulta como Nacional.
+        Las fallas reintentables (captcha, sesión, lectura...) vuelven a una RetryQueue y se
+        reintentan tras la pasada principal: on_result sólo recibe el resultado definitivo.
+        Devuelve la cantidad de VINs procesados.
+        """
+        tipos = tipos or {}
+        start_url = self.config["general"]["start_url"]
+        selectors = self.config["selectors"]["certificado_form"]
+        consecutive_errors = 0  # Fallas propias (OCR, etc.); las del portal las maneja el breaker
+        procesados = 0
+        cola = RetryQueue(vins, self.config)
+
+        def _entregar(vin, tipo, intento, resultado, dominio, inicio, clase=None, latencia=None):
+            nonlocal consecutive_errors, procesados
+            self.rate.registrar(latencia, clase)
+            if clase is None:
+                consecutive_errors = 0
+            elif clase not in CLASES_DEGRADACION:
+                consecutive_errors += 1
+            estado = self.rate.estado()
+            tracing.anotar(rate_rpm=estado["rate_rpm"], breaker=estado["breaker"], intento=intento)
+            registro = tracing.get_tracer().finalizar_vin(resultado, dominio) or {}
+            # Veredicto del portal sobre la última lectura: queda en el índice del dataset
+            self.captcha_breaker.registrar_veredicto(True if clase is None else False if clase == "captcha" else None)
+
+            if clase is not None and cola.fallo(vin, clase):
+                self.logger.info(f"  -> {resultado} ({clase}): VIN {vin} vuelve a la cola de reintentos.")
+                return
+            if clase is None:
+                cola.exito(vin)
+            on_result(
+                vin, resultado, dominio,
+                tipo=tipo, tier=registro.get("tier"), worker=self.worker_id, intentos=intento,
+                inicio=round(inicio, 3), fin=round(time.time(), 3),
+            )
+            procesados += 1
+
+        while cola:
+            # Frenado de seguridad. Las fallas del portal no cortan la corrida: el breaker pausa y
+            # retoma; sólo se aborta si el portal sigue caído tras max_trips aperturas seguidas.
+            if self.rate.debe_abortar():
+                self.logger.error(f"Portal caído tras {self.rate.max_trips} aperturas del breaker. Abortando para proteger el Excel.")
+                break
+            if consecutive_errors >= 10:
+                self.logger.error("10 errores consecutivos. Abortando para proteger el Excel.")
+                break
+
+            vin, intento = cola.siguiente()
+            if intento == 1:
+                self.logger.info(f"[{len(cola.intentos)}/{cola.total}] Procesando VIN: {vin}")
+            else:
+                self.logger.info(f"[reintento {intento - 1}] Procesando VIN: {vin}")
+            resultado = None
+            dominio = ""
+            tipo = tipos.get(str(vin).strip(), "N")
+            self.rate.esperar_turno()
+            inicio_vin = time.time()
+            clase = None
+            latencia = None
+            tracing.get_tracer().iniciar_vin(vin, tipo=tipo, worker=self.worker_id, motor="selenium")
+
+            if self.http_engine is not None:
                 try:
-                    # Verificar sesión y re-inicializar si es necesario
-                    if not self._is_driver_alive():
-                        self._reset_driver()
+                    tracing.anotar(motor="http")
+                    resultado, dominio = self.http_engine.consultar(vin, tipo=tipo)
+                except MarkupInesperadoError as e:
+                    self.logger.warning(f"  [HTTP] Markup inesperado ({e}). Usando Selenium para VIN {vin}...")
+                    tracing.anotar(motor="http->selenium")
+                except httpx.HTTPError as e:
+                    self.logger.warning(f"  [HTTP] Error de red ({type(e).__name__}). Usando Selenium para VIN {vin}...")
+                    tracing.anotar(motor="http->selenium")
+                    # El portal pudo haber tirado la sesión (ej. 403): la próxima consulta HTTP abre otra.
+                    # Al control de ritmo le llega sólo el resultado final del VIN, vía _entregar
+                    self.http_engine.reiniciar_sesion()
+                except Exception as e:
+                    # Captcha mal formado, falla del OCR, etc.: un VIN raro no puede tirar abajo al worker
+                    self.logger.error(f"  [HTTP] Error inesperado ({type(e).__name__}: {str(e)[:80]}). Usando Selenium para VIN {vin}...")
+                    tracing.anotar(motor="http->selenium")
+                else:
+                    self.logger.info(f"  -> [HTTP] Resultado: {resultado}")
+                    _entregar(
+                        vin, tipo, intento, resultado, dominio, inicio_vin,
+                        clase=clase_de_falla(resultado, self.http_engine.ultimo_texto),
+                        latencia=self.http_engine.ultima_latencia_s,
+                    )
+                    continue
 
-                    # Navegar y entrar al iframe
-                    self._navegar_y_cambiar_iframe(start_url)
+            try:
+                # Verificar sesión y re-inicializar si es necesario
+                if not self._is_driver_alive():
+                    self._reset_driver()
 
-                    # --- PASO 1: Seleccionar radio "Importado" ---
-                    self.logger.info("  -> Seleccionando tipo 'Nacional'...")
-                    opt_radio = self.wait.until(
-                        EC.element_to_be_clickable((By.XPATH, selectors["option_radio"]))
-                    )
-                    self.driver.execute_script(
-                        "arguments[0].scrollIntoView({block: 'center'});", opt_radio
-                    )
-                    time.sleep(0.5)
-                    try:
-                        opt_radio.click()
-                    except Exception:
-                        self.driver.execute_script("arguments[0].click();", opt_radio)
-                    time.sleep(1)
-
-                    # --- PASO 2: Ingresar VIN ---
-                    self.logger.info(f"  -> Ingresando VIN: {vin}")
-                    vin_input = self.wait.until(
-                        EC.visibility_of_element_located((By.XPATH, selectors["vin_input"]))
-                    )
-                    self.driver.execute_script(
-                        "arguments[0].scrollIntoView({block: 'center'});", vin_input
-                    )
-                    time.sleep(0.3)
-                    vin_input.clear()
-                    vin_input.send_keys(str(vin))
+                # Navegar y entrar al iframe
+                self._navegar_y_cambiar_iframe(start_url)
+
+                # --- PASO 1: Seleccionar radio Nacional/Importado ---
+                self._seleccionar_tipo(tipo, selectors)
+
+                # --- PASO 2 y 3: Ingresar VIN y resolver Captcha ---
+                if self._ocr_executor is not None:
+                    # Pipeline: el OCR arranca apenas aparece el captcha, en paralelo con la carga del VIN
+                    self.logger.info(f"  -> Ingresando VIN {vin} con captcha en segundo plano...")
+                    captcha_ok = self._vin_y_captcha_pipeline(vin, selectors)
+                else:
+                    self._ingresar_vin(vin, selectors)
 
-                    # --- PASO 3: Resolver Captcha ---
-                    # Esperamos un poco para que el captcha se cargue
-                    time.sleep(2)
                     self.logger.info("  -> Resolviendo Captcha...")
                     captcha_ok = self.solve_captcha_step(
                         selectors["captcha_image"], selectors["captcha_input"]
                     )
 
-                    if not captcha_ok:
-                        self.logger.error(f"  !! No se pudo resolver el captcha para VIN {vin}.")
-                        results[vin] = "ERROR_CAPTCHA"
-                        consecutive_errors += 1
-                        continue
-
+                if not captcha_ok:
+                    self.logger.error(f"  !! No se pudo resolver el captcha para VIN {vin}.")
+                    resultado = "ERROR_CAPTCHA"
+                else:
                     # --- PASO 4: Enviar Formulario ---
-                    self.logger.info("  -> Enviando consulta...")
-                    submit_btn = self.wait.until(
-                        EC.element_to_be_clickable((By.XPATH, selectors["submit_button"]))
-                    )
-                    self.driver.execute_script(
-                        "arguments[0].scrollIntoView({block: 'center'});", submit_btn
-                    )
-                    time.sleep(0.3)
-                    try:
-                        submit_btn.click()
-                    except Exception:
-                        self.driver.execute_script("arguments[0].click();", submit_btn)
+                    submit_btn = self._enviar_formulario(selectors)
 
                     # --- PASO 5: Leer Resultado ---
-                    time.sleep(4)
                     try:
-                        # NOTA: En este portal, el resultado suele aparecer dentro del mismo iframe.
-                        # No salimos a default_content() a menos que el iframe desaparezca.
-                        try:
-                            body_text = self.driver.find_element(By.TAG_NAME, "body").text
-                        except Exception:
-                            self.logger.warning("  No se pudo leer el body del iframe, reintentando en default_content...")
-                            self.driver.switch_to.default_content()
-                            body_text = self.driver.find_element(By.TAG_NAME, "body").text
-
+                        with tracing.span("resultado"):
+                            t_envio = time.perf_counter()
+                            self._esperar_envio(submit_btn)
+                            # Mientras se muestra el resultado, el próximo VIN ya va cargando en otra pestaña.
+                            # Recién ahora: el GET del formulario renueva el captcha de la sesión PHP y no
+                            # puede llegar antes de que el portal haya procesado este envío.
+                            if self._ocr_executor is not None and self.pipeline_cfg.get("preload_next", True) and cola:
+                                self._precargar_siguiente(self._url_formulario(start_url))
+                            self._esperar_resultado()
+                            latencia = time.perf_counter() - t_envio
+                            body_text = self._leer_body()
+                            resultado, dominio = clasificar_resultado(body_text)
+                        clase = clase_de_falla(resultado, body_text)
                         self.logger.info(f"  -> Resultado obtenido ({len(body_text)} caracteres).")
-                        body_lower = body_text.lower()
-
-                        import re
 
-                        # CASO 1: Captcha incorrecto → marcar para reintento automático
-                        if "incorrecto" in body_lower or "ya utilizado" in body_lower:
-                            results[vin] = "ERROR_CAPTCHA_INCORRECTA"
-                            dominios[vin] = ""
-                            self.logger.warning(f"  !! Captcha incorrecto para VIN {vin}. Se reintentará en próxima corrida.")
-
-                        # CASO 2: Consulta exitosa (la página muestra el dominio)
+                        if resultado == "ERROR_CAPTCHA_INCORRECTA":
+                            self.logger.warning(f"  !! Captcha incorrecto para VIN {vin}.")
+                        elif dominio:
+                            self.logger.info(f"  -> Dominio: '{dominio}' | Resultado: {resultado}")
                         else:
-                            # Extraer dominio con el patrón confirmado del portal DNPRA:
-                            # "con el dominio AI002LB inscripto en el RRSS..."
-                            dominio_match = (
-                                re.search(r'con el dominio\s+([A-Z0-9]{4,10})\s+inscripto', body_text) or
-                                re.search(r'[Dd]ominio\s*:\s*([A-Z0-9]{4,10})', body_text)
-                            )
-                            dominio = dominio_match.group(1) if dominio_match else ""
-                            dominios[vin] = dominio
-
-                            # Clasificar el resultado (Prioridad: Dominio > Vencido > Vigente)
-                            if dominio:
-                                results[vin] = dominio
-                            elif "vencido" in body_lower:
-                                results[vin] = "Vencido"
-                            elif "vigente" in body_lower:
-                                results[vin] = "Vigente"
-                            else:
-                                results[vin] = "Consultado"
-
-                            if dominio:
-                                self.logger.info(f"  -> Dominio: '{dominio}' | Resultado: {results[vin]}")
-                            else:
-                                self.logger.warning(f"  -> Sin dominio en respuesta. Resultado: {results[vin]}")
-
-                        consecutive_errors = 0
+                            self.logger.warning(f"  -> Sin dominio en respuesta. Resultado: {resultado}")
 
                     except Exception as ex:
                         self.logger.error(f"  -> Error leyendo resultado: {ex}")
-                        results[vin] = "Error Lectura"
-                        consecutive_errors += 1
+                        resultado = "Error Lectura"
+                        clase = "timeout" if isinstance(ex, TimeoutException) else "lectura"
 
-                except (WebDriverException, InvalidSessionIdException, NoSuchWindowException) as e:
-                    self.logger.error(f"  !! Sesión caída en VIN {vin}: {type(e).__name__}")
-                    results[vin] = "Error de Sesión"
-                    consecutive_errors += 1
-                    self._reset_driver()
+            except (WebDriverException, InvalidSessionIdException, NoSuchWindowException) as e:
+                self.logger.error(f"  !! Sesión caída en VIN {vin}: {type(e).__name__}")
+                resultado = "Error de Sesión"
+                clase = "sesion"
+                self._reset_driver()
 
-                except Exception as e:
-                    self.logger.warning(f"  !! Error en VIN {vin}: {str(e)[:80]}")
-                    results[vin] = f"Error: {str(e)[:50]}"
-                    consecutive_errors += 1
-                    try:
-                        error_img = os.path.join(self.project_root, "data", f"error_{vin}.png")
-                        self.driver.save_screenshot(error_img)
-                    except Exception:
-                        pass
-
-                # Guardado periódico cada 5 VINs
-                if (i + 1) % 5 == 0 or (i + 1) == len(vins):
-                    self.logger.info(f"  Guardando progreso ({i+1}/{len(vins)})...")
-                    self.data_handler.save_results(results, dominios)
-                    results = {}
-                    dominios = {}
-
-                # Frenado de seguridad
-                if consecutive_errors >= 10:
-                    self.logger.error("10 errores consecutivos. Abortando para proteger el Excel.")
-                    break
+            except Exception as e:
+                self.logger.warning(f"  !! Error en VIN {vin}: {str(e)[:80]}")
+                resultado = f"Error: {str(e)[:50]}"
+                clase = "timeout" if isinstance(e, TimeoutException) else "otro"
+                try:
+                    error_img = os.path.join(self.work_dir, f"error_{vin}.png")
+                    self.driver.save_screenshot(error_img)
+                except Exception:
+                    pass
+
+            self._muestrear_rss()
+            if clase is None:
+                clase = clase_de_falla(resultado)
+            _entregar(vin, tipo, intento, resultado, dominio, inicio_vin, clase=clase, latencia=latencia)
+
+        self._log_pipeline_stats()
+        self.waits.log_resumen()
+        self._log_browser_stats()
+        self.logger.info(f"Control de ritmo: {self.rate.estado()}")
+        if self.captcha_breaker.llaves is not None:
+            self.logger.info(f"Granja Gemini: {self.captcha_breaker.llaves.estado()}")
+        if self.captcha_breaker.memo is not None:
+            self.logger.info(f"Memo de captchas: {self.captcha_breaker.memo.resumen()}")
+        cola.log_resumen(self.logger)
+        if self.radio_reutilizado:
+            self.logger.info(f"Sesión: selección de tipo reutilizada en {self.radio_reutilizado}/{procesados} VINs.")
+        return procesados
+
+    def _muestrear_rss(self):
+        rss = browser_profile.medir_rss_chrome(self.driver) if self.driver else None
+        if rss is not None:
+            self.browser_stats["rss_mb"].append(rss)
+            tracing.anotar(chrome_rss_mb=round(rss, 1))
+
+    def _log_browser_stats(self):
+        cargas = self.browser_stats["cargas_ms"]
+        rss = self.browser_stats["rss_mb"]
+        perfil = self.config.get("browser", {}).get("profile", "normal")
+        partes = [f"perfil '{perfil}'"]
+        if cargas:
+            partes.append(f"carga formulario media {sum(cargas)/len(cargas):.0f} ms (máx {max(cargas):.0f})")
+        if rss:
+            partes.append(f"RSS Chrome medio {sum(rss)/len(rss):.0f} MB (máx {max(rss):.0f})")
+        elif browser_profile.psutil is None:
+            partes.append("RSS no medido (instalar psutil)")
+        self.logger.info("=== Navegador: " + " | ".join(partes) + " ===")
+
+    def _enviar_formulario(self, selectors):
+        """Clickea "Aceptar". Devuelve el botón para poder esperar a que quede stale."""
+        self.logger.info("  -> Enviando consulta...")
+        with tracing.span("envio"):
+            submit_btn = self.wait.until(
+                EC.element_to_be_clickable((By.XPATH, selectors["submit_button"]))
+            )
+            self.driver.execute_script(
+                "arguments[0].scrollIntoView({block: 'center'});", submit_btn
+            )
+            try:
+                submit_btn.click()
+            except Exception:
+                self.driver.execute_script("arguments[0].click();", submit_btn)
+        return submit_btn
+
+    def _seleccionar_tipo(self, tipo, selectors):
+        """Marca el radio del tipo de certificado, salvo que el formulario ya lo tenga marcado."""
+        with tracing.span("radio"):
+            self._marcar_radio(tipo, selectors)
+
+    def _marcar_radio(self, tipo, selectors):
+        nombre = "Importado" if tipo == "I" else "Nacional"
+        radio_xpath = selectors.get("option_radio_tipo", "//input[@name='tcert'][@value='{tipo}']").format(tipo=tipo)
+        opt_radio = self.wait.until(
+            EC.element_to_be_clickable((By.XPATH, radio_xpath))
+        )
+        if opt_radio.is_selected():
+            # El formulario ya vino con el tipo marcado (sesión que ya consultó ese tipo): sin click ni recarga
+            self.radio_reutilizado += 1
+            tracing.anotar(radio_reutilizado=True)
+            self.logger.info(f"  -> Tipo '{nombre}' ya seleccionado (reutilizado).")
+            return
+
+        self.logger.info(f"  -> Seleccionando tipo '{nombre}'...")
+        self.driver.execute_script(
+            "arguments[0].scrollIntoView({block: 'center'});", opt_radio
+        )
+        try:
+            opt_radio.click()
+        except Exception:
+            self.driver.execute_script("arguments[0].click();", opt_radio)
+        # En el portal el click en el radio recarga el formulario (se ve en Recorder/*.json):
+        # esperamos a que el radio viejo quede stale y el documento nuevo termine de cargar
+        self.waits.until("radio_recarga", lambda: EC.staleness_of(opt_radio)(self.driver))
+        self.waits.until(
+            "radio_documento",
+            lambda: self.driver.execute_script("return document.readyState") == "complete",
+            timeout=self.waits.timeouts["radio_recarga"],
+        )
 
-            self.logger.info("Scraping masivo finalizado.")
+    def _ingresar_vin(self, vin, selectors):
+        self.logger.info(f"  -> Ingresando VIN: {vin}")
+        with tracing.span("vin_input"):
+            vin_input = self.wait.until(
+                EC.visibility_of_element_located((By.XPATH, selectors["vin_input"]))
+            )
+            self.driver.execute_script(
+                "arguments[0].scrollIntoView({block: 'center'});", vin_input
+            )
+            vin_input.clear()
+            vin_input.send_keys(str(vin))
+
+    _PALABRAS_RESULTADO = ("dominio", "incorrecto", "ya utilizado", "vigente", "vencido")
+
+    def _esperar_envio(self, submit_btn):
+        """Espera a que el formulario se vaya: el portal ya recibió y procesó el envío (TimeoutException si no)."""
+        self.waits.exigir(
+            "resultado_envio",
+            lambda: EC.staleness_of(submit_btn)(self.driver),
+            timeout=self.waits.timeouts["resultado"],
+        )
 
-        except Exception as e:
-            self.logger.error(f"Error crítico: {str(e)}", exc_info=True)
-            raise
-        finally:
-            self.close()
+    def _esperar_resultado(self):
+        """
+        Espera a que aparezca un texto de resultado reconocible (antes: sleep fijo de 4s). Sin él la
+        página es un formulario viejo o un error: TimeoutException, así el VIN vuelve a la cola.
+        """
+        self.waits.exigir("resultado", lambda: any(
+            palabra in self.driver.execute_script("return document.body.innerText || '';").lower()
+            for palabra in self._PALABRAS_RESULTADO
+        ))
+
+    def _leer_body(self):
+        """Lee el texto de la página de resultado."""
+        # NOTA: En este portal, el resultado suele aparecer dentro del mismo iframe.
+        # No salimos a default_content() a menos que el iframe desaparezca.
+        try:
+            return self.driver.find_element(By.TAG_NAME, "body").text
+        except Exception:
+            self.logger.warning("  No se pudo leer el body del iframe, reintentando en default_content...")
+            self.driver.switch_to.default_content()
+            return self.driver.find_element(By.TAG_NAME, "body").text
+
+    # Extrae con JS puro la imagen con src base64 más grande (el captcha).
+    # Esto evita que Selenium evalúe XPath sobre atributos de src enormes.
+    _JS_CAPTCHA_SRC = """
+        var imgs = document.querySelectorAll('img');
+        var best = null;
+        var bestLen = 0;
+        for (var i = 0; i < imgs.length; i++) {
+            var src = imgs[i].src || '';
+            if (src.startsWith('data:image') && src.length > bestLen) {
+                best = src;
+                bestLen = src.length;
+            }
+        }
+        return best;
+    """
+
+    def _extraer_captcha_src(self):
+        return self.driver.execute_script(self._JS_CAPTCHA_SRC)
+
+    def _decodificar_captcha(self, img_src):
+        """Bytes del PNG del captcha a partir de su src base64 (se resuelve en memoria, sin archivo temporal)."""
+        _, b64_data = img_src.split(",", 1)
+        img_bytes = base64.b64decode(b64_data)
+        self.logger.info(f"  -> Captcha extraído ({len(img_bytes)} bytes).")
+        return img_bytes
+
+    def _escribir_captcha(self, resultado):
+        # Escribir en el campo del captcha via JS (más estable que send_keys)
+        self.driver.execute_script(
+            "document.querySelector('input[name=\"verificador\"]').value = arguments[0];",
+            resultado
+        )
+        self.logger.info(f"  -> Captcha extraído: '{resultado}' (5 dígitos)")
+
+    def _refrescar_captcha(self):
+        """Pide un captcha nuevo pulsando el link "Cargar nuevo código" y espera a que cambie la imagen."""
+        try:
+            anterior = self._extraer_captcha_src()
+            refresh_btn = self.driver.find_element(By.XPATH, "//a[@title='Cargar nuevo código']")
+            self.driver.execute_script("arguments[0].click();", refresh_btn)
+            self.waits.until("captcha_refresco", lambda: self._extraer_captcha_src() not in (None, anterior))
+        except Exception:
+            self.logger.error("  No se pudo encontrar el botón de refrescar captcha.")
 
     def solve_captcha_step(self, image_xpath, input_xpath, max_retries=5):
         """
         Resuelve el captcha usando JavaScript puro para localizar y extraer la imagen.
         Evita XPath sobre el src base64 (que crashea Chrome por su tamaño).
         """
-        import base64
-        captcha_path = os.path.join(self.project_root, "data", "temp_captcha.png")
-
         for attempt in range(max_retries):
+            if attempt > 0:
+                tracing.contar("captcha_reintentos")
             try:
-                time.sleep(1)
-
-                # Extraer captcha con JS puro: busca la imagen con src base64 más grande.
-                # Esto evita que Selenium evalúe XPath sobre atributos de src enormes.
-                img_src = self.driver.execute_script("""
-                    var imgs = document.querySelectorAll('img');
-                    var best = null;
-                    var bestLen = 0;
-                    for (var i = 0; i < imgs.length; i++) {
-                        var src = imgs[i].src || '';
-                        if (src.startsWith('data:image') && src.length > bestLen) {
-                            best = src;
-                            bestLen = src.length;
-                        }
-                    }
-                    return best;
-                """)
+                # Captcha presente = <img src="data:image..."> ya renderizado
+                with tracing.span("captcha_extraccion"):
+                    img_src = self.waits.until("captcha", self._extraer_captcha_src)
+                    img_bytes = self._decodificar_captcha(img_src) if img_src else None
 
                 if not img_src:
-                    self.logger.warning(f"  Captcha no encontrado aún (intento {attempt+1}/{max_retries}). Esperando...")
-                    time.sleep(3)
+                    self.logger.warning(f"  Captcha no encontrado (intento {attempt+1}/{max_retries}).")
                     continue
 
-                # Decodificar base64 y guardar la imagen
-                _, b64_data = img_src.split(",", 1)
-                img_bytes = base64.b64decode(b64_data)
-                with open(captcha_path, "wb") as f:
-                    f.write(img_bytes)
-                self.logger.info(f"  -> Captcha guardado ({len(img_bytes)} bytes).")
-
                 # Resolver con Gemini/EasyOCR
-                resultado = self.captcha_breaker.solve(captcha_path)
+                resultado = self.captcha_breaker.solve(img_bytes)
 
                 if resultado and len(resultado) == 5:
-                    # Escribir en el campo del captcha via JS también (más estable)
-                    self.driver.execute_script(
-                        "document.querySelector('input[name=\"verificador\"]').value = arguments[0];",
-                        resultado
-                    )
-                    self.logger.info(f"  -> Captcha extraído: '{resultado}' (5 dígitos)")
+                    self._escribir_captcha(resultado)
                     return True
                 
                 # Si no tiene 5 dígitos, es casi seguro error en el OCR. 
                 # Refrescamos el captcha pulsando el link "Cargar nuevo código"
                 self.logger.warning(f"  Captcha con longitud incorrecta '{resultado}' ({len(str(resultado))} dígitos). Refrescando...")
-                try:
-                    refresh_btn = self.driver.find_element(By.XPATH, "//a[@title='Cargar nuevo código']")
-                    self.driver.execute_script("arguments[0].click();", refresh_btn)
-                    time.sleep(2)
-                except Exception:
-                    self.logger.error("  No se pudo encontrar el botón de refrescar captcha.")
-                
-                time.sleep(1)
+                self._refrescar_captcha()
 
             except Exception as e:
                 self.logger.error(f"  Error en captcha paso {attempt+1}: {type(e).__name__}: {str(e)[:80]}")
-                time.sleep(2)
 
         return False
 
+    # ------------------------------------------------------------------
+    # Modo pipeline: el OCR corre en segundo plano mientras el navegador trabaja
+    # ------------------------------------------------------------------
+
+    def _solve_cronometrado(self, img_bytes):
+        inicio = time.time()
+        resultado = self.captcha_breaker.solve(img_bytes)
+        return resultado, time.time() - inicio
+
+    def _vin_y_captcha_pipeline(self, vin, selectors):
+        """
+        Extrae el captcha apenas se renderiza y lo manda a resolver en un hilo aparte
+        mientras el navegador carga el VIN. Si el OCR en segundo plano no da 5 dígitos,
+        refresca el captcha y sigue por el camino normal (solve_captcha_step).
+        """
+        with tracing.span("captcha_extraccion"):
+            img_src = self.waits.until("captcha", self._extraer_captcha_src)
+            img_bytes = self._decodificar_captcha(img_src) if img_src else None
+        futuro = None
+        if img_src:
+            futuro = self._ocr_executor.submit(tracing.ligar(self._solve_cronometrado), img_bytes)
+
+        t_navegador = time.time()
+        self._ingresar_vin(vin, selectors)
+        t_navegador = time.time() - t_navegador
+
+        if futuro is None:
+            self.logger.warning("  Captcha no apareció a tiempo para el pipeline. Camino normal...")
+            return self.solve_captcha_step(selectors["captcha_image"], selectors["captcha_input"])
+
+        t_espera = time.time()
+        resultado, t_ocr = futuro.result()
+        t_espera = time.time() - t_espera
+
+        solapado = min(t_ocr, t_navegador)
+        stats = self.pipeline_stats
+        stats["vins"] += 1
+        stats["ocr_s"] += t_ocr
+        stats["navegador_s"] += t_navegador
+        stats["solapado_s"] += solapado
+        stats["espera_s"] += t_espera
+        self.logger.info(
+            f"  -> Pipeline: OCR {t_ocr:.1f}s | navegador {t_navegador:.1f}s | "
+            f"solapado {solapado:.1f}s | espera {t_espera:.1f}s"
+        )
+        tracing.anotar(pipeline_solapado_s=round(solapado, 3), pipeline_espera_s=round(t_espera, 3))
+
+        if resultado and len(resultado) == 5:
+            self._escribir_captcha(resultado)
+            return True
+
+        self.logger.warning(f"  Captcha en segundo plano con longitud incorrecta '{resultado}'. Refrescando...")
+        self._refrescar_captcha()
+        return self.solve_captcha_step(selectors["captcha_image"], selectors["captcha_input"])
+
+    def _precargar_siguiente(self, url):
+        """Abre el formulario del próximo VIN en otra pestaña; window.open no bloquea, carga de fondo."""
+        try:
+            handles_antes = set(self.driver.window_handles)
+            self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+            nuevos = set(self.driver.window_handles) - handles_antes
+            if nuevos:
+                self._tab_precargada = (nuevos.pop(), time.time(), url)
+        except Exception as e:
+            self.logger.warning(f"  No se pudo precargar la próxima pestaña: {type(e).__name__}")
+            self._tab_precargada = None
+
+    def _usar_tab_precargada(self):
+        """Cierra la pestaña actual y pasa a la precargada. Devuelve la URL precargada, o None si no había."""
+        if not self._tab_precargada:
+            return None
+        handle, t_precarga, url = self._tab_precargada
+        self._tab_precargada = None
+        try:
+            self.driver.close()
+            self.driver.switch_to.window(handle)
+        except Exception as e:
+            self.logger.warning(f"  Pestaña precargada inválida ({type(e).__name__}). Navegando normal...")
+            try:
+                self.driver.switch_to.window(self.driver.window_handles[0])
+            except Exception:
+                pass
+            return None
+        # El bloqueo por CDP es por pestaña: re-aplicarlo para las navegaciones siguientes en ésta
+        browser_profile.aplicar_bloqueos(self.driver, self.config)
+        oculto = time.time() - t_precarga
+        self.pipeline_stats["precarga_s"] += oculto
+        self.logger.info(f"  -> Usando pestaña precargada (carga oculta {oculto:.1f}s).")
+        return url
+
+    def _log_pipeline_stats(self):
+        stats = self.pipeline_stats
+        if not stats["vins"]:
+            return
+        n = stats["vins"]
+        ahorro = stats["solapado_s"] + stats["precarga_s"]
+        self.logger.info(
+            f"=== Pipeline: {n} VINs | OCR medio {stats['ocr_s']/n:.1f}s | navegador en paralelo {stats['navegador_s']/n:.1f}s | "
+            f"espera media {stats['espera_s']/n:.1f}s | tiempo oculto total {ahorro:.0f}s ({ahorro/n:.1f}s/VIN) ==="
+        )
 
     def close(self):
         """Cierre seguro de recursos."""
+        if self.http_engine:
+            self.http_engine.close()
+        if self._ocr_executor:
+            self._ocr_executor.shutdown(wait=False)
+        self.captcha_breaker.cerrar()
         if self.driver:
             try:
                 self.logger.info("Cerrando el navegador.")
                 self.driver.quit()
             except Exception:
                 pass
+        self.driver_manager.cerrar()
@@ -0,0 +1,105 @@
+import logging
+
+from selenium import webdriver
+
+try:
+    import psutil
+except ImportError:  # Opcional: sólo para medir la RAM de Chrome
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Recursos que el formulario no necesita. El captcha viaja como data:image (no es un request
+# de red), así que bloquear imágenes por URL no lo afecta.
+DEFAULT_BLOCKED_URLS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp",
+]
+
+
+def _perfil(config):
+    browser = config.get("browser", {})
+    nombre = browser.get("profile", "normal")
+    return nombre, (browser.get("lean", {}) if nombre == "lean" else {})
+
+
+def construir_opciones(config):
+    """ChromeOptions según `browser.profile`: "normal" (ventana visible) o "lean" (headless liviano)."""
+    nombre, lean = _perfil(config)
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    if nombre == "lean":
+        if lean.get("headless", True):
+            options.add_argument("--headless=new")
+        options.add_argument(f"--window-size={lean.get('window_size', '1280,900')}")
+        for flag in (
+            "--disable-extensions",
+            "--disable-gpu",
+            "--disable-background-networking",
+            "--disable-background-timer-throttling",
+            "--disable-renderer-backgrounding",
+            "--disable-sync",
+            "--disable-default-apps",
+            "--disable-component-update",
+            "--metrics-recording-only",
+            "--no-first-run",
+            "--mute-audio",
+        ):
+            options.add_argument(flag)
+        # "eager": driver.get vuelve con el DOM listo, sin esperar imágenes/estilos
+        options.page_load_strategy = lean.get("page_load_strategy", "eager")
+
+    return options
+
+
+def es_headless(config):
+    nombre, lean = _perfil(config)
+    return nombre == "lean" and lean.get("headless", True)
+
+
+def aplicar_bloqueos(driver, config):
+    """Bloquea por CDP los recursos no esenciales (sólo perfil lean). Aplica a la pestaña actual."""
+    nombre, lean = _perfil(config)
+    if nombre != "lean":
+        return
+    urls = list(lean.get("blocked_urls", DEFAULT_BLOCKED_URLS))
+    if lean.get("block_css", False):
+        urls.append("*.css")
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+    except Exception as e:
+        logger.warning(f"No se pudo aplicar el bloqueo de recursos por CDP: {e}")
+
+
+def medir_carga_pagina(driver):
+    """Duración (ms) de la última navegación del documento actual, según la Navigation Timing API."""
+    try:
+        return driver.execute_script(
+            "var n = performance.getEntriesByType('navigation')[0];"
+            "return n ? Math.round(n.duration || (n.domContentLoadedEventEnd - n.startTime)) : null;"
+        )
+    except Exception:
+        return None
+
+
+def medir_rss_chrome(driver):
+    """RSS total (MB) de chromedriver + todos los procesos de Chrome que cuelgan de él. None sin psutil."""
+    if psutil is None:
+        return None
+    try:
+        raiz = psutil.Process(driver.service.process.pid)
+        procesos = [raiz] + raiz.children(recursive=True)
+        total = 0
+        for p in procesos:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+    except Exception:
+        return None
@@ -1,22 +1,138 @@
-import cv2
-import pytesseract
-import numpy as np
+import importlib
+import io
 import logging
 from PIL import Image
 import os
-import easyocr
+import random
+import threading
 import time
-import shutil
-from datetime import datetime
-import httpx
-from google import genai
-from google.genai import types as genai_types
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
+from src.utils import tracing
+from src.utils.captcha_memo import CaptchaMemo, dhash
+from src.utils.dataset_writer import DatasetWriter, sha256
+from src.utils.key_scheduler import clasificar_error, crear_scheduler, llaves_gemini, sondear
+from src.utils.ocr_stats import StrategyStats
+
+try:
+    import psutil
+except ImportError:  # Opcional: sólo para loguear la RAM que suma cada motor
+    psutil = None
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Los motores pesados (torch/easyocr, cv2, pytesseract, google.genai) se importan recién
+# cuando se usan: con la granja Gemini sana el tier local casi nunca corre, y cada worker
+# se ahorra segundos de arranque y cientos de MB.
+_modulos = {}
+_modulos_lock = threading.Lock()
+tiempos_import = {}
+
+
+def _rss_mb():
+    if psutil is None:
+        return None
+    try:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _lazy(nombre):
+    """Importa (una sola vez por proceso) un módulo pesado y registra cuánto tardó."""
+    modulo = _modulos.get(nombre)
+    if modulo is not None:
+        return modulo
+    with _modulos_lock:
+        if nombre not in _modulos:
+            t0 = time.perf_counter()
+            _modulos[nombre] = importlib.import_module(nombre)
+            tiempos_import[nombre] = time.perf_counter() - t0
+            logger.debug(f"Import diferido de {nombre}: {tiempos_import[nombre]:.2f}s")
+        return _modulos[nombre]
+
+
+class CaptchaImagen:
+    """
+    Captcha en memoria, decodificado una sola vez y compartido por todos los tiers (y por los
+    hilos del hedge). Se construye con los bytes del PNG (el src base64 ya decodificado), con
+    un ndarray BGR o con un path; sólo el dataset lo escribe a disco.
+    """
+
+    def __init__(self, datos):
+        self._lock = threading.Lock()
+        self._bytes = None
+        self._bgr = None
+        self._pil = None
+        self._sha = None
+        self._phash = None
+        self.nombre = "captcha en memoria"
+        if isinstance(datos, (bytes, bytearray, memoryview)):
+            self._bytes = bytes(datos)
+        elif isinstance(datos, (str, os.PathLike)):
+            self.nombre = os.path.basename(datos)
+            with open(datos, "rb") as f:
+                self._bytes = f.read()
+        else:
+            self._bgr = datos
+
+    @property
+    def bytes(self):
+        """PNG original (o re-codificado si se construyó desde un ndarray)."""
+        if self._bytes is None:
+            with self._lock:
+                if self._bytes is None:
+                    ok, png = _lazy("cv2").imencode(".png", self._bgr)
+                    self._bytes = png.tobytes() if ok else b""
+        return self._bytes
+
+    @property
+    def sha256(self):
+        """Hash del contenido: clave del dataset."""
+        if self._sha is None:
+            self._sha = sha256(self.bytes)
+        return self._sha
+
+    @property
+    def phash(self):
+        """Hash perceptual (dHash de 64 bits) para reconocer el mismo captcha re-codificado."""
+        if self._phash is None and self.bgr is not None:
+            cv2 = _lazy("cv2")
+            self._phash = dhash(cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+        return self._phash
+
+    @property
+    def bgr(self):
+        """ndarray BGR para OpenCV/EasyOCR, o None si los bytes no son una imagen."""
+        if self._bgr is None:
+            with self._lock:
+                if self._bgr is None:
+                    import numpy as np
+                    cv2 = _lazy("cv2")
+                    self._bgr = cv2.imdecode(np.frombuffer(self.bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._bgr
+
+    @property
+    def pil(self):
+        """PIL.Image para Gemini."""
+        if self._pil is None:
+            with self._lock:
+                if self._pil is None:
+                    img = Image.open(io.BytesIO(self.bytes))
+                    img.load()
+                    self._pil = img
+        return self._pil
+
+
+def _como_captcha(fuente):
+    return fuente if isinstance(fuente, CaptchaImagen) else CaptchaImagen(fuente)
+
+
 class CaptchaBreaker:
     """
     Motor OCR en Cascada de 3 Capas:
@@ -25,111 +141,263 @@ class CaptchaBreaker:
     3. Tesseract + OpenCV (OCR Clásico, último recurso)
     """
     
-    def __init__(self, tesseract_cmd_path=None):
-        if tesseract_cmd_path:
-            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd_path
-            
+    # Magnitudes de EasyOCR que se prueban sobre cada variante de preprocesamiento
+    MAG_RATIOS = (4.0, 6.0)
+
+    def __init__(self, tesseract_cmd_path=None, warmup=None, ocr_config=None, gemini_config=None, key_scheduler=None):
+        # ocr_config / gemini_config: secciones `ocr:` y `gemini:` del YAML
+        # key_scheduler: el KeyScheduler del WorkerPool (cuotas compartidas entre workers)
+        self.ocr_cfg = ocr_config or {}
+        if warmup is None:
+            warmup = self.ocr_cfg.get("warmup_local", False)
+        self.tesseract_cmd_path = tesseract_cmd_path
+        self._tesseract_listo = False
+        t_inicio = time.perf_counter()
+        rss_inicio = _rss_mb()
+
         # 1. Init Gemini Farm (Soporte para múltiples API Keys)
         self.gemini_clients = []
-        self.current_key_index = 0
-        self.exhausted_keys = set()
-        
-        gemini_keys_str = os.getenv("GEMINI_API_KEYS")
-        if gemini_keys_str:
-            keys = [k.strip() for k in gemini_keys_str.split(",") if k.strip()]
+        self.gemini_ready = False
+        self.llaves = None
+        # Sin scheduler del WorkerPool, este proceso es dueño del estado de la granja y lo persiste
+        self._llaves_propias = False
+
+        keys = llaves_gemini(gemini_config)
+        if keys:
+            genai = _lazy("google.genai")
+            keys_ok = []
             for i, key in enumerate(keys):
                 try:
                     # HttpOptions con timeout de 30s para evitar colgadas por 503/disconnects
                     client = genai.Client(api_key=key)
                     self.gemini_clients.append(client)
+                    keys_ok.append(key)
                     logger.info(f"✅ Gemini Key #{i+1} configurada ({key[:5]}...{key[-5:]})")
                 except Exception as e:
                     logger.error(f"Error configurando Gemini Key #{i+1}: {e}")
             
             if self.gemini_clients:
                 self.gemini_ready = True
-                logger.info(f"🚀 Granja de Gemini inicializada con {len(self.gemini_clients)} llaves.")
+                if key_scheduler is not None and key_scheduler.n == len(self.gemini_clients):
+                    self.llaves = key_scheduler
+                else:
+                    self.llaves = crear_scheduler(keys_ok, gemini_config, _PROJECT_ROOT)
+                    self._llaves_propias = True
+                    if (gemini_config or {}).get("sondeo_inicial", True):
+                        sondear(self.llaves, keys_ok, clientes=self.gemini_clients)
+                logger.info(
+                    f"🚀 Granja de Gemini inicializada con {len(self.gemini_clients)} llaves "
+                    f"({self.llaves.rpm} RPM / {self.llaves.rpd} RPD por llave)."
+                )
+        elif not (gemini_config or {}).get("enabled", True):
+            logger.info("Granja Gemini deshabilitada (gemini.enabled: false). Saltando Tier 1.")
         else:
             logger.warning("No se encontró GEMINI_API_KEYS en .env. Saltando Tier 1.")
             
-        # 2. Init EasyOCR
+        # 2. EasyOCR se carga en el primer uso (o ya mismo en segundo plano si warmup=True)
+        self.stats_easyocr = {"rapido": 0, "completo": 0}
+        # Orden de estrategias aprendido de aciertos históricos (corte temprano del voto)
+        stats_path = self._cfg_corte().get("stats_path", "data/ocr_estrategias.json")
+        self.estrategias = StrategyStats(
+            os.path.join(_PROJECT_ROOT, stats_path), guardar_cada=self._cfg_corte().get("guardar_cada", 20)
+        )
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._warmup_thread = None
+        # Pool de procesos opcional para el tier local (ocr.pool), creado en el primer uso
+        self._pool = None
+        self._pool_roto = False
+        # Hilos del modo hedge (ocr.hedge): Gemini y EasyOCR en carrera
+        self._hedge_executor = None
+
+        # 3. Dataset de entrenamiento: escritura en segundo plano, deduplicada por hash
+        dataset_cfg = self.ocr_cfg.get("dataset", {})
+        self.dataset = None
+        if dataset_cfg.get("enabled", True):
+            self.dataset = DatasetWriter(
+                os.path.join(_PROJECT_ROOT, dataset_cfg.get("dir", "data/dataset")),
+                max_cola=dataset_cfg.get("max_cola", 1000),
+            )
+        # Memo de captchas repetidos: una lectura ya hecha se devuelve sin gastar Gemini ni EasyOCR
+        memo_cfg = self.ocr_cfg.get("memo", {})
+        self.memo = None
+        if memo_cfg.get("enabled", True):
+            self.memo = CaptchaMemo(memo_cfg.get("max_entradas", 5000), memo_cfg.get("distancia_max", 2))
+            if self.dataset is not None:
+                self.memo.precargar(self.dataset.dir)
+        # Hash y lectura del último captcha resuelto, a la espera del veredicto del portal
+        self._ultimo_sha = None
+        self._ultima_lectura = None
+        # sha → lecturas por estrategia del corte temprano; se puntúan cuando el portal acepta
+        self._lecturas_pendientes = {}
+
+        rss = _rss_mb()
+        ram = f", RSS {rss:.0f} MB (+{rss - rss_inicio:.0f})" if rss is not None and rss_inicio is not None else ""
+        imports = ", ".join(f"{m} {t:.2f}s" for m, t in tiempos_import.items())
+        logger.info(
+            f"CaptchaBreaker listo en {time.perf_counter() - t_inicio:.2f}s{ram}"
+            f"{f' (imports: {imports})' if imports else ''}. "
+            f"Tier local diferido{' (precargando en segundo plano)' if warmup else ''}."
+        )
+        if warmup:
+            self.calentar()
+
+    @property
+    def reader(self):
+        """easyocr.Reader, construido en el primer acceso (thread-safe)."""
+        if self._reader is None:
+            with self._reader_lock:
+                if self._reader is None:
+                    self._reader = self._cargar_easyocr()
+        return self._reader
+
+    def _cargar_easyocr(self):
         logger.info("Cargando cerebro neuronal local de EasyOCR (puede demorar unos segundos la primera vez)...")
-        self.reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-        logger.info("✅ EasyOCR inicializado en RAM.")
+        rss_antes = _rss_mb()
+        t0 = time.perf_counter()
+        easyocr = _lazy("easyocr")
+        t_import = time.perf_counter() - t0
+        reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+        t_total = time.perf_counter() - t0
+        rss = _rss_mb()
+        ram = f", RSS +{rss - rss_antes:.0f} MB" if rss is not None and rss_antes is not None else ""
+        logger.info(f"✅ EasyOCR inicializado en RAM en {t_total:.1f}s (import {t_import:.1f}s, modelo {t_total - t_import:.1f}s{ram}).")
+        return reader
+
+    def calentar(self):
+        """Carga EasyOCR (y cv2) en un hilo aparte para que el primer fallback local no espere."""
+        if self._warmup_thread is None and self._reader is None:
+            def _cargar():
+                try:
+                    _lazy("cv2")
+                    if self._usar_pool():
+                        self._obtener_pool().calentar()
+                    else:
+                        _ = self.reader
+                except Exception as e:
+                    logger.error(f"No se pudo precargar EasyOCR: {e}")
+            self._warmup_thread = threading.Thread(target=_cargar, name="ocr-warmup", daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _usar_pool(self):
+        return bool((self.ocr_cfg.get("pool") or {}).get("enabled", False)) and not self._pool_roto
+
+    def _obtener_pool(self):
+        """OcrPool persistente con los modelos precargados en cada proceso (thread-safe)."""
+        if self._pool is None:
+            with self._reader_lock:
+                if self._pool is None:
+                    from src.utils.ocr_pool import OcrPool, procesos_ocr
+                    pool_cfg = self.ocr_cfg.get("pool") or {}
+                    procesos = procesos_ocr(pool_cfg)
+                    logger.info(f"Levantando pool OCR de {procesos} procesos (modelos precargados)...")
+                    self._pool = OcrPool(
+                        procesos,
+                        tesseract_cmd=self.tesseract_cmd_path,
+                        hilos_por_proceso=pool_cfg.get("hilos_por_proceso", 1),
+                    )
+        return self._pool
 
-    def solve_with_gemini(self, image_path: str) -> str:
-        """ Motor Tier 1: Gemini Farm con Rotación de Llaves y Reintentos """
+    def _en_pool(self, metodo, *args):
+        """Corre `metodo` del pool; si el pool se rompe se apaga y devuelve None (lectura en proceso)."""
+        try:
+            return getattr(self._obtener_pool(), metodo)(*args)
+        except Exception as e:
+            logger.warning(f"⚠️ Pool OCR no disponible ({e}); se sigue leyendo en este proceso.")
+            self._pool_roto = True
+            # Sólo el pool: el hedge y el dataset pueden estar atendiendo un solve en curso
+            self._cerrar_pool()
+            return None
+
+    def _cerrar_pool(self):
+        if self._pool is not None:
+            self._pool.cerrar()
+            self._pool = None
+
+    def cerrar(self):
+        """Libera el pool de procesos OCR (si se llegó a crear), los hilos del hedge y el dataset."""
+        self._cerrar_pool()
+        self.estrategias.guardar()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+            self._hedge_executor = None
+        if self.dataset is not None:
+            self.dataset.cerrar()
+
+    def _pytesseract(self):
+        pytesseract = _lazy("pytesseract")
+        if not self._tesseract_listo:
+            if self.tesseract_cmd_path:
+                pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd_path
+            self._tesseract_listo = True
+        return pytesseract
+
+    def solve_with_gemini(self, captcha, cancelar=None) -> str:
+        """ Motor Tier 1: Gemini Farm con token bucket por llave (sin pausas fijas) """
         if not self.gemini_ready or not self.gemini_clients:
             return ""
 
-        # Intentar con cada cliente disponible que no esté marcado como agotado
-        start_idx = self.current_key_index
-        for i in range(len(self.gemini_clients)):
-            idx = (start_idx + i) % len(self.gemini_clients)
-            
-            if idx in self.exhausted_keys:
-                continue
-                
+        prompt = (
+            "Esta es una imagen de un CAPTCHA con números fuertemente tachados por ruido adversario. "
+            "Tu única tarea es leer los números (suele haber 5). "
+            "Ignora absolutamente todas las rayas. Responde ÚNICAMENTE con la cadena de números (ejemplo: 12345) y nada más. "
+            "Si un caracter está tapado pero la forma base se parece a un número, deducilo pero devuelve solo números."
+        )
+        try:
+            img = _como_captcha(captcha).pil
+        except Exception as e:
+            logger.error(f"❌ Captcha ilegible para Gemini: {e}")
+            return ""
+
+        # Cada llave se prueba a lo sumo una vez por captcha; si falla, rotamos a la siguiente
+        intentadas = set()
+        while len(intentadas) < len(self.gemini_clients):
+            if cancelar is not None and cancelar.is_set():
+                return ""
+            idx = self.llaves.adquirir(excluir=intentadas)
+            if idx is None:
+                break
+            intentadas.add(idx)
             client = self.gemini_clients[idx]
-            
-            # Throttling base: 5s para respetar cuota free (15 RPM).
-            base_delay = 5
-            max_retries = 0  # Sin reintentos: si falla, rotamos a la siguiente llave
-            
-            for attempt in range(max_retries + 1):
-                if attempt > 0:
-                    wait_time = 5 * (2 ** (attempt - 1))
-                    logger.warning(f"⚠️ Reintento {attempt}/{max_retries} para Gemini (Key #{idx+1}). Esperando {wait_time}s...")
-                    time.sleep(wait_time)
+            logger.info(f"⏳ Enviando a Gemini (Key #{idx+1})...")
+
+            resultado = "error"
+            t0 = time.perf_counter()
+            try:
+                response = client.models.generate_content(
+                    model='gemini-flash-latest',
+                    contents=[prompt, img]
+                )
+                text = "".join(filter(str.isdigit, response.text.strip()))
+                if text:
+                    resultado = "ok"
+                    return text
+                resultado = "vacia"
+                logger.warning(f"Respuesta vacía de Gemini (Key #{idx+1}).")
+
+            except Exception as e:
+                error_msg = str(e)
+                logger.debug(f"DEBUG: Gemini Error completo: {error_msg}")
+
+                resultado = clasificar_error(error_msg)
+                if resultado == "429":
+                    logger.error(f"❌ Cuota Agotada (429) para Gemini Key #{idx+1}. Rotando...")
+                elif resultado == "503":
+                    logger.error(f"⚠️ Servidor Sobrecargado (503) para Gemini Key #{idx+1}. Rotando...")
+                elif resultado == "403":
+                    logger.error(f"❌ Permiso Denegado (403) para Gemini Key #{idx+1}. Rotando...")
                 else:
-                    logger.info(f"⏳ Enviando a Gemini (Key #{idx+1}, pausa {base_delay}s)...")
-                    time.sleep(base_delay)
-                
-                try:
-                    img = Image.open(image_path)
-                    prompt = (
-                        "Esta es una imagen de un CAPTCHA con números fuertemente tachados por ruido adversario. "
-                        "Tu única tarea es leer los números (suele haber 5). "
-                        "Ignora absolutamente todas las rayas. Responde ÚNICAMENTE con la cadena de números (ejemplo: 12345) y nada más. "
-                        "Si un caracter está tapado pero la forma base se parece a un número, deducilo pero devuelve solo números."
-                    )
-                    
-                    response = client.models.generate_content(
-                        model='gemini-flash-latest',
-                        contents=[prompt, img]
-                    )
-                    text = response.text.strip()
-                    text = "".join(filter(str.isdigit, text))
-                    if text:
-                        return text
-                    else:
-                        logger.warning(f"Respuesta vacía de Gemini (Key #{idx+1}) en intento {attempt}.")
-                        
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.debug(f"DEBUG: Gemini Error completo: {error_msg}")
-                    
-                    if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                        logger.error(f"❌ Cuota Agotada (429) para Gemini Key #{idx+1}. Rotando...")
-                        self.exhausted_keys.add(idx)
-                        break
-                    elif "503" in error_msg or "UNAVAILABLE" in error_msg:
-                        logger.error(f"⚠️ Servidor Sobrecargado (503) para Gemini Key #{idx+1}. Rotando...")
-                        break
-                    elif "404" in error_msg:
-                        logger.error(f"⚠️ Modelo No Encontrado (404) para Gemini Key #{idx+1}. Intentando fallback...")
-                        # Fallback a gemini-flash-latest si 1.5-flash falla
-                        try:
-                            response = client.models.generate_content(model='gemini-flash-latest', contents=[prompt, img])
-                            text = "".join(filter(str.isdigit, response.text.strip()))
-                            if text: return text
-                        except: pass
-                        break
-                    else:
-                        logger.error(f"❌ Error Crítico Gemini (Key #{idx+1}): {error_msg}")
-                        break
-        
-        logger.error("❌ CRÍTICO: Todas las llaves de la granja Gemini están agotadas o fallaron.")
+                    logger.error(f"❌ Error Crítico Gemini (Key #{idx+1}): {error_msg}")
+            finally:
+                self.llaves.liberar(idx, resultado, latencia_s=time.perf_counter() - t0)
+                if self._llaves_propias:
+                    self.llaves.guardar()
+
+        if self.llaves.disponibles() == 0:
+            logger.error("❌ CRÍTICO: Todas las llaves de la granja Gemini están agotadas.")
+        else:
+            logger.error("❌ Gemini no resolvió el captcha (llaves sin capacidad inmediata o con error).")
         return ""
 
     def _preprocess_variants(self, img_bgr):
@@ -137,6 +405,7 @@ class CaptchaBreaker:
         Genera múltiples versiones preprocesadas de la imagen del captcha DNPRA.
         Optimizado para: fondo teal claro, dígitos oscuros, líneas cruzadas.
         """
+        cv2 = _lazy("cv2")
         variants = {}
         h, w = img_bgr.shape[:2]
         # Escalar a tamaño mínimo razonable para OCR
@@ -186,63 +455,296 @@ class CaptchaBreaker:
 
         return variants
 
+    @staticmethod
+    def _solo_digitos(resultados):
+        if not resultados:
+            return ""
+        texto = "".join(resultados).strip()
+        return "".join(filter(str.isdigit, texto))
+
     def _run_easyocr(self, img, mag_ratio=4.0) -> str:
         """ Ejecuta EasyOCR sobre una imagen (numpy array o path) """
         try:
             resultados = self.reader.readtext(img, allowlist='0123456789', detail=0, mag_ratio=mag_ratio)
-            if not resultados:
-                return ""
-            texto = "".join(resultados).strip()
-            return "".join(filter(str.isdigit, texto))
+            return self._solo_digitos(resultados)
+        except Exception:
+            return ""
+
+    def _run_easyocr_batched(self, imgs, mag_ratio=4.0):
+        """
+        EasyOCR sobre varias imágenes del mismo tamaño en UNA llamada (readtext_batched): el
+        detector corre una sola vez para todo el lote. Devuelve un texto por imagen.
+        """
+        h, w = imgs[0].shape[:2]
+        resultados = self.reader.readtext_batched(
+            imgs, n_width=w, n_height=h, allowlist='0123456789', detail=0, mag_ratio=mag_ratio
+        )
+        return [self._solo_digitos(r) for r in resultados]
+
+    def _run_easyocr_batched_detalle(self, imgs, mag_ratio=4.0):
+        """Como `_run_easyocr_batched` pero con detail=1: un (texto, confianza) por imagen."""
+        h, w = imgs[0].shape[:2]
+        resultados = self.reader.readtext_batched(
+            imgs, n_width=w, n_height=h, allowlist='0123456789', detail=1, mag_ratio=mag_ratio
+        )
+        return [
+            (self._solo_digitos([r[1] for r in res]), float(min(r[2] for r in res))) if res else ("", 0.0)
+            for res in resultados
+        ]
+
+    def _run_recognizer(self, img, crop=None):
+        """
+        (texto, confianza) pasando la imagen directo al reconocedor de EasyOCR, sin el detector
+        CRAFT: el captcha es siempre una sola línea de 5 dígitos. crop = [x0, y0, x1, y1] en
+        fracciones de la imagen (None = imagen completa).
+        """
+        horizontal_list, free_list = None, None
+        if crop:
+            h, w = img.shape[:2]
+            x0, y0, x1, y1 = crop
+            horizontal_list, free_list = [[int(x0 * w), int(x1 * w), int(y0 * h), int(y1 * h)]], []
+        resultados = self.reader.recognize(
+            img, horizontal_list=horizontal_list, free_list=free_list, allowlist='0123456789', detail=1
+        )
+        if not resultados:
+            return "", 0.0
+        texto = self._solo_digitos([r[1] for r in resultados])
+        return texto, float(min(r[2] for r in resultados))
+
+    def _lectura_rapida(self, variants, cancelar=None):
+        """
+        Camino rápido: reconocedor solo sobre cada variante y voto entre las lecturas de 5 dígitos.
+        Devuelve (ganador, confianza media) si alcanza `ocr.recognizer_min_conf`, o None para
+        caer al readtext completo.
+        """
+        from collections import Counter
+        min_conf = self.ocr_cfg.get("recognizer_min_conf", 0.5)
+        crop = self.ocr_cfg.get("recognizer_crop")
+        confianzas = {}
+        for nombre, img_var in variants.items():
+            if cancelar is not None and cancelar.is_set():
+                return None
+            try:
+                texto, conf = self._run_recognizer(img_var, crop=crop)
+            except Exception as e:
+                logger.debug(f"  [rápido:{nombre}] error: {e}")
+                continue
+            logger.debug(f"  [rápido:{nombre}] → '{texto}' ({conf:.2f})")
+            if len(texto) == 5:
+                confianzas.setdefault(texto, []).append(conf)
+
+        if not confianzas:
+            return None
+        votos = Counter({t: len(c) for t, c in confianzas.items()})
+        ganador, n = votos.most_common(1)[0]
+        conf_media = sum(confianzas[ganador]) / n
+        if conf_media < min_conf:
+            logger.info(f"EasyOCR rápido dudoso: '{ganador}' (conf {conf_media:.2f} < {min_conf}). Usando lectura completa...")
+            return None
+        logger.info(f"✅ EasyOCR rápido (sin detector): '{ganador}' ({n}/{len(variants)} votos, conf {conf_media:.2f})")
+        return ganador, conf_media
+
+    def _cfg_corte(self):
+        """Sección `ocr.early_exit`; admite también `early_exit: false` como atajo."""
+        cfg = self.ocr_cfg.get("early_exit", {})
+        return cfg if isinstance(cfg, dict) else {"enabled": bool(cfg)}
+
+    def _run_easyocr_detalle(self, img, mag_ratio=4.0):
+        """(texto, confianza) de EasyOCR con detail=1; la confianza es la del fragmento más dudoso."""
+        try:
+            resultados = self.reader.readtext(img, allowlist='0123456789', detail=1, mag_ratio=mag_ratio)
         except Exception:
+            return "", 0.0
+        if not resultados:
+            return "", 0.0
+        return self._solo_digitos([r[1] for r in resultados]), float(min(r[2] for r in resultados))
+
+    def _leer_grupo(self, variants, grupo):
+        """
+        [(clave, texto, confianza)] de un grupo de estrategias [(clave, (variante, mag))], en el
+        orden dado. Con `ocr.easyocr_batched` va una llamada por magnitud en vez de una por estrategia.
+        """
+        if len(grupo) > 1 and self.ocr_cfg.get("easyocr_batched", True):
+            try:
+                por_mag = {}
+                for clave, (nombre, mag) in grupo:
+                    por_mag.setdefault(mag, []).append((clave, nombre))
+                leidas = {}
+                for mag, estrategias in por_mag.items():
+                    imgs = [variants[nombre] for _, nombre in estrategias]
+                    res = self._run_easyocr_batched_detalle(imgs, mag_ratio=mag)
+                    leidas.update(zip((clave for clave, _ in estrategias), res))
+                return [(clave, *leidas[clave]) for clave, _ in grupo]
+            except Exception as e:
+                logger.warning(f"EasyOCR por lotes falló ({e}); leyendo estrategia por estrategia.")
+        return [
+            (clave, *self._run_easyocr_detalle(variants[nombre], mag_ratio=mag))
+            for clave, (nombre, mag) in grupo
+        ]
+
+    def _leer_con_corte(self, variants, cancelar=None):
+        """
+        Evalúa las estrategias (variante@magnitud) en el orden aprendido, en grupos de
+        `early_exit.lote` (uno por llamada si easyocr_batched está apagado), y corta al terminar
+        el grupo en el que `quorum` lecturas de 5 dígitos coinciden o una sola supera `high_conf`.
+        Con probabilidad `exploracion` no corta: se evalúan todas para que el historial de las
+        estrategias que quedaron al fondo del orden también se actualice.
+        Devuelve (ganador o None, candidatos, lecturas evaluadas [(clave, texto)]).
+        """
+        from collections import Counter
+        cfg = self._cfg_corte()
+        quorum = cfg.get("quorum", 3)
+        conf_alta = cfg.get("high_conf", 0.9)
+        tam = max(1, cfg.get("lote", 4)) if self.ocr_cfg.get("easyocr_batched", True) else 1
+        explorar = random.random() < cfg.get("exploracion", 0.1)
+
+        claves = {f"{n}@{mag}": (n, mag) for n in variants for mag in self.MAG_RATIOS}
+        orden = self.estrategias.ordenar(list(claves))
+        candidatos, lecturas = [], []
+        votos = Counter()
+        ganador = None
+        for i in range(0, len(orden), tam):
+            if cancelar is not None and cancelar.is_set():
+                break
+            grupo = [(clave, claves[clave]) for clave in orden[i:i + tam]]
+            for clave, texto, conf in self._leer_grupo(variants, grupo):
+                lecturas.append((clave, texto))
+                if not texto:
+                    continue
+                candidatos.append(texto)
+                logger.debug(f"  [{clave}] → '{texto}' ({conf:.2f})")
+                if len(texto) == 5:
+                    votos[texto] += 1
+                    if ganador is None and (votos[texto] >= quorum or conf >= conf_alta):
+                        ganador = texto
+            if ganador and not explorar:
+                break
+        return ganador, candidatos, lecturas
+
+    def _leer_variantes(self, variants, mag_ratios):
+        """
+        [(variante, mag, texto)] en el orden variante → magnitud (el mismo de la votación original).
+        Con `ocr.easyocr_batched` se hace una llamada por magnitud en vez de una por variante.
+        """
+        if self.ocr_cfg.get("easyocr_batched", True):
+            try:
+                nombres = list(variants)
+                imgs = [variants[n] for n in nombres]
+                por_mag = {mag: self._run_easyocr_batched(imgs, mag_ratio=mag) for mag in mag_ratios}
+                return [(n, mag, por_mag[mag][i]) for i, n in enumerate(nombres) for mag in mag_ratios]
+            except Exception as e:
+                logger.warning(f"EasyOCR por lotes falló ({e}); leyendo variante por variante.")
+        return [
+            (nombre, mag, self._run_easyocr(img_var, mag_ratio=mag))
+            for nombre, img_var in variants.items()
+            for mag in mag_ratios
+        ]
+
+    @staticmethod
+    def _votar(candidatos):
+        """Consenso entre lecturas: prioriza las de exactamente 5 dígitos, si no la más larga."""
+        if not candidatos:
             return ""
 
-    def solve_with_easyocr(self, image_path: str) -> str:
+        # Prioridad: resultados de exactamente 5 dígitos (DNPRA siempre tiene 5)
+        from collections import Counter
+        cinco = [r for r in candidatos if len(r) == 5]
+        if cinco:
+            ganador, votos = Counter(cinco).most_common(1)[0]
+            logger.info(f"✅ EasyOCR (5 dígitos) consenso: '{ganador}' ({votos}/{len(candidatos)} votos)")
+            return ganador
+
+        # Fallback: resultado más largo de los candidatos
+        mejor = max(candidatos, key=len)
+        logger.warning(f"⚠️ EasyOCR sin 5 dígitos, mejor: '{mejor}' de {len(candidatos)} candidatos")
+        return mejor
+
+    def solve_with_easyocr(self, captcha) -> str:
         """
         Motor Tier 2: Multi-estrategia mejorada para captcha DNPRA.
+        Primero el camino rápido (reconocedor sin detector); si no es confiable,
         8 preprocessings x 2 magnitudes = 16 intentos. Vota en resultados de 5 dígitos.
         """
+        return self._resolver_easyocr(captcha)[0]
+
+    def _resolver_easyocr(self, captcha, cancelar=None):
+        """
+        (texto, confiable, confianza) de EasyOCR. Es confiable si salió del camino rápido con
+        confianza suficiente o si juntó `early_exit.quorum` lecturas iguales; el hedge sólo acepta
+        esas. confianza: la media del reconocedor en el camino rápido, si no la fracción de
+        estrategias evaluadas que coinciden. `cancelar` (threading.Event) corta entre estrategias.
+        """
+        quorum = self._cfg_corte().get("quorum", 3)
+
+        def _por_voto(candidatos, evaluadas=None):
+            ganador = self._votar(candidatos)
+            votos = candidatos.count(ganador) if ganador else 0
+            confianza = round(votos / (evaluadas or len(candidatos)), 3) if ganador else None
+            return ganador, len(ganador) == 5 and votos >= quorum, confianza
+
         try:
-            img = cv2.imread(image_path)
+            captcha = _como_captcha(captcha)
+            img = captcha.bgr
             if img is None:
-                return ""
+                return "", False, None
 
             variants = self._preprocess_variants(img)
-            mag_ratios = [4.0, 6.0]
-            candidatos = []
 
-            for nombre, img_var in variants.items():
-                for mag in mag_ratios:
-                    res = self._run_easyocr(img_var, mag_ratio=mag)
-                    if res:
-                        candidatos.append(res)
-                        logger.debug(f"  [{nombre}@{mag}] → '{res}'")
+            # Pool de procesos: las 16 estrategias en paralelo, mismo orden y mismo voto
+            if self._usar_pool():
+                lecturas = self._en_pool("leer_easyocr", variants, self.MAG_RATIOS)
+                if lecturas is not None:
+                    self.stats_easyocr["completo"] += 1
+                    tracing.anotar(easyocr_modo="pool")
+                    return _por_voto([texto for _, _, texto in lecturas if texto], len(lecturas))
+
+            if self.ocr_cfg.get("recognizer_fast_path", True):
+                rapido = self._lectura_rapida(variants, cancelar=cancelar)
+                if rapido:
+                    self.stats_easyocr["rapido"] += 1
+                    tracing.anotar(easyocr_modo="rapido")
+                    return rapido[0], True, round(rapido[1], 3)
+            if cancelar is not None and cancelar.is_set():
+                return "", False, None
+            self.stats_easyocr["completo"] += 1
+            tracing.anotar(easyocr_modo="completo")
+
+            if self._cfg_corte().get("enabled", True):
+                ganador, candidatos, lecturas = self._leer_con_corte(variants, cancelar=cancelar)
+                total = len(variants) * len(self.MAG_RATIOS)
+                logger.info(f"EasyOCR: {len(lecturas)}/{total} estrategias evaluadas{' (corte temprano)' if ganador else ''}.")
+                tracing.anotar(easyocr_estrategias=len(lecturas))
+                if ganador:
+                    logger.info(f"✅ EasyOCR (5 dígitos) consenso: '{ganador}' ({len(candidatos)} lecturas)")
+                    confiable = True
+                    confianza = round(candidatos.count(ganador) / len(lecturas), 3)
+                else:
+                    ganador, confiable, confianza = _por_voto(candidatos, len(lecturas))
+                # Se puntúan recién con el veredicto del portal (no contra este mismo consenso)
+                self._lecturas_pendientes[captcha.sha256] = lecturas
+                return ganador, confiable, confianza
 
-            if not candidatos:
-                return ""
+            candidatos = []
 
-            # Prioridad: resultados de exactamente 5 dígitos (DNPRA siempre tiene 5)
-            from collections import Counter
-            cinco = [r for r in candidatos if len(r) == 5]
-            if cinco:
-                ganador, votos = Counter(cinco).most_common(1)[0]
-                logger.info(f"✅ EasyOCR (5 dígitos) consenso: '{ganador}' ({votos}/{len(candidatos)} votos)")
-                return ganador
+            lecturas = self._leer_variantes(variants, self.MAG_RATIOS)
+            for nombre, mag, res in lecturas:
+                if res:
+                    candidatos.append(res)
+                    logger.debug(f"  [{nombre}@{mag}] → '{res}'")
 
-            # Fallback: resultado más largo de los candidatos
-            mejor = max(candidatos, key=len)
-            logger.warning(f"⚠️ EasyOCR sin 5 dígitos, mejor: '{mejor}' de {len(candidatos)} candidatos")
-            return mejor
+            return _por_voto(candidatos, len(lecturas))
 
         except Exception as e:
             logger.error(f"Error en EasyOCR mejorado: {e}")
-            return ""
+            return "", False, None
 
-    def preprocess_image(self, image_path, output_path=None):
-        """ Limpia la imagen para Tesseract (Tier 3) """
+    def preprocess_image(self, captcha, output_path=None):
+        """ Limpia la imagen para Tesseract (Tier 3). Devuelve el ndarray; con output_path además lo guarda. """
+        cv2 = _lazy("cv2")
         try:
-            img = cv2.imread(image_path)
-            if img is None: raise FileNotFoundError(f"Imagen no en: {image_path}")
+            captcha = _como_captcha(captcha)
+            img = captcha.bgr
+            if img is None: raise ValueError(f"Imagen ilegible: {captcha.nombre}")
 
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             _, thresh = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY)
@@ -251,82 +753,228 @@ class CaptchaBreaker:
             kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
             closed = cv2.morphologyEx(inv, cv2.MORPH_CLOSE, kernel)
 
-            if output_path is None:
-                base, ext = os.path.splitext(image_path)
-                output_path = f"{base}_processed{ext}"
-                
-            cv2.imwrite(output_path, closed)
-            return output_path
+            if output_path is not None:
+                cv2.imwrite(output_path, closed)
+            return closed
         except Exception as e:
             logger.error(f"Error OpenCV preprocess: {e}")
             raise
 
-    def solve_with_tesseract(self, image_path: str) -> str:
+    def solve_with_tesseract(self, captcha) -> str:
         """ Motor Tier 3: OpenCV + Tesseract """
         try:
-            processed_path = self.preprocess_image(image_path)
+            processed = self.preprocess_image(captcha)
             custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=0123456789'
-            text = pytesseract.image_to_string(Image.open(processed_path), config=custom_config)
+            if self._usar_pool():
+                text = self._en_pool("leer_tesseract", processed, custom_config)
+                if text is not None:
+                    return text
+            text = self._pytesseract().image_to_string(Image.fromarray(processed), config=custom_config)
             return "".join(filter(str.isdigit, text.strip()))
         except Exception as e:
             logger.error(f"Error Tesseract Fallback: {e}")
             return ""
 
-    def _save_to_dataset(self, image_path: str, result: str):
-        """Guarda una copia del captcha en la carpeta de dataset para futuro entrenamiento."""
+    def _save_to_dataset(self, captcha, result: str, tier=None, confianza=None):
+        """Encola el captcha para el dataset (se escribe en segundo plano, una vez por contenido)."""
+        if self.dataset is None:
+            return
         try:
-            dataset_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "dataset")
-            os.makedirs(dataset_dir, exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            # Si no hay resultado o es inválido, marcamos como fallido
-            label = result if (result and len(result) == 5) else f"FAILED_{result or 'NONE'}"
-            
-            filename = f"{timestamp}_{label}.png"
-            dest_path = os.path.join(dataset_dir, filename)
-            
-            shutil.copy2(image_path, dest_path)
-            logger.info(f"💾 Captcha guardado en dataset: {filename}")
+            captcha = _como_captcha(captcha)
+            self.dataset.encolar(
+                captcha.bytes, result if result and result.isdigit() else "", tier, confianza, sha=captcha.sha256
+            )
         except Exception as e:
             logger.error(f"Error guardando en dataset: {e}")
 
-    def solve(self, image_path: str) -> str:
+    def registrar_veredicto(self, aceptado):
+        """
+        Respuesta del portal a la última lectura enviada (True = la aceptó, False = "incorrecto",
+        None = la consulta falló por otra cosa y no dice nada del captcha). Queda en el índice del
+        dataset junto a la etiqueta, el memo deja de servir las lecturas rechazadas y, si la aceptó,
+        se puntúan las estrategias de EasyOCR que la leyeron.
+        """
+        sha, self._ultimo_sha = self._ultimo_sha, None
+        lectura, self._ultima_lectura = self._ultima_lectura, None
+        if sha is None or aceptado is None:
+            self._lecturas_pendientes.clear()
+            return
+        self.puntuar_estrategias(sha, lectura if aceptado else None)
+        if self.memo is not None:
+            self.memo.registrar_veredicto(sha, aceptado)
+        if self.dataset is not None:
+            self.dataset.registrar_veredicto(sha, aceptado)
+
+    def puntuar_estrategias(self, sha, correcta):
+        """
+        Suma al historial del corte temprano las lecturas por estrategia del captcha `sha` contra
+        su lectura `correcta` (None = no se sabe, se descartan). Las de otros captchas que quedaron
+        sin veredicto también se descartan.
+        """
+        lecturas = self._lecturas_pendientes.pop(sha, None)
+        self._lecturas_pendientes.clear()
+        if lecturas and correcta:
+            self.estrategias.registrar(lecturas, correcta)
+
+    def _buscar_memo(self, captcha):
+        """Lectura memorizada del captcha (hash exacto y, si no, perceptual), o None."""
+        if self.memo is None:
+            return None
+        texto = self.memo.buscar(captcha.sha256)
+        if texto is None and captcha.phash is not None:
+            texto = self.memo.buscar(captcha.sha256, captcha.phash)
+        return texto
+
+    def _cfg_hedge(self):
+        cfg = self.ocr_cfg.get("hedge", {})
+        return cfg if isinstance(cfg, dict) else {"enabled": bool(cfg)}
+
+    def _gemini_medido(self, captcha, cancelar):
+        t0 = time.perf_counter()
+        texto = self.solve_with_gemini(captcha, cancelar=cancelar)
+        return texto, time.perf_counter() - t0
+
+    def _solve_hedged(self, captcha):
+        """
+        Gemini y EasyOCR en carrera: EasyOCR arranca si Gemini no resolvió en `ocr.hedge.delay_s`
+        (o apenas Gemini falla). Gana la primera lectura de 5 dígitos: la de Gemini siempre, la
+        local sólo si es confiable. Al perdedor se le avisa por un Event para que corte.
+        Devuelve (texto, tier, confianza).
+        """
+        delay = self._cfg_hedge().get("delay_s", 3.0)
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ocr-hedge")
+        cancelar = threading.Event()
+        t0 = time.perf_counter()
+        f_gemini = self._hedge_executor.submit(tracing.ligar(self._gemini_medido), captcha, cancelar)
+        wait([f_gemini], timeout=delay)
+
+        texto_gemini = ""
+        pendientes = {f_gemini}
+        f_local = None
+        if f_gemini.done():
+            texto_gemini, seg = f_gemini.result()
+            tracing.anotar(gemini_s=round(seg, 3))
+            if len(texto_gemini) == 5:
+                tracing.anotar(hedge_ganador="gemini")
+                return texto_gemini, "gemini", None
+            pendientes = set()
+
+        logger.info(f"🏁 Hedge: EasyOCR en carrera a los {time.perf_counter() - t0:.1f}s.")
+        with tracing.span("ocr.easyocr"):
+            f_local = self._hedge_executor.submit(tracing.ligar(self._resolver_easyocr), captcha, cancelar)
+            pendientes.add(f_local)
+            texto_local, confianza = "", None
+            while pendientes:
+                hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for f in hechos:
+                    if f is f_gemini:
+                        texto_gemini, seg = f.result()
+                        tracing.anotar(gemini_s=round(seg, 3))
+                        if len(texto_gemini) == 5:
+                            cancelar.set()
+                            logger.info(f"🏁 Hedge: ganó Gemini en {seg:.1f}s (EasyOCR cancelado).")
+                            tracing.anotar(hedge_ganador="gemini")
+                            return texto_gemini, "gemini", None
+                    else:
+                        texto_local, confiable, confianza = f.result()
+                        if len(texto_local) == 5 and (confiable or f_gemini.done()):
+                            t_local = time.perf_counter() - t0
+                            cancelar.set()
+                            tracing.anotar(hedge_ganador="easyocr", hedge_local_s=round(t_local, 3))
+                            if f_gemini.done():
+                                logger.info(f"🏁 Hedge: EasyOCR resolvió en {t_local:.1f}s tras fallar Gemini.")
+                            else:
+                                logger.info(f"🏁 Hedge: ganó EasyOCR en {t_local:.1f}s con Gemini todavía en vuelo.")
+                                f_gemini.add_done_callback(lambda fut: self._log_ahorro_hedge(fut, t_local))
+                            return texto_local, "easyocr", confianza
+        # Nadie con 5 dígitos confiables: lo mismo que la cascada (EasyOCR dudoso antes que nada)
+        if len(texto_local) == 5:
+            tracing.anotar(hedge_ganador="easyocr")
+            return texto_local, "easyocr", confianza
+        return texto_gemini, "gemini", None
+
+    @staticmethod
+    def _log_ahorro_hedge(futuro, t_local):
+        try:
+            _, seg = futuro.result()
+        except Exception:
+            return
+        logger.info(f"🏁 Hedge: Gemini terminó a los {seg:.1f}s → el hedge ahorró {max(0.0, seg - t_local):.1f}s.")
+
+    def solve(self, captcha) -> str:
         """
         Método unificado. 
-        Intenta Gemini -> EasyOCR -> Tesseract en cascada garantizando máxima robustez.
+        Intenta Gemini -> EasyOCR -> Tesseract en cascada garantizando máxima robustez
+        (con `ocr.hedge`, Gemini y EasyOCR corren en carrera).
+        captcha: bytes del PNG, ndarray BGR, path o CaptchaImagen; se decodifica una sola vez.
         """
-        logger.debug(f"=== Iniciando Extracción en Cascada: {os.path.basename(image_path)} ===")
+        captcha = _como_captcha(captcha)
+        self._ultimo_sha = captcha.sha256
+        with tracing.span("ocr.memo"):
+            memorizado = self._buscar_memo(captcha)
+        if memorizado:
+            logger.info(f"⚡ Captcha repetido: '{memorizado}' sale del memo (sin OCR).")
+            tracing.anotar(tier="memo")
+            self._ultima_lectura = memorizado
+            return memorizado
+
+        logger.debug(f"=== Iniciando Extracción en Cascada: {captcha.nombre} ===")
         final_result = ""
-        
-        # 1. TIER 1: Gemini 
-        final_result = self.solve_with_gemini(image_path)
+        # En modo hedge EasyOCR ya corrió en carrera (salvo que Gemini ganara antes del delay)
+        hedge = self._cfg_hedge().get("enabled", False)
+
+        confianza = None
+        if hedge:
+            final_result, tier, confianza = self._solve_hedged(captcha)
+        else:
+            # 1. TIER 1: Gemini
+            t0 = time.perf_counter()
+            with tracing.span("ocr.gemini"):
+                final_result = self.solve_with_gemini(captcha)
+            if self.gemini_ready:
+                tracing.anotar(gemini_s=round(time.perf_counter() - t0, 3))
+            tier = "gemini"
         
         # 2. TIER 2: Fallback EasyOCR (si Gemini no devolvió 5 dígitos)
-        if not (final_result and len(final_result) == 5):
+        if not hedge and not (final_result and len(final_result) == 5):
             if final_result:
                 logger.warning(f"Gemini devolvió longitud incorrecta ({len(final_result)}). Probando EasyOCR...")
             else:
                 logger.warning("Gemini falló. Activando Fallback Local con EasyOCR...")
             
-            easy_result = self.solve_with_easyocr(image_path)
+            with tracing.span("ocr.easyocr"):
+                easy_result, _, conf_local = self._resolver_easyocr(captcha)
             if easy_result and len(easy_result) == 5:
                 final_result = easy_result
+                tier = "easyocr"
+                confianza = conf_local
                 logger.info(f"✅ [TIER 2] Resuelto por EasyOCR: '{final_result}'")
             
         # 3. TIER 3: Fallback Tesseract (si todo lo anterior falló)
         if not (final_result and len(final_result) == 5):
             logger.warning("EasyOCR falló. Probando Tesseract como último recurso...")
-            tesseract_result = self.solve_with_tesseract(image_path)
+            with tracing.span("ocr.tesseract"):
+                tesseract_result = self.solve_with_tesseract(captcha)
             if tesseract_result:
                 final_result = tesseract_result
+                tier = "tesseract"
+                confianza = None
                 logger.info(f"✅ [TIER 3] Resuelto por Tesseract: '{final_result}'")
 
+        tracing.anotar(tier=tier if final_result else "ninguno")
+        tracing.contar("ocr_llamadas")
+        if self.memo is not None and len(final_result) == 5:
+            self.memo.guardar(captcha.sha256, final_result, captcha.phash)
+
         # Guardar en dataset para entrenamiento futuro
-        self._save_to_dataset(image_path, final_result)
+        with tracing.span("dataset"):
+            self._save_to_dataset(captcha, final_result, tier if final_result else None, confianza)
         
         if not final_result:
             logger.error("❌ CRÍTICO: Todos los motores fallaron.")
-            
+
+        self._ultima_lectura = final_result
         return final_result
 
 if __name__ == "__main__":
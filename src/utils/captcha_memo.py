@@ -0,0 +1,143 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from src.utils.dataset_writer import INDEX
+
+logger = logging.getLogger(__name__)
+
+# dHash de 64 bits partido en 4 bandas de 16: dos hashes a distancia <= 3 coinciden en al menos
+# una banda entera, así la búsqueda de casi-duplicados mira un puñado de candidatos y no todo el LRU.
+_BANDAS = 4
+_BITS_BANDA = 16
+DISTANCIA_MAX = _BANDAS - 1
+
+
+def dhash(gris):
+    """Hash perceptual (diferencia horizontal 9x8) de una imagen en escala de grises: int de 64 bits."""
+    import cv2
+    import numpy as np
+    chica = cv2.resize(gris, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(chica[:, 1:] > chica[:, :-1]).tobytes(), "big")
+
+
+def _bandas(h):
+    mascara = (1 << _BITS_BANDA) - 1
+    return [(i, (h >> (i * _BITS_BANDA)) & mascara) for i in range(_BANDAS)]
+
+
+class CaptchaMemo:
+    """
+    Memo en memoria de captchas ya resueltos, delante de la cascada de OCR: el portal repite
+    imágenes entre refrescos y sesiones. Clave exacta = sha256 del PNG; para casi-duplicados
+    (mismo captcha re-codificado) un dHash a distancia de Hamming <= `distancia_max`.
+
+    Cada entrada guarda la lectura y el veredicto del portal (None = sin respuesta todavía).
+    Un hit exacto se sirve salvo que el portal la haya rechazado; uno perceptual sólo si el portal
+    la aceptó (dos captchas distintos pueden parecerse). LRU acotado a `max_entradas`.
+    """
+
+    def __init__(self, max_entradas=5000, distancia_max=2):
+        self.max_entradas = max_entradas
+        self.distancia_max = min(distancia_max, DISTANCIA_MAX)
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # sha → [texto, phash, aceptado]
+        self._por_banda = {}  # (banda, valor) → {sha}
+        self.stats = {"consultas": 0, "exactos": 0, "perceptuales": 0}
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def buscar(self, sha, phash=None):
+        """
+        Lectura memorizada para el captcha, o None. Sin `phash` sólo busca el hash exacto
+        (así el que llama calcula el perceptual únicamente si hace falta).
+        """
+        with self._lock:
+            if phash is None:
+                self.stats["consultas"] += 1
+                entrada = self._entradas.get(sha)
+                if entrada is not None and entrada[2] is not False:
+                    self._entradas.move_to_end(sha)
+                    self.stats["exactos"] += 1
+                    return entrada[0]
+                return None
+            for otro in self._candidatos(phash):
+                texto, h, aceptado = self._entradas[otro]
+                if aceptado and bin(h ^ phash).count("1") <= self.distancia_max:
+                    self._entradas.move_to_end(otro)
+                    self.stats["perceptuales"] += 1
+                    return texto
+            return None
+
+    def guardar(self, sha, texto, phash=None, aceptado=None):
+        with self._lock:
+            if sha in self._entradas:
+                self._quitar_de_bandas(sha)
+                if phash is None:
+                    phash = self._entradas[sha][1]
+            self._entradas[sha] = [texto, phash, aceptado]
+            self._entradas.move_to_end(sha)
+            if phash is not None:
+                for banda in _bandas(phash):
+                    self._por_banda.setdefault(banda, set()).add(sha)
+            while len(self._entradas) > self.max_entradas:
+                viejo = next(iter(self._entradas))
+                self._quitar_de_bandas(viejo)
+                del self._entradas[viejo]
+
+    def registrar_veredicto(self, sha, aceptado):
+        """Respuesta del portal a la lectura memorizada para `sha` (False la deja de servir)."""
+        with self._lock:
+            entrada = self._entradas.get(sha)
+            if entrada is not None:
+                entrada[2] = aceptado
+
+    def precargar(self, dataset_dir):
+        """Siembra lecturas aceptadas por el portal en corridas anteriores (índice del dataset, sólo hash exacto)."""
+        index = os.path.join(dataset_dir, INDEX)
+        if not os.path.exists(index):
+            return 0
+        try:
+            conn = sqlite3.connect(index, timeout=30)
+            try:
+                filas = conn.execute(
+                    "SELECT sha256, etiqueta FROM captchas WHERE veredicto = 'aceptado'"
+                    " ORDER BY ultimo_ts DESC LIMIT ?", (self.max_entradas,)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo precargar el memo de captchas: {e}")
+            return 0
+        # Del más viejo al más nuevo, así el LRU queda con los recientes al final
+        for sha, etiqueta in reversed(filas):
+            self.guardar(sha, etiqueta, aceptado=True)
+        return len(filas)
+
+    def resumen(self):
+        s = self.stats
+        hits = s["exactos"] + s["perceptuales"]
+        tasa = hits / s["consultas"] if s["consultas"] else 0.0
+        return {**s, "hit_rate": round(tasa, 3), "entradas": len(self._entradas)}
+
+    # ------------------------------------------------------------------
+
+    def _candidatos(self, phash):
+        candidatos = set()
+        for banda in _bandas(phash):
+            candidatos |= self._por_banda.get(banda, set())
+        return candidatos
+
+    def _quitar_de_bandas(self, sha):
+        phash = self._entradas[sha][1]
+        if phash is None:
+            return
+        for banda in _bandas(phash):
+            shas = self._por_banda.get(banda)
+            if shas is not None:
+                shas.discard(sha)
+                if not shas:
+                    del self._por_banda[banda]
@@ -3,6 +3,8 @@ import logging
 import os
 import time
 
+from src.utils.journal import ResultJournal
+
 class DataHandler:
     def __init__(self, excel_path):
         self.original_path = excel_path
@@ -11,6 +13,10 @@ class DataHandler:
         if not output_name.endswith('.xlsx'):
             output_name = os.path.splitext(output_name)[0] + ".xlsx"
         self.output_path = os.path.join(os.path.dirname(self.original_path), output_name)
+
+        # Journal append-only de resultados (durable por VIN), al lado del Excel procesado
+        journal_name = f"journal_{os.path.splitext(os.path.basename(self.original_path))[0]}.jsonl"
+        self.journal = ResultJournal(os.path.join(os.path.dirname(self.original_path), journal_name))
         
         # El archivo de trabajo será el procesado si ya existe, sino el original
         self.current_path = self.output_path if os.path.exists(self.output_path) else self.original_path
@@ -19,6 +25,8 @@ class DataHandler:
         self.df = None
         self.header_row = 0
         self.chasis_col = None
+        # Duración (s) de cada escritura del Excel procesado, para benchmarks
+        self.tiempos_guardado = []
 
     def load_data(self):
         """Escanea las primeras 20 filas buscando 'Chasis' y carga el DataFrame."""
@@ -32,6 +40,7 @@ class DataHandler:
                     if "chasis" in str(col).lower():
                         self.chasis_col = i
                         break
+                self._aplicar_journal()
                 return self.df
 
             # Para archivos .xls originales, buscar el header
@@ -51,11 +60,42 @@ class DataHandler:
             
             # Carga real con el header detectado
             self.df = pd.read_excel(self.current_path, header=self.header_row)
+            self._aplicar_journal()
             return self.df
         except Exception as e:
             self.logger.error(f"Error cargando Excel: {e}")
             raise
 
+    def _asegurar_columnas_resultado(self):
+        # Asegurar columnas de tipo object (string-compatible)
+        for col in ['Resultado DNPRA', 'Dominio DNPRA']:
+            if col not in self.df.columns:
+                self.df[col] = pd.Series(dtype=object)
+            else:
+                self.df[col] = self.df[col].astype(object)
+
+    def _aplicar_journal(self):
+        """
+        Re-aplica en memoria los resultados del journal que todavía no llegaron al Excel
+        (corte, Ctrl-C o crash antes del volcado). Así get_pending_vins no los vuelve a pedir.
+        """
+        registros = self.journal.leer()
+        if not registros:
+            return
+        self._asegurar_columnas_resultado()
+        chasis_col_name = self.df.columns[self.chasis_col]
+        vins_df = self.df[chasis_col_name].astype(str).str.strip()
+        aplicados = 0
+        for vin, reg in registros.items():
+            mask = vins_df == vin
+            if not mask.any():
+                continue
+            self.df.loc[mask, 'Resultado DNPRA'] = reg["resultado"]
+            if reg.get("dominio"):
+                self.df.loc[mask, 'Dominio DNPRA'] = reg["dominio"]
+            aplicados += 1
+        self.logger.info(f"Journal: {aplicados} resultados re-aplicados desde {os.path.basename(self.journal.path)}.")
+
     def get_vins(self):
         """Devuelve la lista completa de VINs."""
         if self.df is None:
@@ -135,12 +175,7 @@ class DataHandler:
         """
         chasis_col_name = self.df.columns[self.chasis_col]
 
-        # Asegurar columnas de tipo object (string-compatible)
-        for col in ['Resultado DNPRA', 'Dominio DNPRA']:
-            if col not in self.df.columns:
-                self.df[col] = pd.Series(dtype=object)
-            else:
-                self.df[col] = self.df[col].astype(object)
+        self._asegurar_columnas_resultado()
 
         for vin, res in results_dict.items():
             self.df.loc[self.df[chasis_col_name] == vin, 'Resultado DNPRA'] = res
@@ -153,7 +188,9 @@ class DataHandler:
         # Intentar guardar, con reintentos por si el archivo está abierto en Excel
         for intento in range(3):
             try:
+                t0 = time.perf_counter()
                 self.df.to_excel(self.output_path, index=False, engine='openpyxl')
+                self.tiempos_guardado.append(time.perf_counter() - t0)
                 self.logger.info(f"Resultados guardados en: {self.output_path}")
                 self.current_path = self.output_path
                 return self.output_path
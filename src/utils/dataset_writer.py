@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX = "index.sqlite"
+_FIN = object()
+
+
+def sha256(datos):
+    return hashlib.sha256(datos).hexdigest()
+
+
+def ruta_relativa(sha):
+    """Layout por hash: <2 primeros hex>/<sha256>.png (256 carpetas, ninguna crece sin límite)."""
+    return os.path.join(sha[:2], f"{sha}.png")
+
+
+class DatasetWriter:
+    """
+    Escritor del dataset de captchas en segundo plano (cola + hilo): el scraping sólo encola y
+    sigue. Las imágenes se guardan una vez por contenido (sha256) y el índice SQLite lleva por
+    hash la etiqueta, el tier, la confianza, el veredicto del portal y cuántas veces se vio.
+    Si la cola se llena se descarta el captcha: el dataset nunca frena el camino caliente.
+    """
+
+    def __init__(self, dataset_dir, max_cola=1000):
+        self.dir = dataset_dir
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.stats = {"nuevos": 0, "duplicados": 0, "descartados": 0, "veredictos": 0}
+
+    def _arrancar(self):
+        if self._hilo is None:
+            with self._lock:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._loop, name="dataset-writer", daemon=True)
+                    self._hilo.start()
+
+    def _encolar(self, item):
+        self._arrancar()
+        try:
+            self._cola.put_nowait(item)
+            return True
+        except queue.Full:
+            self.stats["descartados"] += 1
+            logger.debug("Cola del dataset llena: captcha descartado.")
+            return False
+
+    def encolar(self, png_bytes, etiqueta, tier=None, confianza=None, sha=None):
+        """Encola un captcha resuelto (etiqueta = lectura final, "" si ninguna). Devuelve su sha256."""
+        sha = sha or sha256(png_bytes)
+        self._encolar(("captcha", sha, png_bytes, etiqueta or "", tier, confianza, time.time()))
+        return sha
+
+    def registrar_veredicto(self, sha, aceptado):
+        """Respuesta del portal a la lectura guardada para `sha` (True = la aceptó)."""
+        self._encolar(("veredicto", sha, "aceptado" if aceptado else "rechazado", time.time()))
+
+    def cerrar(self, timeout=10):
+        """Vacía la cola y cierra el índice."""
+        if self._hilo is not None:
+            self._cola.put(_FIN)
+            self._hilo.join(timeout)
+            self._hilo = None
+
+    # ------------------------------------------------------------------
+
+    def _conectar(self):
+        os.makedirs(self.dir, exist_ok=True)
+        # Varios workers pueden escribir el mismo dataset: WAL + espera ante el lock
+        conn = sqlite3.connect(os.path.join(self.dir, INDEX), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS captchas ("
+            " sha256 TEXT PRIMARY KEY, ruta TEXT NOT NULL, etiqueta TEXT NOT NULL, tier TEXT,"
+            " confianza REAL, veredicto TEXT, vistos INTEGER NOT NULL DEFAULT 1,"
+            " primer_ts REAL NOT NULL, ultimo_ts REAL NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def _loop(self):
+        conn = None
+        while True:
+            item = self._cola.get()
+            if item is _FIN:
+                break
+            try:
+                if conn is None:
+                    conn = self._conectar()
+                if item[0] == "captcha":
+                    self._guardar(conn, *item[1:])
+                else:
+                    _, sha, veredicto, _ts = item
+                    conn.execute("UPDATE captchas SET veredicto = ? WHERE sha256 = ?", (veredicto, sha))
+                    self.stats["veredictos"] += 1
+                conn.commit()
+            except Exception as e:
+                logger.error(f"Error guardando en dataset: {e}")
+        if conn is not None:
+            conn.close()
+
+    def _guardar(self, conn, sha, png_bytes, etiqueta, tier, confianza, ts):
+        fila = conn.execute("SELECT veredicto FROM captchas WHERE sha256 = ?", (sha,)).fetchone()
+        if fila is not None:
+            self.stats["duplicados"] += 1
+            if fila[0] == "aceptado":
+                # La etiqueta ya está confirmada por el portal: sólo se cuenta la repetición
+                conn.execute("UPDATE captchas SET vistos = vistos + 1, ultimo_ts = ? WHERE sha256 = ?", (ts, sha))
+            else:
+                conn.execute(
+                    "UPDATE captchas SET etiqueta = ?, tier = ?, confianza = ?, veredicto = NULL,"
+                    " vistos = vistos + 1, ultimo_ts = ? WHERE sha256 = ?",
+                    (etiqueta, tier, confianza, ts, sha),
+                )
+            logger.debug(f"Captcha repetido en dataset ({sha[:12]}).")
+            return
+
+        ruta = ruta_relativa(sha)
+        destino = os.path.join(self.dir, ruta)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, "wb") as f:
+            f.write(png_bytes)
+        conn.execute(
+            "INSERT INTO captchas (sha256, ruta, etiqueta, tier, confianza, primer_ts, ultimo_ts)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (sha, ruta.replace(os.sep, "/"), etiqueta, tier, confianza, ts, ts),
+        )
+        self.stats["nuevos"] += 1
+        logger.info(f"💾 Captcha guardado en dataset: {ruta} ('{etiqueta or 'NONE'}', {tier or '-'})")
+
+
+def captchas_etiquetados(dataset_dir, limit=None):
+    """
+    [(path, etiqueta)] con etiqueta de 5 dígitos: los del índice (menos los que el portal
+    rechazó) y los archivos planos anteriores al layout por hash ({timestamp}_{5 dígitos}.png).
+    """
+    captchas = []
+    index = os.path.join(dataset_dir, INDEX)
+    if os.path.exists(index):
+        conn = sqlite3.connect(index, timeout=30)
+        try:
+            filas = conn.execute(
+                "SELECT ruta, etiqueta FROM captchas WHERE length(etiqueta) = 5"
+                " AND (veredicto IS NULL OR veredicto != 'rechazado') ORDER BY primer_ts"
+            ).fetchall()
+        finally:
+            conn.close()
+        captchas += [(os.path.join(dataset_dir, ruta), etiqueta) for ruta, etiqueta in filas if etiqueta.isdigit()]
+    for path in sorted(glob.glob(os.path.join(dataset_dir, "*.png"))):
+        m = re.search(r"_(\d{5})\.png$", os.path.basename(path))
+        if m:
+            captchas.append((path, m.group(1)))
+    return captchas[:limit] if limit else captchas
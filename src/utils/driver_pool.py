@@ -0,0 +1,116 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from src.utils import browser_profile
+
+logger = logging.getLogger(__name__)
+
+_chromedriver_lock = threading.Lock()
+_chromedriver_path = None
+
+
+def chromedriver_path():
+    """Ruta de chromedriver resuelta UNA vez por proceso (ChromeDriverManager().install() consulta la red)."""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager().install()
+            logger.info(f"ChromeDriver resuelto: {_chromedriver_path}")
+        return _chromedriver_path
+
+
+def _driver_vivo(driver):
+    try:
+        _ = driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+class DriverManager:
+    """
+    Administra el WebDriver del scraper con un navegador de repuesto "en caliente".
+    Mientras se usa el principal, otro Chrome ya lanzado espera en segundo plano; ante un
+    WebDriverException se intercambia al instante, el viejo se cierra en segundo plano y
+    el repuesto se repone de forma asíncrona (fuera del camino crítico).
+    """
+
+    def __init__(self, config, logger_=None):
+        self.config = config
+        self.hot_standby = config.get("driver_pool", {}).get("hot_standby", True)
+        self.logger = logger_ or logger
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="driver")
+        self._repuesto = None  # Future[WebDriver]
+
+    def _lanzar(self, en_espera=False):
+        options = browser_profile.construir_opciones(self.config)
+        driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+        if not browser_profile.es_headless(self.config):
+            if en_espera:
+                # El repuesto visible no molesta: queda minimizado hasta que se lo usa
+                driver.minimize_window()
+            else:
+                driver.maximize_window()
+        browser_profile.aplicar_bloqueos(driver, self.config)
+        return driver
+
+    def _reponer(self):
+        if self.hot_standby:
+            self._repuesto = self._executor.submit(self._lanzar, True)
+
+    def _tomar_repuesto(self):
+        """Devuelve el repuesto si está sano (esperándolo si todavía arranca), o None."""
+        futuro, self._repuesto = self._repuesto, None
+        if futuro is None:
+            return None
+        try:
+            driver = futuro.result()
+        except Exception as e:
+            self.logger.warning(f"El navegador de repuesto no pudo arrancar: {type(e).__name__}")
+            return None
+        if not _driver_vivo(driver):
+            self._cerrar_en_segundo_plano(driver)
+            return None
+        if not browser_profile.es_headless(self.config):
+            driver.maximize_window()
+        return driver
+
+    def _cerrar_en_segundo_plano(self, driver):
+        def _quit():
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._executor.submit(_quit)
+
+    def obtener(self):
+        """Primer navegador de la corrida (sincrónico) y arranque del repuesto en segundo plano."""
+        driver = self._tomar_repuesto() or self._lanzar()
+        self._reponer()
+        return driver
+
+    def reemplazar(self, driver_viejo):
+        """Cambia el navegador caído por el repuesto y repone el repuesto en segundo plano."""
+        if driver_viejo is not None:
+            self._cerrar_en_segundo_plano(driver_viejo)
+        driver = self._tomar_repuesto()
+        if driver is not None:
+            self.logger.info("♻️ Navegador de repuesto en uso (sin downtime de reinicio).")
+        else:
+            driver = self._lanzar()
+        self._reponer()
+        return driver
+
+    def cerrar(self):
+        futuro, self._repuesto = self._repuesto, None
+        if futuro is not None:
+            try:
+                futuro.result(timeout=60).quit()
+            except Exception:
+                pass
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ResultJournal:
+    """
+    Journal append-only (JSONL) con un registro por VIN consultado, escrito con fsync
+    apenas se obtiene el resultado. Es la fuente de verdad ante un crash o Ctrl-C:
+    DataHandler lo re-aplica al arrancar, así ningún VIN ya consultado vuelve al portal.
+    Lo que ya quedó volcado al Excel se recorta con `compactar`, así no crece sin fin.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Offset lógico del final del último registro: bytes recortados + tamaño actual del archivo,
+        # así sigue siendo válido para `compactar` aunque el principio ya se haya recortado
+        self._recortado = 0
+        self.fin = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def registrar(self, vin, resultado, dominio="", **meta):
+        registro = {
+            "vin": str(vin),
+            "resultado": resultado,
+            "dominio": dominio or "",
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            **meta,
+        }
+        linea = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(linea)
+                f.flush()
+                os.fsync(f.fileno())
+                self.fin = self._recortado + f.tell()
+        return registro
+
+    def compactar(self, hasta):
+        """
+        Recorta los registros hasta el offset lógico `hasta` (un `fin` ya volcado al Excel):
+        quedan sólo los posteriores, que todavía no llegaron al Excel.
+        """
+        with self._lock:
+            corte = hasta - self._recortado
+            if corte <= 0 or not os.path.exists(self.path):
+                return
+            with open(self.path, "rb") as f:
+                f.seek(corte)
+                resto = f.read()
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(resto)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._recortado += corte
+
+    def leer(self):
+        """{vin: último registro}. Tolera una última línea truncada por un corte a mitad de escritura."""
+        registros = {}
+        if not os.path.exists(self.path):
+            return registros
+        with open(self.path, encoding="utf-8") as f:
+            for n, linea in enumerate(f, start=1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    logger.warning(f"Journal: línea {n} corrupta/incompleta, se ignora.")
+                    continue
+                registros[registro["vin"]] = registro
+        return registros
+
+
+class ResultWriter:
+    """
+    Único escritor de resultados de la corrida.
+    Cada VIN va primero al journal (sincrónico, durable) y después se vuelca al Excel en un
+    hilo aparte cada `save_every` VINs o `save_interval` segundos, así la reescritura completa
+    del Excel no frena el scraping y save_results nunca corre en paralelo.
+    Si hay ResultCache, cada resultado exitoso consultado al portal también queda en cache.
+    """
+
+    _FIN = object()
+
+    def __init__(self, data_handler, journal, save_every=5, save_interval=30, cache=None):
+        self.data_handler = data_handler
+        self.journal = journal
+        self.cache = cache
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._volcar_loop, name="excel-writer", daemon=True)
+        self._hilo.start()
+
+    def registrar(self, vin, resultado, dominio="", **meta):
+        self.journal.registrar(vin, resultado, dominio, **meta)
+        if self.cache is not None and meta.get("origen") != "cache":
+            self.cache.guardar(vin, meta.get("tipo") or "N", resultado, dominio)
+        self._cola.put((vin, resultado, dominio, self.journal.fin))
+
+    def _guardar(self, results, dominios, hasta):
+        logger.info(f"  Volcando progreso al Excel ({len(results)} VINs)...")
+        try:
+            guardado = self.data_handler.save_results(results, dominios)
+        except Exception as e:
+            # El journal ya tiene los datos: se vuelcan en el próximo guardado o en la próxima corrida
+            logger.error(f"Error volcando al Excel (los datos quedan en el journal): {e}", exc_info=True)
+            return
+        if guardado != self.data_handler.output_path:
+            return  # quedó en un backup (o no se guardó): el journal sigue siendo la fuente de verdad
+        # El Excel tiene todo el DataFrame (journal re-aplicado al arrancar incluido): lo volcado sobra
+        try:
+            self.journal.compactar(hasta)
+        except OSError as e:
+            logger.warning(f"No se pudo compactar el journal: {e}")
+
+    def _volcar_loop(self):
+        results = {}
+        dominios = {}
+        hasta = 0
+        ultimo = time.monotonic()
+        while True:
+            try:
+                item = self._cola.get(timeout=1)
+            except queue.Empty:
+                item = None
+
+            if item is self._FIN:
+                break
+            if item is not None:
+                vin, resultado, dominio, hasta = item
+                results[vin] = resultado
+                dominios[vin] = dominio
+
+            vencido = time.monotonic() - ultimo >= self.save_interval
+            if results and (len(results) >= self.save_every or vencido):
+                self._guardar(results, dominios, hasta)
+                results, dominios = {}, {}
+                ultimo = time.monotonic()
+
+        if results:
+            self._guardar(results, dominios, hasta)
+
+    def cerrar(self):
+        """Vuelca lo pendiente al Excel y espera al hilo escritor."""
+        self._cola.put(self._FIN)
+        self._hilo.join()
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Resultados de una request a Gemini que se informan al liberar la llave
+RESULTADOS = ("ok", "vacia", "429", "503", "403", "error")
+# Los que cuentan para la tasa de error (429 es cuota, no falla de la llave)
+_ERRORES = ("vacia", "503", "error")
+
+
+def llaves_gemini(gemini_config=None):
+    """API keys de la granja (GEMINI_API_KEYS del .env, separadas por coma); ninguna con `gemini.enabled: false`."""
+    if not (gemini_config or {}).get("enabled", True):
+        return []
+    return [k.strip() for k in os.getenv("GEMINI_API_KEYS", "").split(",") if k.strip()]
+
+
+def huella(key):
+    """Identificador estable de una llave para el estado persistido (nunca se guarda la llave)."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+def clasificar_error(error_msg):
+    """Resultado (ver RESULTADOS) para el mensaje de una excepción de google.genai."""
+    if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
+        return "429"
+    if "503" in error_msg or "UNAVAILABLE" in error_msg:
+        return "503"
+    if "403" in error_msg or "PERMISSION_DENIED" in error_msg:
+        return "403"
+    return "error"
+
+
+class KeyScheduler:
+    """
+    Reparto de requests entre las llaves de la granja Gemini con un token bucket por llave,
+    dimensionado a su cuota por minuto (RPM) y por día (RPD). Compartido por todos los workers
+    (memoria compartida de multiprocessing, como el RateController).
+
+    - `adquirir()` devuelve al instante una llave con capacidad libre; sólo espera si
+      ninguna tiene un token disponible, y nunca más de `max_espera_s`.
+    - Varias requests pueden estar en vuelo a la vez, cada una con su llave.
+    - Entre las llaves con capacidad se prefiere la sana (tasa de error baja) más rápida.
+    - Un 429 vacía el bucket y saca a la llave `readmision_429_s` (la ventana por minuto);
+      si vuelve a dar 429 apenas readmitida, queda afuera hasta el reset diario de cuota.
+    - Con `path`, el estado (uso del día, bloqueos, latencia y errores) persiste entre corridas.
+    """
+
+    def __init__(self, n_llaves, cfg=None, ctx=None, huellas=None, path=None):
+        cfg = cfg or {}
+        self.n = n_llaves
+        self.huellas = list(huellas or [])
+        self.path = path
+        self.rpm = cfg.get("rpm_por_llave", 15)
+        self.rpd = cfg.get("rpd_por_llave", 1500)
+        self.rafaga = cfg.get("rafaga", 1)
+        self.max_espera_s = cfg.get("max_espera_s", 10.0)
+        # La cuota diaria de Gemini se reinicia a medianoche del Pacífico
+        self.reset_utc_offset_h = cfg.get("reset_utc_offset_h", -8)
+        self.readmision_429_s = cfg.get("readmision_429_s", 60.0)
+        self.max_429_seguidos = cfg.get("max_429_seguidos", 2)
+        self.tasa_error_max = cfg.get("tasa_error_max", 0.5)
+
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self._lock = ctx.Lock()
+        self._tokens = ctx.Array("d", [float(self.rafaga)] * n_llaves, lock=False)
+        self._refill_ts = ctx.Array("d", [time.time()] * n_llaves, lock=False)
+        self._dia = ctx.Array("i", [self._dia_cuota(time.time())] * n_llaves, lock=False)
+        self._uso_dia = ctx.Array("i", n_llaves, lock=False)
+        self._en_vuelo = ctx.Array("i", n_llaves, lock=False)
+        self._bloqueada_hasta = ctx.Array("d", n_llaves, lock=False)
+        self._conteos = ctx.Array("i", n_llaves * len(RESULTADOS), lock=False)
+        self._latencia = ctx.Array("d", n_llaves, lock=False)      # EWMA en segundos (0 = sin medir)
+        self._tasa_error = ctx.Array("d", n_llaves, lock=False)    # EWMA de requests fallidas
+        self._ultimo_429 = ctx.Array("d", n_llaves, lock=False)
+        self._429_seguidos = ctx.Array("i", n_llaves, lock=False)
+
+    def _dia_cuota(self, ts):
+        return int((ts + self.reset_utc_offset_h * 3600) // 86400)
+
+    def _proximo_reset(self, ts):
+        return (self._dia_cuota(ts) + 1) * 86400 - self.reset_utc_offset_h * 3600
+
+    def _recargar(self, i, ahora):
+        # Llamar con el lock tomado
+        transcurrido = ahora - self._refill_ts[i]
+        self._tokens[i] = min(float(self.rafaga), self._tokens[i] + transcurrido * self.rpm / 60.0)
+        self._refill_ts[i] = ahora
+        self._rodar_dia(i, ahora)
+
+    def _rodar_dia(self, i, ahora):
+        # Llamar con el lock tomado. Pasado el reset de cuota el uso del día vuelve a cero
+        dia = self._dia_cuota(ahora)
+        if dia != self._dia[i]:
+            self._dia[i] = dia
+            self._uso_dia[i] = 0
+            self._429_seguidos[i] = 0
+
+    def _disponible(self, i, ahora):
+        # El día se rueda antes de mirar el RPD: una llave agotada ayer vuelve a tener cuota hoy
+        self._rodar_dia(i, ahora)
+        if self._bloqueada_hasta[i] > ahora:
+            return False
+        if self._bloqueada_hasta[i]:
+            self._bloqueada_hasta[i] = 0.0
+            logger.info(f"♻️ Gemini Key #{i+1} readmitida: venció su ventana de cuota.")
+        return self._uso_dia[i] < self.rpd
+
+    def _prioridad(self, i):
+        # Menor es mejor: sanas primero, después la más rápida (sin medir = 0, así se mide),
+        # después la que tiene más tokens y menos requests en vuelo
+        return (self._tasa_error[i] >= self.tasa_error_max, self._latencia[i], -self._tokens[i], self._en_vuelo[i])
+
+    def adquirir(self, excluir=()):
+        """
+        Índice de la llave a usar (ya descontado su token), o None si ninguna de las no
+        excluidas tiene cuota o la espera superaría `max_espera_s`.
+        """
+        limite = time.time() + self.max_espera_s
+        while True:
+            with self._lock:
+                ahora = time.time()
+                espera = None
+                mejor = None
+                for i in range(self.n):
+                    if i in excluir or not self._disponible(i, ahora):
+                        continue
+                    self._recargar(i, ahora)
+                    if self._tokens[i] >= 1.0:
+                        if mejor is None or self._prioridad(i) < self._prioridad(mejor):
+                            mejor = i
+                    else:
+                        falta = (1.0 - self._tokens[i]) * 60.0 / self.rpm
+                        espera = falta if espera is None else min(espera, falta)
+                if mejor is not None:
+                    self._tokens[mejor] -= 1.0
+                    self._uso_dia[mejor] += 1
+                    self._en_vuelo[mejor] += 1
+                    return mejor
+            if espera is None or ahora + espera > limite:
+                return None
+            time.sleep(espera)
+
+    def liberar(self, i, resultado="ok", latencia_s=None):
+        """Informa cómo terminó la request hecha con la llave `i` (ver RESULTADOS)."""
+        with self._lock:
+            self._en_vuelo[i] = max(0, self._en_vuelo[i] - 1)
+            self._registrar(i, resultado, latencia_s)
+
+    def registrar_sondeo(self, i, resultado, latencia_s=None):
+        """Resultado de la request de prueba del sondeo inicial (consume cuota, no token)."""
+        with self._lock:
+            self._recargar(i, time.time())
+            self._uso_dia[i] += 1
+            self._registrar(i, resultado, latencia_s)
+
+    def _registrar(self, i, resultado, latencia_s):
+        # Llamar con el lock tomado
+        ahora = time.time()
+        self._conteos[i * len(RESULTADOS) + RESULTADOS.index(resultado)] += 1
+        if latencia_s is not None and resultado in ("ok", "vacia"):
+            previa = self._latencia[i]
+            self._latencia[i] = latencia_s if previa == 0 else 0.8 * previa + 0.2 * latencia_s
+        if resultado != "429":
+            self._tasa_error[i] = 0.8 * self._tasa_error[i] + 0.2 * (resultado in _ERRORES)
+        if resultado == "ok":
+            self._429_seguidos[i] = 0
+        elif resultado == "429":
+            self._tokens[i] = 0.0
+            self._ultimo_429[i] = ahora
+            self._429_seguidos[i] += 1
+            if self._429_seguidos[i] >= self.max_429_seguidos:
+                self._bloqueada_hasta[i] = self._proximo_reset(ahora)
+            else:
+                self._bloqueada_hasta[i] = ahora + self.readmision_429_s
+        elif resultado == "403":
+            # Llave inválida o sin permisos: se vuelve a probar recién al otro día
+            self._bloqueada_hasta[i] = self._proximo_reset(ahora)
+
+    def disponibles(self):
+        """Cantidad de llaves que todavía tienen cuota (bloqueadas por 429 o RPD no cuentan)."""
+        with self._lock:
+            ahora = time.time()
+            return sum(self._disponible(i, ahora) for i in range(self.n))
+
+    def estado(self):
+        """Uso de cuota y respuestas por llave, para logs/resumen de la corrida."""
+        with self._lock:
+            ahora = time.time()
+            llaves = {}
+            for i in range(self.n):
+                self._rodar_dia(i, ahora)
+                conteos = {
+                    r: self._conteos[i * len(RESULTADOS) + j]
+                    for j, r in enumerate(RESULTADOS)
+                    if self._conteos[i * len(RESULTADOS) + j]
+                }
+                llaves[f"#{i + 1}"] = {
+                    "uso_dia": f"{self._uso_dia[i]}/{self.rpd}",
+                    "en_vuelo": self._en_vuelo[i],
+                    "bloqueada": self._bloqueada_hasta[i] > ahora,
+                    "latencia_s": round(self._latencia[i], 2),
+                    "tasa_error": round(self._tasa_error[i], 2),
+                    **conteos,
+                }
+            return llaves
+
+    # ------------------------------------------------------------------
+    # Persistencia entre corridas (data/gemini_keys_state.json)
+
+    def cargar(self):
+        """Restaura el estado guardado de las llaves que siguen en el .env (por huella)."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                guardado = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Estado de la granja Gemini ilegible ({e}); se empieza de cero.")
+            return 0
+        restauradas = 0
+        with self._lock:
+            ahora = time.time()
+            for i, h in enumerate(self.huellas[:self.n]):
+                datos = guardado.get(h)
+                if not datos:
+                    continue
+                restauradas += 1
+                if datos.get("dia") == self._dia[i]:
+                    self._uso_dia[i] = datos.get("uso_dia", 0)
+                if datos.get("bloqueada_hasta", 0) > ahora:
+                    self._bloqueada_hasta[i] = datos["bloqueada_hasta"]
+                    self._tokens[i] = 0.0
+                self._ultimo_429[i] = datos.get("ultimo_429", 0.0)
+                self._429_seguidos[i] = datos.get("429_seguidos", 0)
+                self._latencia[i] = datos.get("latencia_s", 0.0)
+                self._tasa_error[i] = datos.get("tasa_error", 0.0)
+        bloqueadas = self.n - self.disponibles()
+        logger.info(
+            f"Estado de la granja Gemini restaurado: {restauradas}/{self.n} llaves conocidas, "
+            f"{bloqueadas} sin cuota hasta su ventana de reset."
+        )
+        return restauradas
+
+    def guardar(self):
+        if not self.path or not self.huellas:
+            return
+        with self._lock:
+            ahora = time.time()
+            datos = {
+                h: {
+                    "dia": self._dia[i],
+                    "uso_dia": self._uso_dia[i],
+                    "ultimo_429": self._ultimo_429[i],
+                    "429_seguidos": self._429_seguidos[i],
+                    "bloqueada_hasta": self._bloqueada_hasta[i],
+                    "reset": self._proximo_reset(ahora),
+                    "latencia_s": round(self._latencia[i], 3),
+                    "tasa_error": round(self._tasa_error[i], 3),
+                }
+                for i, h in enumerate(self.huellas[:self.n])
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(datos, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el estado de la granja Gemini: {e}")
+
+
+def crear_scheduler(keys, cfg, project_root, ctx=None):
+    """KeyScheduler para `keys` con el estado persistido (`gemini.estado_path`) ya cargado."""
+    cfg = cfg or {}
+    path = cfg.get("estado_path", "data/gemini_keys_state.json")
+    scheduler = KeyScheduler(
+        len(keys), cfg, ctx=ctx, huellas=[huella(k) for k in keys],
+        path=os.path.join(project_root, path) if path else None,
+    )
+    scheduler.cargar()
+    return scheduler
+
+
+def sondear(scheduler, keys, clientes=None, saltar_bloqueadas=True):
+    """
+    Sondeo inicial: una request mínima por llave, todas en paralelo. Mide latencia, detecta
+    llaves sin cuota o inválidas antes de la corrida y lo registra en el scheduler.
+    Devuelve un informe por llave (lo que escribe scripts/verify_farm.py).
+    """
+    if clientes is None:
+        from google import genai
+        clientes = [genai.Client(api_key=k) for k in keys]
+    ahora = time.time()
+    bloqueadas = {i for i in range(scheduler.n) if scheduler._bloqueada_hasta[i] > ahora}
+    estados = {"ok": "OK", "429": "QUOTA_EXHAUSTED", "403": "PERMISSION_DENIED"}
+
+    def _probar(i):
+        info = {"index": i + 1, "key_prefix": keys[i][:10] + "..."}
+        if saltar_bloqueadas and i in bloqueadas:
+            info["status"] = "SKIPPED_BLOCKED"
+            return info
+        t0 = time.perf_counter()
+        try:
+            response = clientes[i].models.generate_content(model='gemini-flash-latest', contents=["Hi"])
+            resultado = "ok"
+            info["response"] = (response.text or "").strip()
+        except Exception as e:
+            resultado = clasificar_error(str(e))
+            info["error_details"] = str(e)[:100]
+        info["latencia_s"] = round(time.perf_counter() - t0, 2)
+        info["status"] = estados.get(resultado, "ERROR")
+        scheduler.registrar_sondeo(i, resultado, info["latencia_s"])
+        return info
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, len(keys))) as executor:
+        informe = list(executor.map(_probar, range(len(keys))))
+    sanas = sum(1 for r in informe if r["status"] == "OK")
+    logger.info(f"🔎 Sondeo de la granja Gemini: {sanas}/{len(keys)} llaves OK en {time.perf_counter() - t0:.1f}s.")
+    scheduler.guardar()
+    return informe
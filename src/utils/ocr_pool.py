@@ -0,0 +1,118 @@
+import copy
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada proceso del pool: los modelos se cargan una vez en el initializer y quedan
+# vivos mientras viva el proceso (nada de cargar EasyOCR por llamada).
+_estado = {}
+
+
+def _inicializar(cargar_easyocr, tesseract_cmd, hilos):
+    t0 = time.perf_counter()
+    import cv2
+    cv2.setNumThreads(hilos)
+    if cargar_easyocr:
+        import easyocr
+        import torch
+        # Cada proceso se queda con su porción del presupuesto de núcleos
+        torch.set_num_threads(hilos)
+        _estado["reader"] = easyocr.Reader(['en'], gpu=False, verbose=False)
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _estado["carga_s"] = time.perf_counter() - t0
+
+
+def _digitos(fragmentos):
+    return "".join(filter(str.isdigit, "".join(fragmentos).strip()))
+
+
+def _ping():
+    # Breve pausa para que cada ping lo tome un proceso distinto y todos terminen de cargar
+    time.sleep(0.2)
+    return os.getpid(), _estado.get("carga_s", 0.0)
+
+
+def _leer_easyocr(img, mag_ratios):
+    """Una variante, todas las magnitudes: un texto por magnitud (vacío si EasyOCR falla)."""
+    textos = []
+    for mag in mag_ratios:
+        try:
+            textos.append(_digitos(_estado["reader"].readtext(img, allowlist='0123456789', detail=0, mag_ratio=mag)))
+        except Exception:
+            textos.append("")
+    return textos
+
+
+def _leer_tesseract(img, config):
+    import pytesseract
+    return _digitos([pytesseract.image_to_string(img, config=config)])
+
+
+def procesos_ocr(pool_cfg, scraper_workers=1):
+    """
+    Procesos de OCR que le tocan a cada scraper: `procesos` explícito, o el presupuesto total
+    de núcleos (`core_budget`, default todos menos uno) repartido entre los workers.
+    """
+    if pool_cfg.get("procesos"):
+        return max(1, int(pool_cfg["procesos"]))
+    presupuesto = pool_cfg.get("core_budget") or max(1, (os.cpu_count() or 2) - 1)
+    return max(1, int(presupuesto) // max(1, scraper_workers))
+
+
+def repartir_nucleos(config, scraper_workers):
+    """Copia del config con `ocr.pool.procesos` fijado para N workers que comparten la máquina."""
+    pool_cfg = config.get("ocr", {}).get("pool", {})
+    if not pool_cfg.get("enabled", False):
+        return config
+    config = copy.deepcopy(config)
+    config["ocr"]["pool"]["procesos"] = procesos_ocr(pool_cfg, scraper_workers)
+    return config
+
+
+class OcrPool:
+    """
+    Pool persistente de procesos para el tier local: reparte las variantes de preprocesamiento
+    entre procesos con EasyOCR (y pytesseract) ya cargados, y devuelve las lecturas en el mismo
+    orden que la evaluación secuencial, así el voto da el mismo resultado.
+    """
+
+    def __init__(self, procesos, cargar_easyocr=True, tesseract_cmd=None, hilos_por_proceso=1):
+        self.procesos = procesos
+        self._executor = ProcessPoolExecutor(
+            max_workers=procesos,
+            # 'spawn' como el WorkerPool: igual en Windows y Linux, y seguro con torch
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar,
+            initargs=(cargar_easyocr, tesseract_cmd, hilos_por_proceso),
+        )
+
+    def calentar(self):
+        """Levanta los procesos y espera a que terminen de cargar los modelos."""
+        t0 = time.perf_counter()
+        cargas = dict(f.result() for f in [self._executor.submit(_ping) for _ in range(self.procesos)])
+        logger.info(
+            f"✅ Pool OCR listo: {len(cargas)} procesos en {time.perf_counter() - t0:.1f}s "
+            f"(carga de modelos máx {max(cargas.values()):.1f}s)."
+        )
+
+    def leer_easyocr(self, variants, mag_ratios):
+        """[(variante, mag, texto)] en el orden variante → magnitud, igual que la lectura secuencial."""
+        nombres = list(variants)
+        futuros = [self._executor.submit(_leer_easyocr, variants[n], tuple(mag_ratios)) for n in nombres]
+        return [
+            (nombre, mag, texto)
+            for nombre, futuro in zip(nombres, futuros)
+            for mag, texto in zip(mag_ratios, futuro.result())
+        ]
+
+    def leer_tesseract(self, img, config):
+        return self._executor.submit(_leer_tesseract, img, config).result()
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
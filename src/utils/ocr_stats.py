@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StrategyStats:
+    """
+    Historial persistido (JSON) de aciertos por estrategia de OCR local ("variante@magnitud").
+    Una estrategia acierta cuando su lectura coincide con la que el portal aceptó.
+    Sirve para evaluar primero las estrategias que más suelen acertar (corte temprano).
+
+    Con --workers N varios procesos comparten el archivo: cada uno acumula sus deltas y cada
+    `guardar_cada` captchas (y al cerrar) los suma a lo que haya en disco, con un archivo
+    `.lock` tomando la lectura-suma-escritura para que ningún worker pise lo de otro.
+    """
+
+    def __init__(self, path, guardar_cada=20, espera_lock_s=5.0, lock_viejo_s=30.0):
+        self.path = path
+        self.guardar_cada = max(1, guardar_cada)
+        self.espera_lock_s = espera_lock_s
+        self.lock_viejo_s = lock_viejo_s
+        self._lock = threading.Lock()
+        self._pendiente = {}  # clave → [hits, evaluadas] todavía no escritos a disco
+        self._sin_guardar = 0
+        self.datos = self._cargar()
+
+    def _cargar(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Historial de estrategias OCR ilegible ({e}); se empieza de cero.")
+            return {}
+
+    def tasa(self, clave):
+        """Tasa de acierto suavizada (Laplace): una estrategia sin historial arranca en 0.5."""
+        hits, evaluadas = self.datos.get(clave, (0, 0))
+        return (hits + 1) / (evaluadas + 2)
+
+    def ordenar(self, claves):
+        """Claves de mayor a menor tasa de acierto; a igual tasa se respeta el orden dado."""
+        with self._lock:
+            return sorted(claves, key=lambda c: -self.tasa(c))
+
+    def registrar(self, lecturas, correcta):
+        """lecturas: [(clave, texto)] evaluadas para un captcha cuya lectura correcta fue `correcta`."""
+        with self._lock:
+            for clave, texto in lecturas:
+                for tabla in (self.datos, self._pendiente):
+                    hits, evaluadas = tabla.get(clave, (0, 0))
+                    tabla[clave] = [hits + (texto == correcta), evaluadas + 1]
+            self._sin_guardar += 1
+            if self._sin_guardar >= self.guardar_cada:
+                self._guardar()
+
+    def guardar(self):
+        """Escribe a disco los deltas pendientes (al cerrar el breaker)."""
+        with self._lock:
+            self._guardar()
+
+    def _guardar(self):
+        # Llamar con self._lock tomado
+        if not self._pendiente:
+            return
+        if not self.path:
+            self._pendiente, self._sin_guardar = {}, 0
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._lock_archivo():
+                datos = self._cargar()
+                for clave, (hits, evaluadas) in self._pendiente.items():
+                    en_disco = datos.get(clave, (0, 0))
+                    datos[clave] = [en_disco[0] + hits, en_disco[1] + evaluadas]
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(datos, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+        except (OSError, TimeoutError) as e:
+            # Los deltas quedan pendientes para el próximo guardado
+            logger.warning(f"No se pudo guardar el historial de estrategias OCR: {e}")
+            return
+        self.datos = datos
+        self._pendiente, self._sin_guardar = {}, 0
+
+    @contextmanager
+    def _lock_archivo(self):
+        """Lock entre procesos con un archivo creado en exclusiva (O_EXCL anda igual en Windows)."""
+        lock = self.path + ".lock"
+        limite = time.time() + self.espera_lock_s
+        while True:
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                # Un worker que murió con el lock tomado no puede trabar al resto para siempre
+                try:
+                    if time.time() - os.path.getmtime(lock) > self.lock_viejo_s:
+                        os.remove(lock)
+                        continue
+                except OSError:
+                    continue
+                if time.time() > limite:
+                    raise TimeoutError(f"{lock} tomado hace más de {self.espera_lock_s:.0f}s")
+                time.sleep(0.02)
+        try:
+            os.close(fd)
+            yield
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
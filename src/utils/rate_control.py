@@ -0,0 +1,165 @@
+import logging
+import multiprocessing
+import time
+
+logger = logging.getLogger(__name__)
+
+CERRADO, ABIERTO, SEMIABIERTO = 0, 1, 2
+_NOMBRE_ESTADO = {CERRADO: "cerrado", ABIERTO: "abierto", SEMIABIERTO: "semiabierto"}
+
+# Clases de falla (ver result_parser.clase_de_falla) que indican que el PORTAL se degradó.
+# "ocr" y "captcha" son problemas nuestros de lectura: no frenan al portal.
+CLASES_DEGRADACION = ("sesion", "lectura", "ya_utilizado", "timeout", "http")
+_CLASES = ("ok",) + CLASES_DEGRADACION + ("ocr", "captcha", "otro")
+
+
+class RateController:
+    """
+    Control de ritmo AIMD + circuit breaker para las consultas al portal, compartido por
+    todos los workers (el estado vive en memoria compartida de multiprocessing).
+
+    - Cada consulta exitosa con latencia normal suma `increase_rpm` al ritmo permitido.
+    - Una falla de degradación o una latencia por encima de `latency_target_s` lo multiplica
+      por `decrease_factor` (nunca por debajo de `min_rpm`).
+    - `breaker_threshold` fallas de degradación seguidas abren el breaker: nadie consulta
+      durante `cooldown_s` (duplicándose en cada reapertura). Después pasa una sola consulta
+      de prueba (semiabierto): si sale bien se cierra, si no se vuelve a abrir. Si la prueba
+      no informa nada en `prueba_timeout_s` (el worker murió), pasa otra consulta de prueba.
+    """
+
+    def __init__(self, config=None, ctx=None):
+        cfg = (config or {}).get("rate_control", {})
+        self.enabled = cfg.get("enabled", True)
+        self.min_rpm = cfg.get("min_rpm", 2.0)
+        self.max_rpm = cfg.get("max_rpm", 60.0)
+        self.increase_rpm = cfg.get("increase_rpm", 1.0)
+        self.decrease_factor = cfg.get("decrease_factor", 0.5)
+        self.latency_target_s = cfg.get("latency_target_s", 15.0)
+        self.breaker_threshold = cfg.get("breaker_threshold", 5)
+        self.cooldown_s = cfg.get("cooldown_s", 60.0)
+        self.max_cooldown_s = cfg.get("max_cooldown_s", 600.0)
+        self.max_trips = cfg.get("max_trips", 6)
+        self.prueba_timeout_s = cfg.get("prueba_timeout_s", 120.0)
+
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self._lock = ctx.Lock()
+        self._rpm = ctx.Value("d", cfg.get("initial_rpm", self.max_rpm), lock=False)
+        self._proximo_slot = ctx.Value("d", 0.0, lock=False)
+        self._estado = ctx.Value("i", CERRADO, lock=False)
+        self._abierto_hasta = ctx.Value("d", 0.0, lock=False)
+        self._semiabierto_desde = ctx.Value("d", 0.0, lock=False)
+        self._cooldown_actual = ctx.Value("d", self.cooldown_s, lock=False)
+        self._fallas_seguidas = ctx.Value("i", 0, lock=False)
+        self._aperturas_seguidas = ctx.Value("i", 0, lock=False)
+        self._latencia_ewma = ctx.Value("d", 0.0, lock=False)
+        self._conteos = ctx.Array("i", len(_CLASES), lock=False)
+
+    # ------------------------------------------------------------------
+
+    def esperar_turno(self):
+        """Bloquea hasta que el ritmo permitido y el estado del breaker dejen hacer la próxima consulta."""
+        if not self.enabled:
+            return
+        while True:
+            with self._lock:
+                ahora = time.time()
+                estado = self._estado.value
+                if estado == ABIERTO and ahora >= self._abierto_hasta.value:
+                    # Vence el enfriamiento: dejamos pasar UNA consulta de prueba
+                    self._estado.value = SEMIABIERTO
+                    self._semiabierto_desde.value = ahora
+                    logger.warning("🔌 Breaker SEMIABIERTO: enviando consulta de prueba al portal.")
+                    return
+                if estado == ABIERTO:
+                    espera = self._abierto_hasta.value - ahora
+                elif estado == SEMIABIERTO:
+                    vence = self._semiabierto_desde.value + self.prueba_timeout_s
+                    if ahora >= vence:
+                        # El worker de la prueba murió o se fue sin informar: pasa este como prueba
+                        self._semiabierto_desde.value = ahora
+                        logger.warning(
+                            f"🔌 Breaker SEMIABIERTO: la consulta de prueba no respondió en {self.prueba_timeout_s:.0f}s, enviando otra."
+                        )
+                        return
+                    # Otro worker está haciendo la consulta de prueba
+                    espera = min(1.0, vence - ahora)
+                else:
+                    intervalo = 60.0 / max(self._rpm.value, self.min_rpm)
+                    slot = max(ahora, self._proximo_slot.value)
+                    self._proximo_slot.value = slot + intervalo
+                    espera = slot - ahora
+                    if espera <= 0:
+                        return
+            if estado == CERRADO:
+                # El slot ya quedó reservado: dormimos fuera del lock y consultamos
+                time.sleep(espera)
+                return
+            time.sleep(min(espera, 5.0))
+
+    def registrar(self, latencia_s=None, clase=None):
+        """Informa el resultado de una consulta (clase=None si salió bien) y ajusta ritmo/breaker."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conteos[_CLASES.index(clase if clase in _CLASES else "otro") if clase else 0] += 1
+            if latencia_s is not None:
+                ewma = self._latencia_ewma.value
+                self._latencia_ewma.value = latencia_s if ewma == 0 else 0.8 * ewma + 0.2 * latencia_s
+
+            degradacion = clase in CLASES_DEGRADACION
+            lento = latencia_s is not None and latencia_s > self.latency_target_s
+
+            if degradacion or lento:
+                anterior = self._rpm.value
+                self._rpm.value = max(self.min_rpm, anterior * self.decrease_factor)
+                logger.warning(
+                    f"🐢 Portal degradado ({clase or f'latencia {latencia_s:.1f}s'}): ritmo {anterior:.1f} → {self._rpm.value:.1f} consultas/min."
+                )
+            elif clase is None:
+                self._rpm.value = min(self.max_rpm, self._rpm.value + self.increase_rpm)
+
+            if degradacion:
+                self._fallas_seguidas.value += 1
+                if self._estado.value == SEMIABIERTO or self._fallas_seguidas.value >= self.breaker_threshold:
+                    self._abrir()
+            elif clase is None:
+                self._fallas_seguidas.value = 0
+                self._aperturas_seguidas.value = 0
+                if self._estado.value != CERRADO:
+                    logger.info("✅ Breaker CERRADO: el portal respondió bien, retomando ritmo.")
+                self._estado.value = CERRADO
+                self._cooldown_actual.value = self.cooldown_s
+            elif self._estado.value == SEMIABIERTO:
+                # Falla no atribuible al portal (ej. OCR): la prueba no es concluyente, se reintenta
+                self._estado.value = ABIERTO
+                self._abierto_hasta.value = time.time()
+
+    def _abrir(self):
+        # Llamar con el lock tomado
+        if self._estado.value == ABIERTO:
+            return
+        if self._estado.value == SEMIABIERTO:
+            self._cooldown_actual.value = min(self.max_cooldown_s, self._cooldown_actual.value * 2)
+        self._estado.value = ABIERTO
+        self._abierto_hasta.value = time.time() + self._cooldown_actual.value
+        self._aperturas_seguidas.value += 1
+        self._fallas_seguidas.value = 0
+        self._rpm.value = self.min_rpm
+        logger.error(
+            f"🔌 Breaker ABIERTO ({self._aperturas_seguidas.value}/{self.max_trips}): pausa de "
+            f"{self._cooldown_actual.value:.0f}s para dejar recuperar al portal."
+        )
+
+    def debe_abortar(self):
+        """True si el breaker se abrió max_trips veces seguidas sin ninguna consulta exitosa."""
+        return self.enabled and self._aperturas_seguidas.value >= self.max_trips
+
+    def estado(self):
+        """Snapshot para logs/traza: ritmo permitido, estado del breaker, latencia y conteos por clase."""
+        with self._lock:
+            return {
+                "rate_rpm": round(self._rpm.value, 2),
+                "breaker": _NOMBRE_ESTADO[self._estado.value],
+                "latencia_ewma_s": round(self._latencia_ewma.value, 2),
+                "conteos": {c: self._conteos[i] for i, c in enumerate(_CLASES) if self._conteos[i]},
+            }
@@ -0,0 +1,115 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.utils.result_parser import clase_de_falla
+
+logger = logging.getLogger(__name__)
+
+# Vigencia (días) por tipo de resultado. Un dominio ya inscripto no cambia; Vigente sí puede
+# pasar a utilizado/vencido, así que dura poco. Los errores nunca se guardan, y "Consultado"
+# (página sin ninguna palabra de resultado) tampoco: no tiene TTL.
+DEFAULT_TTL_DIAS = {
+    "dominio": 365,
+    "Vencido": 30,
+    "Vigente": 7,
+}
+
+
+def _clave_ttl(resultado, dominio):
+    return "dominio" if dominio else resultado
+
+
+class ResultCache:
+    """
+    Cache persistente (SQLite) de resultados del portal entre corridas, por VIN + tipo (N/I).
+    Los mismos VINs reaparecen en reportes SIAC sucesivos: con un hit no se abre el formulario
+    ni se resuelve captcha.
+    """
+
+    def __init__(self, path, ttl_dias=None):
+        self.path = path
+        self.ttl_dias = {**DEFAULT_TTL_DIAS, **(ttl_dias or {})}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            " vin TEXT NOT NULL, tipo TEXT NOT NULL, resultado TEXT NOT NULL,"
+            " dominio TEXT NOT NULL DEFAULT '', ts REAL NOT NULL,"
+            " PRIMARY KEY (vin, tipo))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.consultas = 0
+
+    def obtener(self, vin, tipo="N", ahora=None):
+        """(resultado, dominio) vigente para el VIN, o None si no está o ya venció."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT resultado, dominio, ts FROM resultados WHERE vin = ? AND tipo = ?",
+                (str(vin).strip(), tipo),
+            ).fetchone()
+            self.consultas += 1
+        if fila is None:
+            return None
+        resultado, dominio, ts = fila
+        ttl = self.ttl_dias.get(_clave_ttl(resultado, dominio), 0)
+        if (ahora or time.time()) - ts > ttl * 86400:
+            return None
+        with self._lock:
+            self.hits += 1
+        return resultado, dominio
+
+    def guardar(self, vin, tipo, resultado, dominio="", ahora=None):
+        """Guarda un resultado exitoso. Devuelve False (sin guardar) para errores o tipos sin TTL."""
+        if clase_de_falla(resultado) is not None or not self.ttl_dias.get(_clave_ttl(resultado, dominio)):
+            return False
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resultados (vin, tipo, resultado, dominio, ts) VALUES (?, ?, ?, ?, ?)",
+                (str(vin).strip(), tipo, resultado, dominio or "", ahora or time.time()),
+            )
+            self._conn.commit()
+        return True
+
+    def tasa_hits(self):
+        return self.hits / self.consultas if self.consultas else 0.0
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+def crear_cache(config, project_root):
+    """ResultCache según `cache:` del YAML, o None si está deshabilitado."""
+    cfg = config.get("cache", {})
+    if not cfg.get("enabled", True):
+        return None
+    path = os.path.join(project_root, cfg.get("path", "data/vin_cache.sqlite"))
+    return ResultCache(path, cfg.get("ttl_dias"))
+
+
+def resolver_desde_cache(cache, vins, tipos, writer, logger_=None):
+    """
+    Entrega por `writer` los VINs con resultado vigente en cache y devuelve los que quedan por
+    consultar. Loguea la tasa de hits de la corrida.
+    """
+    if cache is None:
+        return vins
+    pendientes = []
+    for vin in vins:
+        tipo = tipos.get(str(vin).strip(), "N")
+        cacheado = cache.obtener(vin, tipo)
+        if cacheado is None:
+            pendientes.append(vin)
+            continue
+        resultado, dominio = cacheado
+        writer.registrar(vin, resultado, dominio, tipo=tipo, origen="cache")
+    (logger_ or logger).info(
+        f"Cache de resultados: {len(vins) - len(pendientes)}/{len(vins)} VINs resueltos sin consultar "
+        f"al portal ({cache.tasa_hits():.0%} de hits)."
+    )
+    return pendientes
@@ -0,0 +1,53 @@
+import re
+
+
+def clasificar_resultado(body_text):
+    """
+    Clasifica el texto de la página de resultado del portal.
+    Devuelve (resultado, dominio). Prioridad: Dominio > Vencido > Vigente.
+    """
+    body_lower = body_text.lower()
+
+    # CASO 1: Captcha incorrecto → marcar para reintento automático
+    if "incorrecto" in body_lower or "ya utilizado" in body_lower:
+        return "ERROR_CAPTCHA_INCORRECTA", ""
+
+    # CASO 2: Consulta exitosa (la página muestra el dominio)
+    # Extraer dominio con el patrón confirmado del portal DNPRA:
+    # "con el dominio AI002LB inscripto en el RRSS..."
+    dominio_match = (
+        re.search(r'con el dominio\s+([A-Z0-9]{4,10})\s+inscripto', body_text) or
+        re.search(r'[Dd]ominio\s*:\s*([A-Z0-9]{4,10})', body_text)
+    )
+    dominio = dominio_match.group(1) if dominio_match else ""
+
+    if dominio:
+        return dominio, dominio
+    elif "vencido" in body_lower:
+        return "Vencido", ""
+    elif "vigente" in body_lower:
+        return "Vigente", ""
+    return "Consultado", ""
+
+
+def clase_de_falla(resultado, body_text=""):
+    """
+    Clase de la falla de una consulta, o None si salió bien.
+    ocr: no se pudo leer el captcha | captcha: el portal lo rechazó ("incorrecto")
+    ya_utilizado: el portal dice que el código ya se usó | sesion: navegador/sesión caída
+    lectura: no se pudo leer la respuesta | timeout | http: error de red del motor HTTP | otro
+    """
+    resultado = str(resultado or "")
+    if resultado == "ERROR_CAPTCHA":
+        return "ocr"
+    if resultado == "ERROR_CAPTCHA_INCORRECTA":
+        return "ya_utilizado" if "ya utilizado" in (body_text or "").lower() else "captcha"
+    if resultado == "Error de Sesión":
+        return "sesion"
+    if resultado == "Error Lectura":
+        return "lectura"
+    if resultado.startswith("Error HTTP"):
+        return "http"
+    if resultado.startswith("Error"):
+        return "timeout" if "timeout" in resultado.lower() else "otro"
+    return None
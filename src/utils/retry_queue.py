@@ -0,0 +1,82 @@
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Intentos TOTALES por clase de falla (ver result_parser.clase_de_falla). Una clase ausente
+# (ej. "otro") no se reintenta en la corrida: el VIN queda con el error en el Excel.
+DEFAULT_MAX_ATTEMPTS = {
+    "captcha": 3,
+    "ya_utilizado": 3,
+    "ocr": 2,
+    "sesion": 2,
+    "lectura": 2,
+    "timeout": 2,
+    "http": 2,
+}
+
+_PASADA_PRINCIPAL, _REINTENTO = 0, 1
+
+
+class RetryQueue:
+    """
+    Cola de VINs de una corrida con reintentos priorizados.
+    Primero sale la pasada principal en el orden original; los VINs que fallan con una clase
+    reintentable vuelven a la cola detrás de ella, con backoff exponencial por intento.
+    Así un captcha incorrecto se reintenta en la misma corrida y no obliga a relanzar todo.
+    """
+
+    def __init__(self, vins, config=None):
+        cfg = (config or {}).get("retry", {})
+        self.enabled = cfg.get("enabled", True)
+        self.max_attempts = {**DEFAULT_MAX_ATTEMPTS, **cfg.get("max_attempts", {})}
+        self.backoff_s = cfg.get("backoff_s", 2.0)
+        self.max_backoff_s = cfg.get("max_backoff_s", 30.0)
+
+        self.total = len(vins)
+        self.intentos = {}
+        self.reintentos = 0
+        self.recuperados = 0
+        self._seq = itertools.count()
+        self._heap = [(_PASADA_PRINCIPAL, 0.0, next(self._seq), vin) for vin in vins]
+        heapq.heapify(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def siguiente(self):
+        """(vin, intento) del próximo VIN; espera si el primer reintento todavía está en backoff."""
+        fase, listo_en, _, vin = heapq.heappop(self._heap)
+        espera = listo_en - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        self.intentos[vin] = self.intentos.get(vin, 0) + 1
+        return vin, self.intentos[vin]
+
+    def fallo(self, vin, clase):
+        """
+        Registra una falla del VIN. Devuelve True si vuelve a la cola (el resultado todavía no es
+        definitivo) o False si agotó los intentos de su clase.
+        """
+        intento = self.intentos.get(vin, 1)
+        if not self.enabled or intento >= self.max_attempts.get(clase, 1):
+            return False
+        backoff = min(self.max_backoff_s, self.backoff_s * 2 ** (intento - 1))
+        heapq.heappush(self._heap, (_REINTENTO, time.monotonic() + backoff, next(self._seq), vin))
+        self.reintentos += 1
+        return True
+
+    def exito(self, vin):
+        if self.intentos.get(vin, 1) > 1:
+            self.recuperados += 1
+
+    def log_resumen(self, logger_=None):
+        if self.reintentos:
+            (logger_ or logger).info(
+                f"Reintentos en la corrida: {self.reintentos} (VINs recuperados sin esperar otra corrida: {self.recuperados})."
+            )
@@ -0,0 +1,273 @@
+import contextvars
+import functools
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Registro del VIN al que pertenece el código en curso (fijado por span/ligar): una anotación
+# tardía (ej. el hilo del hedge que siguió tras cancelarse) cae en su VIN y no en el siguiente
+_registro = contextvars.ContextVar("registro_traza", default=None)
+
+
+class Tracer:
+    """
+    Traza liviana por VIN: spans (context managers) alrededor de cada etapa y un registro
+    JSON por VIN (tiempos por etapa, tier de OCR, reintentos y resultado) en un .jsonl.
+    Es thread-safe porque en modo pipeline el OCR corre en otro hilo durante el mismo VIN;
+    el trabajo mandado a otros hilos se envuelve con `ligar` para que anote en su propio VIN.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._actual = None
+
+    def iniciar_vin(self, vin, **extra):
+        with self._lock:
+            self._actual = {
+                "vin": str(vin),
+                "inicio": time.time(),
+                "etapas": {},
+                "conteos": {},
+                **extra,
+            }
+
+    def _registro_actual(self):
+        # Llamar con el lock tomado
+        registro = _registro.get()
+        return registro if registro is not None else self._actual
+
+    @contextmanager
+    def span(self, etapa):
+        with self._lock:
+            registro = self._registro_actual()
+        token = _registro.set(registro)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            _registro.reset(token)
+            with self._lock:
+                if registro is not None:
+                    etapas = registro["etapas"]
+                    etapas[etapa] = etapas.get(etapa, 0.0) + duracion
+
+    def ligar(self, fn):
+        """`fn` atado al registro actual, para correrlo en otro hilo (executor del hedge, pipeline)."""
+        with self._lock:
+            registro = self._registro_actual()
+
+        @functools.wraps(fn)
+        def _ligada(*args, **kwargs):
+            token = _registro.set(registro)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _registro.reset(token)
+        return _ligada
+
+    def anotar(self, **campos):
+        """Agrega/pisa campos del registro actual (ej. tier='gemini')."""
+        with self._lock:
+            registro = self._registro_actual()
+            if registro is not None:
+                registro.update(campos)
+
+    def contar(self, clave, n=1):
+        """Incrementa un contador del registro actual (ej. reintentos de captcha)."""
+        with self._lock:
+            registro = self._registro_actual()
+            if registro is not None:
+                conteos = registro["conteos"]
+                conteos[clave] = conteos.get(clave, 0) + n
+
+    def finalizar_vin(self, resultado, dominio=""):
+        with self._lock:
+            registro, self._actual = self._actual, None
+        if registro is None:
+            return None
+        registro["fin"] = time.time()
+        registro["total_s"] = round(registro["fin"] - registro["inicio"], 3)
+        registro["etapas"] = {k: round(v, 3) for k, v in registro["etapas"].items()}
+        registro["resultado"] = resultado
+        registro["dominio"] = dominio
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"No se pudo escribir la traza: {e}")
+        return registro
+
+
+class _NullTracer:
+    """Tracer que no hace nada (tracing deshabilitado o código usado fuera del scraper)."""
+
+    def iniciar_vin(self, vin, **extra):
+        pass
+
+    @contextmanager
+    def span(self, etapa):
+        yield
+
+    def ligar(self, fn):
+        return fn
+
+    def anotar(self, **campos):
+        pass
+
+    def contar(self, clave, n=1):
+        pass
+
+    def finalizar_vin(self, resultado, dominio=""):
+        return None
+
+
+_tracer = _NullTracer()
+
+
+def set_tracer(tracer):
+    """Instala el tracer del proceso (cada worker tiene el suyo)."""
+    global _tracer
+    _tracer = tracer if tracer is not None else _NullTracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def span(etapa):
+    return _tracer.span(etapa)
+
+
+def ligar(fn):
+    return _tracer.ligar(fn)
+
+
+def anotar(**campos):
+    _tracer.anotar(**campos)
+
+
+def contar(clave, n=1):
+    _tracer.contar(clave, n)
+
+
+def crear_tracer(config, project_root, worker_id=None):
+    """Crea el tracer según `tracing:` del YAML: logs/trace_<fecha>[_wN].jsonl. None si está deshabilitado."""
+    cfg = config.get("tracing", {})
+    if not cfg.get("enabled", True):
+        return None
+    log_dir = os.path.join(project_root, cfg.get("dir", "logs"))
+    sufijo = "" if worker_id is None else f"_w{worker_id}"
+    nombre = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}{sufijo}.jsonl"
+    return Tracer(os.path.join(log_dir, nombre))
+
+
+# ----------------------------------------------------------------------
+# Resumen de corridas
+# ----------------------------------------------------------------------
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    idx = min(len(ordenados) - 1, max(0, int(round(p / 100 * (len(ordenados) - 1)))))
+    return ordenados[idx]
+
+
+def leer_trazas(patrones):
+    """Lee registros de uno o más .jsonl (acepta globs, ej. los de todos los workers de una corrida)."""
+    registros = []
+    for patron in patrones:
+        paths = sorted(glob.glob(patron))
+        if not paths:
+            if any(c in patron for c in "*?["):
+                logger.warning(f"Ninguna traza coincide con {patron}.")
+                continue
+            paths = [patron]  # path literal: si no existe, que falle con el error de siempre
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for linea in f:
+                    linea = linea.strip()
+                    if linea:
+                        registros.append(json.loads(linea))
+    return registros
+
+
+def resumir(registros):
+    """p50/p95/p99 por etapa, distribución de tiers/resultados y VINs/hora de la corrida."""
+    por_etapa = {}
+    for r in registros:
+        por_etapa.setdefault("total", []).append(r.get("total_s", 0.0))
+        for etapa, seg in r.get("etapas", {}).items():
+            por_etapa.setdefault(etapa, []).append(seg)
+
+    etapas = {}
+    for etapa, valores in por_etapa.items():
+        ordenados = sorted(valores)
+        etapas[etapa] = {
+            "n": len(ordenados),
+            "p50": _percentil(ordenados, 50),
+            "p95": _percentil(ordenados, 95),
+            "p99": _percentil(ordenados, 99),
+        }
+
+    tiers = {}
+    resultados = {}
+    for r in registros:
+        tier = r.get("tier") or "-"
+        tiers[tier] = tiers.get(tier, 0) + 1
+        clase = r.get("resultado") if str(r.get("resultado", "")).startswith(("ERROR", "Error")) else "OK"
+        resultados[clase] = resultados.get(clase, 0) + 1
+
+    # Latencia de Gemini por captcha → delay sugerido para ocr.hedge: arrancar EasyOCR sólo
+    # cuando Gemini ya tardó más que su p95 (así la carrera se paga únicamente en la cola lenta)
+    hedge = {}
+    gemini = sorted(r["gemini_s"] for r in registros if r.get("gemini_s") is not None)
+    if gemini:
+        ganadores = {}
+        for r in registros:
+            if r.get("hedge_ganador"):
+                ganadores[r["hedge_ganador"]] = ganadores.get(r["hedge_ganador"], 0) + 1
+        hedge = {
+            "gemini_p50": _percentil(gemini, 50),
+            "gemini_p95": _percentil(gemini, 95),
+            "delay_sugerido_s": round(_percentil(gemini, 95), 1),
+            "ganadores": ganadores,
+        }
+
+    vph = 0.0
+    if registros:
+        duracion = max(r["fin"] for r in registros) - min(r["inicio"] for r in registros)
+        vph = len(registros) * 3600 / duracion if duracion > 0 else 0.0
+
+    return {
+        "vins": len(registros), "vins_hora": vph, "etapas": etapas, "tiers": tiers,
+        "resultados": resultados, "hedge": hedge,
+    }
+
+
+def imprimir_resumen(patrones):
+    resumen = resumir(leer_trazas(patrones))
+    print(f"\nVINs: {resumen['vins']} | Throughput: {resumen['vins_hora']:.1f} VINs/hora\n")
+    print(f"{'Etapa':<22} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    print("-" * 56)
+    for etapa, s in sorted(resumen["etapas"].items(), key=lambda kv: (kv[0] == "total", kv[0])):
+        print(f"{etapa:<22} {s['n']:>6} {s['p50']:>8.2f} {s['p95']:>8.2f} {s['p99']:>8.2f}")
+    print(f"\nTiers OCR: {resumen['tiers']}")
+    print(f"Resultados: {resumen['resultados']}")
+    if resumen["hedge"]:
+        h = resumen["hedge"]
+        print(
+            f"Gemini p50/p95: {h['gemini_p50']:.2f}s / {h['gemini_p95']:.2f}s → ocr.hedge.delay_s sugerido: "
+            f"{h['delay_sugerido_s']}s | ganadores del hedge: {h['ganadores'] or '-'}"
+        )
+    print()
+    return resumen
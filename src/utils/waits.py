@@ -0,0 +1,99 @@
+import logging
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+
+def poll_until(condicion, timeout, intervalo=0.1):
+    """
+    Evalúa condicion() cada `intervalo` segundos hasta que devuelva algo truthy o venza el timeout.
+    Las excepciones de la condición cuentan como "todavía no" (el DOM puede estar a mitad de carga).
+    Devuelve el valor de la condición, o None si venció el timeout.
+    """
+    limite = time.monotonic() + timeout
+    while True:
+        try:
+            valor = condicion()
+            if valor:
+                return valor
+        except Exception:
+            pass
+        if time.monotonic() >= limite:
+            return None
+        time.sleep(intervalo)
+
+
+class WaitEngine:
+    """
+    Esperas por condiciones concretas (iframe listo, captcha presente, resultado visible)
+    en lugar de time.sleep fijos. Cada espera tiene un timeout máximo configurable en
+    `waits:` del YAML y se registra cuánto tardó realmente, para ajustar los límites con datos.
+    """
+
+    DEFAULTS = {
+        "poll_interval": 0.1,
+        "iframe": 15,
+        "radio_recarga": 3,
+        "captcha": 10,
+        "captcha_refresco": 5,
+        "resultado": 15,
+        "chromedriver_kill": 2,
+    }
+
+    def __init__(self, config=None, logger=None):
+        self.timeouts = dict(self.DEFAULTS)
+        self.timeouts.update((config or {}).get("waits", {}) or {})
+        self.intervalo = self.timeouts["poll_interval"]
+        self.logger = logger or logging.getLogger(__name__)
+        # nombre → lista de segundos esperados; y cantidad de timeouts
+        self.duraciones = {}
+        self.vencidas = {}
+
+    def until(self, nombre, condicion, timeout=None):
+        """Espera a que condicion() sea truthy. Devuelve su valor, o None si venció el timeout."""
+        if timeout is None:
+            timeout = self.timeouts.get(nombre, 10)
+        inicio = time.monotonic()
+        valor = poll_until(condicion, timeout, self.intervalo)
+        duracion = time.monotonic() - inicio
+        self.duraciones.setdefault(nombre, []).append(duracion)
+        if valor is None:
+            self.vencidas[nombre] = self.vencidas.get(nombre, 0) + 1
+            self.logger.debug(f"  Espera '{nombre}' venció a los {timeout}s.")
+        return valor
+
+    def exigir(self, nombre, condicion, timeout=None):
+        """
+        Como until(), pero un timeout es una falla: levanta TimeoutException (clase "timeout",
+        reintentable) en vez de seguir con lo que sea que muestre la página.
+        """
+        valor = self.until(nombre, condicion, timeout=timeout)
+        if valor is None:
+            raise TimeoutException(f"Espera '{nombre}' vencida")
+        return valor
+
+    def resumen(self):
+        """{nombre: {n, media, p95, max, timeouts}} con los segundos realmente esperados."""
+        res = {}
+        for nombre, valores in self.duraciones.items():
+            ordenados = sorted(valores)
+            p95 = ordenados[min(len(ordenados) - 1, int(round(0.95 * (len(ordenados) - 1))))]
+            res[nombre] = {
+                "n": len(valores),
+                "media": sum(valores) / len(valores),
+                "p95": p95,
+                "max": ordenados[-1],
+                "timeouts": self.vencidas.get(nombre, 0),
+            }
+        return res
+
+    def log_resumen(self):
+        resumen = self.resumen()
+        if not resumen:
+            return
+        self.logger.info("=== Esperas (segundos reales / timeout configurado) ===")
+        for nombre, s in sorted(resumen.items()):
+            self.logger.info(
+                f"  {nombre:<17} n={s['n']:<5} media={s['media']:.2f} p95={s['p95']:.2f} "
+                f"max={s['max']:.2f} timeouts={s['timeouts']} (límite {self.timeouts.get(nombre, 10)}s)"
+            )
@@ -0,0 +1,194 @@
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import time
+
+from src.scraper import PROJECT_ROOT, DnpraScraper, crear_data_handler, kill_stray_chromedrivers, ordenar_por_tipo
+from src.utils.journal import ResultWriter
+from src.utils.key_scheduler import crear_scheduler, llaves_gemini, sondear
+from src.utils.ocr_pool import repartir_nucleos
+from src.utils.result_cache import crear_cache, resolver_desde_cache
+from src.utils.rate_control import RateController
+
+
+def _worker_main(worker_id, config, vins, tipos, cola_resultados, cola_logs, rate_controller=None, key_scheduler=None):
+    """
+    Punto de entrada de cada proceso worker: su propio Chrome + CaptchaBreaker.
+    No toca el Excel: cada resultado viaja por la cola al coordinador.
+    rate_controller: el RateController del coordinador (memoria compartida), así todos los
+    workers respetan el mismo ritmo y el mismo breaker frente al portal.
+    key_scheduler: idem para las cuotas de la granja Gemini (un token bucket por llave).
+    """
+    # Los logs del worker se reenvían al proceso principal (un solo archivo de log)
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(cola_logs)]
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger(f"{__name__}.w{worker_id}")
+
+    inicio = time.time()
+    procesados = 0
+    scraper = None
+
+    def _enviar(vin, resultado, dominio, **meta):
+        cola_resultados.put(("resultado", worker_id, vin, resultado, dominio, meta))
+
+    try:
+        scraper = DnpraScraper(config, worker_id=worker_id, rate_controller=rate_controller, key_scheduler=key_scheduler)
+        if scraper.http_engine is None:
+            scraper.init_driver()
+        procesados = scraper.procesar_vins(vins, _enviar, tipos=tipos)
+    except Exception as e:
+        logger.error(f"Worker {worker_id} abortó: {e}", exc_info=True)
+    finally:
+        if scraper:
+            scraper.close()
+        cola_resultados.put(("fin", worker_id, procesados, time.time() - inicio))
+
+
+class WorkerPool:
+    """
+    Coordinador del modo paralelo (--workers N).
+    Reparte los VINs pendientes entre N procesos independientes y es el ÚNICO
+    que escribe el journal y llama a DataHandler.save_results, así nunca se escriben en paralelo.
+    """
+
+    def __init__(self, config, workers, save_every=5):
+        self.config = config
+        self.workers = workers
+        self.save_every = save_every
+        self.logger = logging.getLogger(__name__)
+        self.data_handler = crear_data_handler(config)
+
+    @staticmethod
+    def shard(vins, n):
+        """Reparte los VINs en n lotes intercalados (round-robin) para balancear la carga."""
+        return [vins[i::n] for i in range(n)]
+
+    def run(self):
+        self.logger.info("Buscando VINs pendientes en Excel...")
+        vins = self.data_handler.get_pending_vins()
+        if not vins:
+            self.logger.info("No hay VINs pendientes por procesar.")
+            return {}
+
+        # El tipo (N/I) se calcula una sola vez acá: los workers no releen el Excel
+        tipo_map = self.data_handler.get_tipo_map()
+        if self.config.get("session", {}).get("reorder_by_tipo", False):
+            vins = ordenar_por_tipo(vins, tipo_map)
+
+        # Los VINs con resultado vigente en la cache no llegan a los workers
+        cache = crear_cache(self.config, PROJECT_ROOT)
+        writer = ResultWriter(self.data_handler, self.data_handler.journal, save_every=self.save_every, cache=cache)
+        vins = resolver_desde_cache(cache, vins, tipo_map, writer, self.logger)
+        if not vins:
+            writer.cerrar()
+            if cache is not None:
+                cache.cerrar()
+            return {}
+
+        n = max(1, min(self.workers, len(vins)))
+        self.logger.info(f"Se encontraron {len(vins)} VINs pendientes. Lanzando {n} workers...")
+
+        # Limpieza de chromedrivers colgados UNA sola vez, antes de lanzar los workers
+        kill_stray_chromedrivers()
+
+        # 'spawn' es el único método disponible en Windows; lo forzamos para comportarnos igual en todos lados
+        ctx = multiprocessing.get_context("spawn")
+        cola_resultados = ctx.Queue()
+        cola_logs = ctx.Queue()
+        listener = logging.handlers.QueueListener(
+            cola_logs, *logging.getLogger().handlers, respect_handler_level=True
+        )
+        listener.start()
+
+        # Un único ritmo/breaker para todos: el portal ve la suma de los workers
+        rate = RateController(self.config, ctx=ctx)
+        # Idem cuotas de Gemini: las llaves son las mismas para todos los workers. El coordinador
+        # carga el estado persistido, sondea las llaves una vez y guarda el estado
+        gemini_cfg = self.config.get("gemini", {})
+        keys = llaves_gemini(gemini_cfg)
+        llaves = crear_scheduler(keys, gemini_cfg, PROJECT_ROOT, ctx=ctx) if keys else None
+        if llaves is not None and gemini_cfg.get("sondeo_inicial", True):
+            try:
+                sondear(llaves, keys)
+            except Exception as e:
+                self.logger.warning(f"No se pudo sondear la granja Gemini: {e}")
+
+        # El presupuesto de núcleos del pool OCR (si está activo) se reparte entre los workers
+        config_worker = repartir_nucleos(self.config, n)
+
+        procesos = []
+        for worker_id, lote in enumerate(self.shard(vins, n), start=1):
+            tipos = {str(v).strip(): tipo_map.get(str(v).strip(), "N") for v in lote}
+            p = ctx.Process(
+                target=_worker_main,
+                args=(worker_id, config_worker, lote, tipos, cola_resultados, cola_logs, rate, llaves),
+                name=f"dnpra-worker-{worker_id}",
+            )
+            p.start()
+            procesos.append(p)
+
+        inicio = time.time()
+        stats = {}
+        try:
+            stats = self._recolectar(cola_resultados, procesos, writer, llaves, inicio)
+        finally:
+            writer.cerrar()
+            if cache is not None:
+                cache.cerrar()
+            if llaves is not None:
+                llaves.guardar()
+            for p in procesos:
+                p.join(timeout=30)
+            listener.stop()
+
+        self._log_resumen(stats, time.time() - inicio)
+        self.logger.info(f"  Control de ritmo: {rate.estado()}")
+        if llaves is not None:
+            self.logger.info(f"  Granja Gemini: {llaves.estado()}")
+        return stats
+
+    def _recolectar(self, cola_resultados, procesos, writer, llaves=None, inicio=None, espera_s=5):
+        """
+        Bucle del coordinador: cada resultado de los workers pasa por el único writer (journal +
+        Excel) hasta que todos avisan "fin" o mueren. Devuelve {worker_id: {vins, segundos}}.
+        El estado de la granja Gemini se persiste cada `gemini.guardar_cada_s` (y al final, en run).
+        """
+        inicio = inicio or time.time()
+        guardar_cada_s = self.config.get("gemini", {}).get("guardar_cada_s", 30.0)
+        ultimo_guardado = time.monotonic()
+        stats = {}
+        while len(stats) < len(procesos):
+            if llaves is not None and time.monotonic() - ultimo_guardado >= guardar_cada_s:
+                llaves.guardar()
+                ultimo_guardado = time.monotonic()
+            try:
+                msg = cola_resultados.get(timeout=espera_s)
+            except queue.Empty:
+                # Un worker que murió sin avisar (ej. crash de Chrome que mata el proceso)
+                for worker_id, p in enumerate(procesos, start=1):
+                    if not p.is_alive() and worker_id not in stats:
+                        self.logger.error(f"Worker {worker_id} terminó inesperadamente (exit code {p.exitcode}).")
+                        stats[worker_id] = {"vins": 0, "segundos": time.time() - inicio}
+                continue
+
+            if msg[0] == "resultado":
+                _, worker_id, vin, resultado, dominio, meta = msg
+                writer.registrar(vin, resultado, dominio, **meta)
+            elif msg[0] == "fin":
+                _, worker_id, procesados, segundos = msg
+                stats[worker_id] = {"vins": procesados, "segundos": segundos}
+        return stats
+
+    def _log_resumen(self, stats, total_segundos):
+        """Resumen de la corrida con throughput (VINs/hora) por worker y total."""
+        self.logger.info("=== Resumen modo paralelo ===")
+        total_vins = 0
+        for worker_id in sorted(stats):
+            s = stats[worker_id]
+            total_vins += s["vins"]
+            vph = s["vins"] * 3600 / s["segundos"] if s["segundos"] > 0 else 0.0
+            self.logger.info(f"  Worker {worker_id}: {s['vins']} VINs en {s['segundos']:.0f}s → {vph:.1f} VINs/hora")
+        vph_total = total_vins * 3600 / total_segundos if total_segundos > 0 else 0.0
+        self.logger.info(f"  TOTAL: {total_vins} VINs en {total_segundos:.0f}s → {vph_total:.1f} VINs/hora")
@@ -0,0 +1,372 @@
+import os
+import sys
+import threading
+import time
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils import captcha_breaker
+from src.utils.captcha_breaker import CaptchaBreaker
+
+
+def test_init_no_carga_el_tier_local(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    antes = set(captcha_breaker._modulos)
+    breaker = CaptchaBreaker()
+    assert breaker._reader is None
+    assert set(captcha_breaker._modulos) == antes  # ningún import pesado nuevo
+
+
+def test_reader_se_construye_una_sola_vez(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    llamadas = []
+
+    def _cargar(self):
+        llamadas.append(threading.current_thread().name)
+        return object()
+
+    monkeypatch.setattr(CaptchaBreaker, "_cargar_easyocr", _cargar)
+    breaker = CaptchaBreaker(warmup=True)
+    breaker.calentar().join(timeout=10)
+    reader = breaker.reader
+    assert breaker.reader is reader
+    assert llamadas == ["ocr-warmup"]
+
+
+class _ReaderFake:
+    """Lee según la variante: cada imagen trae su 'texto' codificado en el primer pixel."""
+
+    def __init__(self, textos):
+        self.textos = textos
+        self.llamadas = {"readtext": 0, "readtext_batched": 0}
+
+    def _leer(self, img):
+        return [self.textos[int(img.flat[0]) % len(self.textos)]]
+
+    def readtext(self, img, **kwargs):
+        self.llamadas["readtext"] += 1
+        return self._leer(img)
+
+    def readtext_batched(self, imgs, n_width=None, n_height=None, **kwargs):
+        self.llamadas["readtext_batched"] += 1
+        assert all(im.shape[:2] == (n_height, n_width) for im in imgs)
+        return [self._leer(im) for im in imgs]
+
+
+def _variantes():
+    import numpy as np
+    variantes = {}
+    for i in range(8):
+        im = np.zeros((60, 200), dtype=np.uint8)
+        im.flat[0] = i
+        variantes[f"v{i}"] = im
+    return variantes
+
+
+def test_lote_y_secuencial_dan_las_mismas_lecturas(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    textos = ["12345", "1234", "12845", "12345", "", "99999", "12845", "12345"]
+
+    secuencial = CaptchaBreaker(ocr_config={"easyocr_batched": False})
+    secuencial._reader = _ReaderFake(textos)
+    lote = CaptchaBreaker(ocr_config={"easyocr_batched": True})
+    lote._reader = _ReaderFake(textos)
+
+    lecturas_sec = secuencial._leer_variantes(_variantes(), CaptchaBreaker.MAG_RATIOS)
+    lecturas_lote = lote._leer_variantes(_variantes(), CaptchaBreaker.MAG_RATIOS)
+    assert lecturas_sec == lecturas_lote
+    assert secuencial._reader.llamadas == {"readtext": 16, "readtext_batched": 0}
+    assert lote._reader.llamadas == {"readtext": 0, "readtext_batched": 2}
+    assert CaptchaBreaker._votar([r for _, _, r in lecturas_lote if r]) == "12345"
+
+
+class _RecognizerFake(_ReaderFake):
+    def __init__(self, textos, confs):
+        super().__init__(textos)
+        self.confs = confs
+        self.llamadas["recognize"] = 0
+
+    def recognize(self, img, horizontal_list=None, free_list=None, **kwargs):
+        self.llamadas["recognize"] += 1
+        i = int(img.flat[0]) % len(self.textos)
+        return [([[0, 0]], self.textos[i], self.confs[i])]
+
+
+def test_camino_rapido_confiable_no_usa_el_detector(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"recognizer_min_conf": 0.5})
+    breaker._reader = _RecognizerFake(["12345"] * 8, [0.9] * 8)
+    assert breaker._lectura_rapida(_variantes())[0] == "12345"
+    assert breaker._reader.llamadas["readtext_batched"] == 0
+
+
+def test_camino_rapido_dudoso_cae_a_lectura_completa(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"recognizer_min_conf": 0.5})
+    breaker._reader = _RecognizerFake(["12345", "1234"] * 4, [0.2] * 8)
+    assert breaker._lectura_rapida(_variantes()) is None
+
+
+class _DetalleFake(_RecognizerFake):
+    def _detalle(self, img, detail):
+        i = int(img.flat[0]) % len(self.textos)
+        return [([[0, 0]], self.textos[i], self.confs[i])] if detail else [self.textos[i]]
+
+    def readtext(self, img, detail=0, **kwargs):
+        self.llamadas["readtext"] += 1
+        return self._detalle(img, detail)
+
+    def readtext_batched(self, imgs, n_width=None, n_height=None, detail=0, **kwargs):
+        self.llamadas["readtext_batched"] += 1
+        return [self._detalle(im, detail) for im in imgs]
+
+
+def test_corte_temprano_por_quorum(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"easyocr_batched": False, "early_exit": {
+        "quorum": 3, "high_conf": 0.9, "exploracion": 0, "stats_path": str(tmp_path / "estrategias.json")}})
+    breaker._reader = _DetalleFake(["12345", "1234", "12345", "12845", "12345", "0", "0", "0"], [0.5] * 8)
+    ganador, candidatos, lecturas = breaker._leer_con_corte(_variantes())
+    assert ganador == "12345"
+    assert len(lecturas) < 16
+    assert candidatos.count("12345") == 3
+
+
+def test_corte_temprano_por_lectura_de_alta_confianza(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"easyocr_batched": False, "early_exit": {
+        "exploracion": 0, "stats_path": str(tmp_path / "estrategias.json")}})
+    breaker._reader = _DetalleFake(["1234", "54321"] + ["0"] * 6, [0.99] * 8)
+    ganador, _, lecturas = breaker._leer_con_corte(_variantes())
+    assert ganador == "54321"
+    assert [clave for clave, _ in lecturas] == ["v0@4.0", "v0@6.0", "v1@4.0"]
+
+
+def test_corte_temprano_lee_por_lotes_de_estrategias(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"easyocr_batched": True, "early_exit": {
+        "lote": 4, "exploracion": 0, "stats_path": str(tmp_path / "estrategias.json")}})
+    breaker._reader = _DetalleFake(["1234", "54321"] + ["0"] * 6, [0.99] * 8)
+    ganador, _, lecturas = breaker._leer_con_corte(_variantes())
+    assert ganador == "54321"
+    # Se corta al terminar el primer grupo: una llamada por magnitud, ninguna de a una
+    assert [clave for clave, _ in lecturas] == ["v0@4.0", "v0@6.0", "v1@4.0", "v1@6.0"]
+    assert breaker._reader.llamadas["readtext_batched"] == 2
+    assert breaker._reader.llamadas["readtext"] == 0
+
+
+def test_exploracion_evalua_todas_las_estrategias(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"early_exit": {
+        "exploracion": 1, "stats_path": str(tmp_path / "estrategias.json")}})
+    breaker._reader = _DetalleFake(["1234", "54321"] + ["0"] * 6, [0.99] * 8)
+    ganador, _, lecturas = breaker._leer_con_corte(_variantes())
+    assert ganador == "54321"
+    assert len(lecturas) == 16
+
+
+def test_estrategias_se_puntuan_con_el_veredicto_del_portal(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={
+        "recognizer_fast_path": False, "dataset": {"enabled": False}, "memo": {"enabled": False},
+        "early_exit": {"exploracion": 0, "stats_path": str(tmp_path / "estrategias.json")},
+    })
+    breaker._reader = _DetalleFake(["1234", "54321"] + ["0"] * 6, [0.99] * 8)
+    breaker._preprocess_variants = lambda img: _variantes()
+    captcha = captcha_breaker.CaptchaImagen(_variantes()["v0"])
+
+    # El consenso del corte temprano no puntúa nada por sí solo
+    assert breaker.solve(captcha) == "54321"
+    assert breaker.estrategias.datos == {}
+    # El portal la rechazó: nada que aprender
+    breaker.registrar_veredicto(False)
+    assert breaker.estrategias.datos == {}
+
+    breaker.solve(captcha)
+    breaker.registrar_veredicto(True)
+    assert breaker.estrategias.datos["v1@4.0"] == [1, 1]
+    assert breaker.estrategias.datos["v0@4.0"] == [0, 1]
+
+
+def test_pool_devuelve_las_mismas_lecturas_que_el_secuencial(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.utils import ocr_pool
+
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    textos = ["12345", "1234", "12845", "12345", "", "99999", "12845", "12345"]
+    secuencial = CaptchaBreaker(ocr_config={"easyocr_batched": False})
+    secuencial._reader = _ReaderFake(textos)
+
+    # Mismo código de los procesos del pool, corrido en hilos con el reader falso
+    monkeypatch.setitem(ocr_pool._estado, "reader", _ReaderFake(textos))
+    pool = ocr_pool.OcrPool.__new__(ocr_pool.OcrPool)
+    pool.procesos = 3
+    pool._executor = ThreadPoolExecutor(3)
+    try:
+        lecturas = pool.leer_easyocr(_variantes(), CaptchaBreaker.MAG_RATIOS)
+    finally:
+        pool.cerrar()
+    assert lecturas == secuencial._leer_variantes(_variantes(), CaptchaBreaker.MAG_RATIOS)
+
+
+def test_pool_roto_vuelve_a_leer_en_el_proceso(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"pool": {"enabled": True}, "dataset": {"dir": str(tmp_path)}})
+    hedge = breaker._hedge_executor = ThreadPoolExecutor(1)
+    breaker.dataset.encolar(b"png-a", "12345")
+    escritor = breaker.dataset._hilo
+
+    def _romper(self):
+        raise RuntimeError("proceso muerto")
+
+    monkeypatch.setattr(CaptchaBreaker, "_obtener_pool", _romper)
+    try:
+        assert breaker._en_pool("leer_easyocr", {}, CaptchaBreaker.MAG_RATIOS) is None
+        assert not breaker._usar_pool()
+        # El hedge y el hilo del dataset siguen vivos para el solve en curso
+        assert breaker._hedge_executor is hedge
+        assert hedge.submit(lambda: "ok").result(timeout=5) == "ok"
+        assert breaker.dataset._hilo is escritor and escritor.is_alive()
+    finally:
+        breaker.cerrar()
+
+
+class _ClienteGeminiFake:
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+        self.models = self
+
+    def generate_content(self, model, contents):
+        if isinstance(self.respuesta, Exception):
+            raise self.respuesta
+        return type("Resp", (), {"text": self.respuesta})()
+
+
+def test_gemini_rota_sin_pausas_y_cuenta_429(monkeypatch, tmp_path):
+    from PIL import Image
+    from src.utils.key_scheduler import KeyScheduler
+
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    captcha = tmp_path / "captcha.png"
+    Image.new("RGB", (120, 40)).save(captcha)
+    breaker = CaptchaBreaker()
+    breaker.gemini_clients = [_ClienteGeminiFake(RuntimeError("429 RESOURCE_EXHAUSTED")), _ClienteGeminiFake("12345")]
+    breaker.gemini_ready = True
+    # La llave 0 arranca con más tokens: se elige primero
+    breaker.llaves = KeyScheduler(2, {"rafaga": 2})
+    breaker.llaves._tokens[1] = 1.0
+
+    t0 = time.perf_counter()
+    assert breaker.solve_with_gemini(str(captcha)) == "12345"
+    assert time.perf_counter() - t0 < 1.0
+    estado = breaker.llaves.estado()
+    assert estado["#1"]["429"] == 1 and estado["#1"]["bloqueada"]
+    assert estado["#2"]["ok"] == 1
+
+
+def _breaker_hedge(monkeypatch, gemini, local, delay_s=0.05):
+    """gemini/local: (segundos, resultado) que simulan cada tier."""
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"hedge": {"enabled": True, "delay_s": delay_s}})
+    llamadas = []
+
+    def _gemini(image_path, cancelar=None):
+        llamadas.append("gemini")
+        time.sleep(gemini[0])
+        return gemini[1]
+
+    def _local(image_path, cancelar=None):
+        llamadas.append("local")
+        cancelar.wait(local[0])
+        return ("", False, None) if cancelar.is_set() else local[1]
+
+    breaker.solve_with_gemini = _gemini
+    breaker._resolver_easyocr = _local
+    return breaker, llamadas
+
+
+def test_hedge_gemini_rapido_no_lanza_el_local(monkeypatch):
+    breaker, llamadas = _breaker_hedge(monkeypatch, (0.0, "11111"), (0.0, ("22222", True, 1.0)), delay_s=1.0)
+    try:
+        assert breaker._solve_hedged("x.png") == ("11111", "gemini", None)
+        assert llamadas == ["gemini"]
+    finally:
+        breaker.cerrar()
+
+
+def test_hedge_gana_el_local_confiable_sin_esperar_a_gemini(monkeypatch):
+    breaker, _ = _breaker_hedge(monkeypatch, (1.0, "11111"), (0.0, ("22222", True, 1.0)))
+    try:
+        t0 = time.perf_counter()
+        assert breaker._solve_hedged("x.png") == ("22222", "easyocr", 1.0)
+        assert time.perf_counter() - t0 < 0.5
+    finally:
+        breaker.cerrar()
+
+
+def test_hedge_local_dudoso_espera_a_gemini(monkeypatch):
+    breaker, _ = _breaker_hedge(monkeypatch, (0.3, "11111"), (0.0, ("22222", False, 0.25)))
+    try:
+        assert breaker._solve_hedged("x.png") == ("11111", "gemini", None)
+    finally:
+        breaker.cerrar()
+
+
+def _png_bytes():
+    import cv2
+    import numpy as np
+    img = np.full((40, 120, 3), 200, dtype=np.uint8)
+    img[10:30, 20:100] = 30
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def test_captcha_en_memoria_se_decodifica_una_sola_vez():
+    from src.utils.captcha_breaker import CaptchaImagen
+    captcha = CaptchaImagen(_png_bytes())
+    assert captcha.bgr.shape == (40, 120, 3)
+    assert captcha.bgr is captcha.bgr
+    assert captcha.pil.size == (120, 40)
+    # Desde un ndarray también se obtienen los bytes (para el dataset)
+    assert CaptchaImagen(captcha.bgr).bytes.startswith(b"\x89PNG")
+
+
+def test_preprocesado_de_tesseract_no_escribe_archivos(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    monkeypatch.chdir(tmp_path)
+    procesada = CaptchaBreaker().preprocess_image(_png_bytes())
+    assert procesada.shape == (40, 120)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_memo_responde_captchas_repetidos_sin_ocr(monkeypatch, tmp_path):
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    breaker = CaptchaBreaker(ocr_config={"dataset": {"enabled": False}})
+    llamadas = []
+
+    def _gemini(captcha, cancelar=None):
+        llamadas.append(captcha.sha256)
+        return "12345"
+
+    breaker.solve_with_gemini = _gemini
+    png = _png_bytes()
+    assert breaker.solve(png) == "12345"
+    assert breaker.solve(png) == "12345"
+    assert len(llamadas) == 1
+    assert breaker.memo.resumen()["exactos"] == 1
+
+    # Rechazada por el portal: el próximo se vuelve a resolver
+    breaker.registrar_veredicto(False)
+    assert breaker.solve(png) == "12345"
+    assert len(llamadas) == 2
+
+
+def test_gemini_deshabilitado_ignora_las_llaves_del_env(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEYS", "AIzaUno")
+    breaker = CaptchaBreaker(
+        ocr_config={"dataset": {"enabled": False}, "memo": {"enabled": False}}, gemini_config={"enabled": False}
+    )
+    assert not breaker.gemini_ready and breaker.llaves is None
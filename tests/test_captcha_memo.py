@@ -0,0 +1,57 @@
+import os
+import sys
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.captcha_memo import CaptchaMemo, dhash
+from src.utils.dataset_writer import DatasetWriter
+
+
+def _gris(ruido=0):
+    import numpy as np
+    rng = np.random.default_rng(7)
+    img = rng.integers(0, 256, (40, 120), dtype=np.uint8)
+    if ruido:
+        img = np.clip(img.astype(int) + ruido, 0, 255).astype(np.uint8)
+    return img
+
+
+def test_casi_duplicado_se_sirve_solo_si_el_portal_lo_acepto():
+    memo = CaptchaMemo()
+    h = dhash(_gris())
+    memo.guardar("a", "12345", h)
+    # Mismo captcha con un corrimiento de brillo: otro sha, mismo dHash
+    h2 = dhash(_gris(ruido=3))
+    assert bin(h ^ h2).count("1") <= memo.distancia_max
+    assert memo.buscar("b") is None
+    assert memo.buscar("b", h2) is None
+    memo.registrar_veredicto("a", True)
+    assert memo.buscar("b", h2) == "12345"
+    assert memo.resumen()["perceptuales"] == 1
+
+
+def test_lru_acotado_y_rechazados_no_se_sirven():
+    memo = CaptchaMemo(max_entradas=2)
+    memo.guardar("a", "11111", 1)
+    memo.guardar("b", "22222", 2)
+    assert memo.buscar("a") == "11111"  # "a" pasa a ser el más reciente
+    memo.guardar("c", "33333", 3)
+    assert len(memo) == 2 and memo.buscar("b") is None
+    memo.registrar_veredicto("c", False)
+    assert memo.buscar("c") is None
+    assert memo.resumen()["hit_rate"] == 0.333
+
+
+def test_precarga_lecturas_aceptadas_del_dataset(tmp_path):
+    writer = DatasetWriter(str(tmp_path))
+    ok = writer.encolar(b"png-ok", "11111")
+    mal = writer.encolar(b"png-mal", "22222")
+    writer.registrar_veredicto(ok, True)
+    writer.registrar_veredicto(mal, False)
+    writer.cerrar()
+
+    memo = CaptchaMemo()
+    assert memo.precargar(str(tmp_path)) == 1
+    assert memo.buscar(ok) == "11111" and memo.buscar(mal) is None
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import sys
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.dataset_writer import INDEX, DatasetWriter, captchas_etiquetados, sha256
+
+
+def _filas(dataset_dir):
+    conn = sqlite3.connect(os.path.join(dataset_dir, INDEX))
+    try:
+        return conn.execute("SELECT sha256, ruta, etiqueta, tier, veredicto, vistos FROM captchas").fetchall()
+    finally:
+        conn.close()
+
+
+def test_guarda_una_vez_por_contenido_en_carpetas_por_hash(tmp_path):
+    writer = DatasetWriter(str(tmp_path))
+    sha = writer.encolar(b"png-a", "12345", tier="gemini")
+    writer.encolar(b"png-a", "12345", tier="easyocr", confianza=0.8)
+    writer.encolar(b"png-b", "", tier=None)
+    writer.cerrar()
+
+    assert sha == sha256(b"png-a")
+    assert os.path.exists(tmp_path / sha[:2] / f"{sha}.png")
+    assert writer.stats["nuevos"] == 2 and writer.stats["duplicados"] == 1
+    filas = {f[0]: f for f in _filas(str(tmp_path))}
+    assert filas[sha][1:] == (f"{sha[:2]}/{sha}.png", "12345", "easyocr", None, 2)
+
+
+def test_veredicto_del_portal_filtra_la_lectura(tmp_path):
+    writer = DatasetWriter(str(tmp_path))
+    ok = writer.encolar(b"png-ok", "11111", tier="gemini")
+    mal = writer.encolar(b"png-mal", "22222", tier="easyocr")
+    writer.registrar_veredicto(ok, True)
+    writer.registrar_veredicto(mal, False)
+    # Repetir un captcha ya aceptado no pisa su etiqueta confirmada
+    writer.encolar(b"png-ok", "99999", tier="tesseract")
+    writer.cerrar()
+
+    (tmp_path / "20250101_120000_33333.png").write_bytes(b"png-viejo")
+    etiquetas = [e for _, e in captchas_etiquetados(str(tmp_path))]
+    assert etiquetas == ["11111", "33333"]
+
+
+def test_cola_llena_descarta_sin_bloquear(tmp_path):
+    writer = DatasetWriter(str(tmp_path), max_cola=1)
+    writer._arrancar = lambda: None  # sin hilo: la cola no se vacía
+    writer.encolar(b"png-1", "11111")
+    writer.encolar(b"png-2", "22222")
+    assert writer.stats["descartados"] == 1
@@ -0,0 +1,80 @@
+import os
+import sys
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.driver_pool import DriverManager
+
+
+class _DriverFake:
+    def __init__(self, nombre, vivo=True):
+        self.nombre = nombre
+        self.vivo = vivo
+        self.cerrado = False
+
+    @property
+    def current_url(self):
+        if not self.vivo:
+            raise RuntimeError("sesión caída")
+        return "about:blank"
+
+    def maximize_window(self):
+        pass
+
+    def quit(self):
+        self.cerrado = True
+
+
+def _manager(hot_standby=True, vivos=None):
+    """DriverManager headless que 'lanza' drivers falsos numerados."""
+    config = {"driver_pool": {"hot_standby": hot_standby}, "browser": {"profile": "lean", "lean": {"headless": True}}}
+    manager = DriverManager(config)
+    lanzados = []
+
+    def _lanzar(en_espera=False):
+        driver = _DriverFake(f"d{len(lanzados) + 1}", vivo=(vivos or {}).get(len(lanzados) + 1, True))
+        lanzados.append((driver.nombre, en_espera))
+        return driver
+
+    manager._lanzar = _lanzar
+    return manager, lanzados
+
+
+def test_obtener_arranca_el_principal_y_repone_el_repuesto():
+    manager, lanzados = _manager()
+    driver = manager.obtener()
+    manager._repuesto.result(timeout=5)
+    assert driver.nombre == "d1"
+    assert lanzados == [("d1", False), ("d2", True)]
+    manager.cerrar()
+    assert lanzados == [("d1", False), ("d2", True)]
+
+
+def test_reemplazar_usa_el_repuesto_y_cierra_el_viejo():
+    manager, lanzados = _manager()
+    viejo = manager.obtener()
+    nuevo = manager.reemplazar(viejo)
+    manager.cerrar()
+    assert nuevo.nombre == "d2"
+    assert viejo.cerrado
+    assert [n for n, _ in lanzados] == ["d1", "d2", "d3"]
+
+
+def test_repuesto_muerto_se_descarta_y_se_lanza_otro():
+    manager, lanzados = _manager(vivos={2: False})
+    viejo = manager.obtener()
+    nuevo = manager.reemplazar(viejo)
+    manager.cerrar()
+    assert nuevo.nombre == "d3"
+    assert lanzados[2] == ("d3", False)
+
+
+def test_sin_hot_standby_no_hay_repuesto():
+    manager, lanzados = _manager(hot_standby=False)
+    viejo = manager.obtener()
+    nuevo = manager.reemplazar(viejo)
+    manager.cerrar()
+    assert nuevo.nombre == "d2"
+    assert lanzados == [("d1", False), ("d2", False)]
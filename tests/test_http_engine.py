@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.http_engine import HttpEngine, MarkupInesperadoError
+
+FIXTURES = os.path.join(project_root, "tests", "fixtures", "dnpra")
+CAPTCHA_OK = "12345"
+# PNG 1x1 cualquiera: el breaker de prueba no mira la imagen
+CAPTCHA_SRC = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+
+
+def _fixture(nombre, **campos):
+    with open(os.path.join(FIXTURES, nombre), encoding="utf-8") as f:
+        html = f.read()
+    for k, v in campos.items():
+        html = html.replace("{" + k + "}", v)
+    return html
+
+
+class _StubPortal(BaseHTTPRequestHandler):
+    """Sirve las páginas grabadas del portal y valida cookie de sesión + captcha."""
+
+    posts = []
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, html, cookie=None):
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/portal_dnrpa/fabr_import2.php"):
+            self._responder(_fixture("portal.html"), cookie="PHPSESSID=abc123; Path=/")
+        elif self.path.startswith("/portal_dnrpa/form_certificado.php"):
+            self._responder(_fixture("form_tipo.html"))
+        elif self.path.startswith("/roto"):
+            self._responder("<html><body><p>Sitio en mantenimiento</p></body></html>")
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        campos = {k: v[0] for k, v in parse_qs(self.rfile.read(largo).decode("utf-8")).items()}
+        _StubPortal.posts.append((campos, self.headers.get("Cookie", "")))
+
+        if "verificador" not in campos:
+            self._responder(_fixture("form.html", captcha=CAPTCHA_SRC))
+        elif campos["verificador"] != CAPTCHA_OK:
+            self._responder(_fixture("resultado_incorrecto.html"))
+        elif campos["vin"].endswith("1"):
+            self._responder(_fixture("resultado_dominio.html", vin=campos["vin"]))
+        else:
+            self._responder(_fixture("resultado_vigente.html", vin=campos["vin"]))
+
+
+class _BreakerFijo:
+    def __init__(self, respuestas):
+        self.respuestas = list(respuestas)
+
+    def solve(self, captcha):
+        assert isinstance(captcha, bytes) and len(captcha) > 0
+        return self.respuestas.pop(0)
+
+
+@pytest.fixture()
+def portal():
+    _StubPortal.posts = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPortal)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _engine(base_url, tmp_path, respuestas, path="/portal_dnrpa/fabr_import2.php?EstadoCertificado=true"):
+    config = {"general": {"start_url": base_url + path}, "http_engine": {"max_captcha_retries": 3}}
+    return HttpEngine(config, _BreakerFijo(respuestas))
+
+
+def test_consulta_con_dominio(portal, tmp_path):
+    engine = _engine(portal, tmp_path, [CAPTCHA_OK])
+    assert engine.consultar("9BRK4AAG6T0229891") == ("AI002LB", "AI002LB")
+
+    campos, cookie = _StubPortal.posts[-1]
+    assert campos["tcert"] == "N"
+    assert campos["verificador"] == CAPTCHA_OK
+    assert campos["token"] == "a1b2c3"
+    assert campos["boton"] == "Aceptar"
+    assert "PHPSESSID=abc123" in cookie
+    assert engine.form_url.endswith("/portal_dnrpa/form_certificado.php")
+    engine.close()
+
+
+def test_vigente_e_incorrecto(portal, tmp_path):
+    engine = _engine(portal, tmp_path, [CAPTCHA_OK, "99999"])
+    assert engine.consultar("9BRK4AAG6T0229892", tipo="I") == ("Vigente", "")
+    assert _StubPortal.posts[-1][0]["tcert"] == "I"
+    assert engine.consultar("9BRK4AAG6T0229892") == ("ERROR_CAPTCHA_INCORRECTA", "")
+    engine.close()
+
+
+def test_captcha_de_longitud_incorrecta_pide_uno_nuevo(portal, tmp_path):
+    engine = _engine(portal, tmp_path, ["123", CAPTCHA_OK])
+    assert engine.consultar("9BRK4AAG6T0229891")[0] == "AI002LB"
+
+    engine = _engine(portal, tmp_path, ["1", "12", "123"])
+    assert engine.consultar("9BRK4AAG6T0229891") == ("ERROR_CAPTCHA", "")
+
+
+def test_markup_inesperado(portal, tmp_path):
+    engine = _engine(portal, tmp_path, [CAPTCHA_OK], path="/roto")
+    with pytest.raises(MarkupInesperadoError):
+        engine.consultar("9BRK4AAG6T0229891")
+
+
+def test_reiniciar_sesion_abre_una_nueva(portal, tmp_path):
+    engine = _engine(portal, tmp_path, [CAPTCHA_OK, CAPTCHA_OK])
+    engine.consultar("9BRK4AAG6T0229891")
+    engine.reiniciar_sesion()
+    assert engine.form_url is None and not engine.client.cookies
+    # La consulta siguiente vuelve a pasar por la página exterior (cookie nueva)
+    assert engine.consultar("9BRK4AAG6T0229892") == ("Vigente", "")
+    assert engine.form_url is not None and "PHPSESSID" in engine.client.cookies
+    engine.close()
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pandas as pd
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.data_handler import DataHandler
+from src.utils.journal import ResultJournal, ResultWriter
+
+
+def _excel(tmp_path, vins):
+    path = tmp_path / "recepci_test.xlsx"
+    pd.DataFrame({"Chasis": vins, "Nro.Fabr.": ["TPA1000"] * len(vins)}).to_excel(path, index=False)
+    return str(path)
+
+
+def test_journal_tolera_linea_truncada(tmp_path):
+    journal = ResultJournal(str(tmp_path / "j.jsonl"))
+    journal.registrar("VIN1", "ERROR_CAPTCHA_INCORRECTA")
+    journal.registrar("VIN1", "AI002LB", "AI002LB", tier="gemini")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"vin": "VIN2", "resul')  # corte a mitad de escritura
+
+    registros = journal.leer()
+    assert list(registros) == ["VIN1"]
+    assert registros["VIN1"]["resultado"] == "AI002LB"
+    assert registros["VIN1"]["tier"] == "gemini"
+
+
+def test_resume_no_repite_vins_del_journal(tmp_path):
+    excel = _excel(tmp_path, ["VIN1", "VIN2", "VIN3"])
+    handler = DataHandler(excel)
+    # Simula un crash: el VIN1 quedó en el journal pero nunca llegó al Excel
+    handler.journal.registrar("VIN1", "AI002LB", "AI002LB")
+    handler.journal.registrar("VIN2", "Error de Sesión")
+
+    pendientes = DataHandler(excel).get_pending_vins()
+    assert pendientes == ["VIN2", "VIN3"]
+
+
+def test_writer_vuelca_al_excel_al_cerrar(tmp_path):
+    excel = _excel(tmp_path, ["VIN1", "VIN2", "VIN3"])
+    handler = DataHandler(excel)
+    handler.load_data()
+    writer = ResultWriter(handler, handler.journal, save_every=2, save_interval=60)
+    writer.registrar("VIN1", "AI002LB", "AI002LB")
+    writer.registrar("VIN2", "Vigente", "")
+    writer.registrar("VIN3", "Vencido", "")
+    writer.cerrar()
+
+    df = pd.read_excel(handler.output_path)
+    assert df["Resultado DNPRA"].tolist() == ["AI002LB", "Vigente", "Vencido"]
+    assert df["Dominio DNPRA"].tolist()[0] == "AI002LB"
+    # Todo quedó en el Excel: el journal se compactó
+    assert handler.journal.leer() == {}
+    assert DataHandler(excel).get_pending_vins() == []
+
+
+def test_compactar_conserva_lo_que_no_llegó_al_excel(tmp_path):
+    journal = ResultJournal(str(tmp_path / "j.jsonl"))
+    journal.registrar("VIN1", "Vigente")
+    volcado = journal.fin
+    journal.registrar("VIN2", "Vencido")
+    journal.compactar(volcado)
+    assert list(journal.leer()) == ["VIN2"]
+
+    # Los offsets siguen valiendo tras el recorte
+    journal.registrar("VIN3", "AI002LB", "AI002LB")
+    hasta = journal.fin
+    journal.registrar("VIN4", "Vigente")
+    journal.compactar(hasta)
+    assert list(journal.leer()) == ["VIN4"]
+    journal.compactar(volcado)  # un offset viejo no recorta nada
+    assert list(journal.leer()) == ["VIN4"]
+
+
+def test_excel_bloqueado_no_compacta_el_journal(tmp_path):
+    excel = _excel(tmp_path, ["VIN1"])
+    handler = DataHandler(excel)
+    handler.load_data()
+    handler.save_results = lambda results, dominios=None: None  # quedó en backup
+    writer = ResultWriter(handler, handler.journal, save_every=1, save_interval=60)
+    writer.registrar("VIN1", "Vigente", "")
+    writer.cerrar()
+    assert list(handler.journal.leer()) == ["VIN1"]
@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.key_scheduler import KeyScheduler, crear_scheduler, llaves_gemini, sondear
+
+
+def _scheduler(n=3, **cfg):
+    base = {"rpm_por_llave": 60, "rpd_por_llave": 100, "rafaga": 1, "max_espera_s": 0.5}
+    base.update(cfg)
+    return KeyScheduler(n, base)
+
+
+def test_con_capacidad_no_espera_y_reparte_entre_llaves():
+    llaves = _scheduler()
+    t0 = time.perf_counter()
+    usadas = [llaves.adquirir() for _ in range(3)]
+    assert time.perf_counter() - t0 < 0.1
+    assert sorted(usadas) == [0, 1, 2]
+
+
+def test_sin_tokens_espera_poco_o_devuelve_none():
+    llaves = _scheduler(n=1, rpm_por_llave=600)  # un token cada 0.1s
+    assert llaves.adquirir() == 0
+    t0 = time.perf_counter()
+    assert llaves.adquirir() == 0
+    assert 0.05 < time.perf_counter() - t0 < 0.4
+    lenta = _scheduler(n=1, rpm_por_llave=1, max_espera_s=0.1)
+    assert lenta.adquirir() == 0
+    assert lenta.adquirir() is None
+
+
+def test_429_saca_la_llave_y_se_cuenta():
+    llaves = _scheduler(n=2, rafaga=5)
+    i = llaves.adquirir()
+    llaves.liberar(i, "429")
+    assert llaves.disponibles() == 1
+    assert all(llaves.adquirir() != i for _ in range(4))
+    estado = llaves.estado()[f"#{i + 1}"]
+    assert estado["bloqueada"] and estado["429"] == 1
+
+
+def test_cuota_diaria_agotada():
+    llaves = _scheduler(n=1, rpd_por_llave=2, rafaga=5)
+    assert llaves.adquirir() == 0 and llaves.adquirir() == 0
+    assert llaves.adquirir() is None
+    assert llaves.estado()["#1"]["uso_dia"] == "2/2"
+
+
+def test_cuota_diaria_se_renueva_al_pasar_el_reset(monkeypatch):
+    llaves = _scheduler(n=1, rpd_por_llave=2, rafaga=5)
+    assert llaves.adquirir() == 0 and llaves.adquirir() == 0
+    assert llaves.disponibles() == 0
+    en_dos_dias = time.time() + 2 * 86400
+    monkeypatch.setattr("src.utils.key_scheduler.time.time", lambda: en_dos_dias)
+    assert llaves.disponibles() == 1
+    assert llaves.adquirir() == 0
+    assert llaves.estado()["#1"]["uso_dia"] == "1/2"
+
+
+def test_requests_concurrentes_usan_llaves_distintas():
+    llaves = _scheduler(n=4)
+    obtenidas = []
+    hilos = [threading.Thread(target=lambda: obtenidas.append(llaves.adquirir())) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert sorted(obtenidas) == [0, 1, 2, 3]
+    assert sum(e["en_vuelo"] for e in llaves.estado().values()) == 4
+
+
+def test_429_readmite_tras_la_ventana_y_reincidente_espera_el_reset():
+    llaves = _scheduler(n=1, rpm_por_llave=6000, readmision_429_s=0.1, max_429_seguidos=2)
+    llaves.liberar(llaves.adquirir(), "429")
+    assert llaves.disponibles() == 0
+    time.sleep(0.15)
+    assert llaves.adquirir() == 0  # readmitida
+    llaves.liberar(0, "429")
+    time.sleep(0.15)
+    assert llaves.disponibles() == 0  # segundo 429 seguido: hasta el reset diario
+
+
+def test_prefiere_la_llave_sana_mas_rapida():
+    llaves = _scheduler(n=3, rafaga=5)
+    for i, (latencia, resultado) in enumerate([(2.0, "ok"), (0.5, "503"), (1.0, "ok")]):
+        for _ in range(5):
+            llaves.registrar_sondeo(i, resultado, latencia)
+    assert llaves.adquirir() == 2  # la #2 es la más rápida pero falla seguido
+
+
+def test_estado_persiste_entre_corridas(tmp_path):
+    keys = ["llave-a", "llave-b"]
+    cfg = {"estado_path": "estado.json", "rafaga": 5}
+    llaves = crear_scheduler(keys, cfg, str(tmp_path))
+    llaves.liberar(llaves.adquirir(), "ok", latencia_s=1.5)
+    llaves.liberar(llaves.adquirir(), "429")
+    llaves.guardar()
+    assert "llave-a" not in (tmp_path / "estado.json").read_text()
+
+    nuevas = crear_scheduler(keys, cfg, str(tmp_path))
+    assert nuevas.disponibles() == 1
+    assert sum(int(e["uso_dia"].split("/")[0]) for e in nuevas.estado().values()) == 2
+    assert max(e["latencia_s"] for e in nuevas.estado().values()) == 1.5
+
+
+class _ClienteFake:
+    def __init__(self, error=None):
+        self.error = error
+        self.models = self
+
+    def generate_content(self, model, contents):
+        if self.error:
+            raise RuntimeError(self.error)
+        return type("Resp", (), {"text": "Hola"})()
+
+
+def test_sondeo_inicial_marca_llaves_sin_cuota():
+    llaves = _scheduler(n=3)
+    clientes = [_ClienteFake(), _ClienteFake("429 RESOURCE_EXHAUSTED"), _ClienteFake("403 PERMISSION_DENIED")]
+    informe = sondear(llaves, ["a" * 12, "b" * 12, "c" * 12], clientes=clientes)
+    assert [r["status"] for r in informe] == ["OK", "QUOTA_EXHAUSTED", "PERMISSION_DENIED"]
+    assert llaves.disponibles() == 1
+
+
+def test_granja_deshabilitada_no_usa_las_llaves_del_env(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEYS", "AIzaUno, AIzaDos")
+    assert llaves_gemini() == ["AIzaUno", "AIzaDos"]
+    assert llaves_gemini({"enabled": False}) == []
@@ -0,0 +1,127 @@
+import base64
+import os
+import sys
+
+import httpx
+import pytest
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.http_engine import HttpEngine
+from src.mock_portal import FORM_PATH, PORTAL_PATH, MockPortal, resultado_para_vin
+
+_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+class _BreakerPerfecto:
+    """'Lee' el captcha buscando sus bytes en el dataset (la etiqueta del archivo es la respuesta)."""
+
+    def __init__(self, etiquetas):
+        self.etiquetas = etiquetas
+
+    def solve(self, captcha):
+        return self.etiquetas[captcha]
+
+
+@pytest.fixture()
+def dataset(tmp_path):
+    etiquetas = {}
+    for n, etiqueta in enumerate(["12345", "67890"]):
+        png = _PNG + bytes([n])  # bytes distintos por captcha
+        (tmp_path / f"20260226_1000{n}_{etiqueta}.png").write_bytes(png)
+        etiquetas[png] = etiqueta
+    (tmp_path / "20260226_10009_NONE.png").write_bytes(_PNG)  # sin etiqueta: se ignora
+    return tmp_path, etiquetas
+
+
+def _engine(portal, tmp_path, breaker):
+    config = {"general": {"start_url": portal.start_url}, "http_engine": {"max_captcha_retries": 2}}
+    return HttpEngine(config, breaker)
+
+
+def test_flujo_completo_contra_el_portal_simulado(dataset, tmp_path):
+    dataset_dir, etiquetas = dataset
+    with MockPortal(port=0, dataset_dir=str(dataset_dir)) as portal:
+        assert len(portal.captchas) == 2
+        engine = _engine(portal, tmp_path, _BreakerPerfecto(etiquetas))
+        for vin in ["9BRK4AAG6T0229891", "9BRK4AAG6T0229892", "8AJBA3CD0T7982998"]:
+            tipo, patente = resultado_para_vin(vin)
+            esperado = {"dominio": (patente, patente), "vigente": ("Vigente", ""), "vencido": ("Vencido", "")}[tipo]
+            assert engine.consultar(vin) == esperado
+        engine.close()
+        assert portal.stats["captcha_ok"] == 3
+
+
+def test_captcha_incorrecto(dataset, tmp_path):
+    dataset_dir, _ = dataset
+
+    class _Erra:
+        def solve(self, image_path):
+            return "00000"
+
+    with MockPortal(port=0, dataset_dir=str(dataset_dir)) as portal:
+        engine = _engine(portal, tmp_path, _Erra())
+        assert engine.consultar("9BRK4AAG6T0229891") == ("ERROR_CAPTCHA_INCORRECTA", "")
+        engine.close()
+
+
+def test_inyeccion_de_fallas(dataset, tmp_path):
+    dataset_dir, etiquetas = dataset
+    config = {"mock_portal": {"error_rate": 1.0}}
+    with MockPortal(config, port=0, dataset_dir=str(dataset_dir)) as portal:
+        engine = _engine(portal, tmp_path, _BreakerPerfecto(etiquetas))
+        with pytest.raises(httpx.HTTPStatusError):
+            engine.consultar("9BRK4AAG6T0229891")
+        engine.close()
+
+    config = {"mock_portal": {"session_drop_rate": 1.0}}
+    with MockPortal(config, port=0, dataset_dir=str(dataset_dir)) as portal:
+        engine = _engine(portal, tmp_path, _BreakerPerfecto(etiquetas))
+        with pytest.raises(httpx.HTTPStatusError) as exc:
+            engine.consultar("9BRK4AAG6T0229891")
+        assert exc.value.response.status_code == 403
+        assert portal.stats["sesiones_caidas"] == 1
+        engine.close()
+
+
+def _enviar_con_precarga(portal, precargar_antes):
+    """Flujo del navegador en modo pipeline: radio → captcha → envío, con el GET de la pestaña precargada."""
+    with httpx.Client(base_url=portal.base_url) as cliente:
+        cliente.get(PORTAL_PATH)
+        cliente.post(FORM_PATH, data={"tcert": "N"})
+        sid = cliente.cookies["PHPSESSID"]
+        codigo = portal._sesiones[sid]["captcha"]
+        if precargar_antes:
+            # El formulario trae un captcha nuevo; con dos en el dataset puede repetir el código
+            while portal._sesiones[sid]["captcha"] in (None, codigo):
+                cliente.get(FORM_PATH)
+        respuesta = cliente.post(FORM_PATH, data={"tcert": "N", "vin": "9BRK4AAG6T0229891", "verificador": codigo})
+        if not precargar_antes:
+            cliente.get(FORM_PATH)
+        return respuesta.text
+
+
+def test_precarga_despues_del_envio_no_invalida_el_captcha(dataset):
+    dataset_dir, _ = dataset
+    with MockPortal(port=0, dataset_dir=str(dataset_dir)) as portal:
+        assert "incorrecto" not in _enviar_con_precarga(portal, precargar_antes=False)
+        assert portal.stats["captcha_ok"] == 1
+        # Si el GET de la precarga le gana al POST, el captcha enviado ya no vale
+        assert "incorrecto" in _enviar_con_precarga(portal, precargar_antes=True)
+        assert portal.stats["captcha_ok"] == 1
+
+
+def test_la_sesion_recuerda_el_tipo_entre_consultas(dataset):
+    dataset_dir, _ = dataset
+    with MockPortal(port=0, dataset_dir=str(dataset_dir)) as portal:
+        with httpx.Client(base_url=portal.base_url) as cliente:
+            cliente.get(PORTAL_PATH)
+            assert "captcha" not in cliente.get(FORM_PATH).text  # sesión nueva: primero el tipo
+            cliente.post(FORM_PATH, data={"tcert": "I"})
+            # Modo sesión: la URL del iframe recargada trae el radio marcado y el captcha listo
+            form = cliente.get(FORM_PATH).text
+            assert 'value="I" checked' in form and 'id="captcha"' in form
@@ -0,0 +1,23 @@
+import os
+import sys
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.ocr_pool import procesos_ocr, repartir_nucleos
+
+
+def test_presupuesto_de_nucleos_se_reparte_entre_workers():
+    assert procesos_ocr({"core_budget": 8}, scraper_workers=3) == 2
+    assert procesos_ocr({"core_budget": 2}, scraper_workers=4) == 1
+    assert procesos_ocr({"core_budget": 8, "procesos": 5}, scraper_workers=3) == 5
+
+
+def test_repartir_nucleos_no_toca_el_config_original():
+    config = {"ocr": {"pool": {"enabled": True, "core_budget": 6}}}
+    repartido = repartir_nucleos(config, 3)
+    assert repartido["ocr"]["pool"]["procesos"] == 2
+    assert "procesos" not in config["ocr"]["pool"]
+    apagado = {"ocr": {"pool": {"enabled": False}}}
+    assert repartir_nucleos(apagado, 3) is apagado
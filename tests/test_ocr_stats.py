@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import time
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.ocr_stats import StrategyStats
+
+
+def test_ordena_por_tasa_de_acierto_y_respeta_el_orden_en_empates():
+    stats = StrategyStats(None)
+    stats.registrar([("a@4.0", "111"), ("b@4.0", "12345"), ("c@4.0", "12345")], "12345")
+    assert stats.ordenar(["a@4.0", "d@4.0", "b@4.0", "c@4.0"]) == ["b@4.0", "c@4.0", "d@4.0", "a@4.0"]
+
+
+def test_historial_persiste_entre_instancias(tmp_path):
+    path = str(tmp_path / "sub" / "estrategias.json")
+    previa = StrategyStats(path)
+    previa.registrar([("a@4.0", "12345"), ("b@6.0", "")], "12345")
+    previa.guardar()
+    stats = StrategyStats(path)
+    assert stats.datos == {"a@4.0": [1, 1], "b@6.0": [0, 1]}
+    assert stats.tasa("a@4.0") > stats.tasa("nueva") > stats.tasa("b@6.0")
+
+
+def test_procesos_que_comparten_el_archivo_no_se_pisan(tmp_path):
+    path = str(tmp_path / "estrategias.json")
+    # Dos workers que arrancan con el mismo historial (vacío) y aprenden cada uno lo suyo
+    uno, otro = StrategyStats(path, guardar_cada=1), StrategyStats(path, guardar_cada=1)
+    uno.registrar([("a@4.0", "12345")], "12345")
+    otro.registrar([("a@4.0", "11111"), ("b@4.0", "12345")], "12345")
+    uno.registrar([("b@4.0", "12345")], "12345")
+    assert StrategyStats(path).datos == {"a@4.0": [1, 2], "b@4.0": [2, 2]}
+
+
+def test_guarda_cada_n_captchas(tmp_path):
+    path = tmp_path / "estrategias.json"
+    stats = StrategyStats(str(path), guardar_cada=3)
+    for _ in range(2):
+        stats.registrar([("a@4.0", "12345")], "12345")
+    assert not path.exists()
+    stats.registrar([("a@4.0", "12345")], "12345")
+    assert StrategyStats(str(path)).datos == {"a@4.0": [3, 3]}
+
+
+def test_guardados_simultaneos_no_pierden_deltas(tmp_path):
+    path = str(tmp_path / "estrategias.json")
+    workers = [StrategyStats(path, guardar_cada=1) for _ in range(4)]
+
+    def _aprender(stats):
+        for _ in range(25):
+            stats.registrar([("a@4.0", "12345")], "12345")
+
+    hilos = [threading.Thread(target=_aprender, args=(s,)) for s in workers]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert StrategyStats(path).datos == {"a@4.0": [100, 100]}
+    assert not os.path.exists(path + ".lock")
+
+
+def test_lock_abandonado_no_traba_el_guardado(tmp_path):
+    path = str(tmp_path / "estrategias.json")
+    lock = path + ".lock"
+    open(lock, "w").close()
+    os.utime(lock, (time.time() - 60, time.time() - 60))  # dejado por un worker que murió
+    stats = StrategyStats(path, guardar_cada=1, lock_viejo_s=30)
+    stats.registrar([("a@4.0", "12345")], "12345")
+    assert StrategyStats(path).datos == {"a@4.0": [1, 1]}
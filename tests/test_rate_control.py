@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.rate_control import RateController
+from src.utils.result_parser import clase_de_falla
+
+
+def _controller(**cfg):
+    base = {"initial_rpm": 20, "min_rpm": 2, "max_rpm": 30, "breaker_threshold": 3, "cooldown_s": 0.2}
+    base.update(cfg)
+    return RateController({"rate_control": base})
+
+
+def test_aimd_sube_de_a_uno_y_baja_a_la_mitad():
+    rate = _controller()
+    rate.registrar(1.0, None)
+    assert rate.estado()["rate_rpm"] == 21
+    rate.registrar(1.0, "lectura")
+    assert rate.estado()["rate_rpm"] == 10.5
+    # Latencia alta sin error también es congestión
+    rate.registrar(60.0, None)
+    assert rate.estado()["rate_rpm"] == 5.25
+
+
+def test_fallas_propias_no_frenan_al_portal():
+    rate = _controller()
+    for _ in range(10):
+        rate.registrar(None, "ocr")
+        rate.registrar(1.0, "captcha")
+    estado = rate.estado()
+    assert estado["rate_rpm"] == 20 and estado["breaker"] == "cerrado"
+
+
+def test_breaker_abre_pausa_y_cierra_con_prueba_ok():
+    rate = _controller()
+    for _ in range(3):
+        rate.registrar(1.0, "sesion")
+    assert rate.estado()["breaker"] == "abierto"
+
+    t0 = time.monotonic()
+    rate.esperar_turno()
+    assert time.monotonic() - t0 >= 0.15
+    assert rate.estado()["breaker"] == "semiabierto"
+
+    rate.registrar(1.0, None)
+    assert rate.estado()["breaker"] == "cerrado"
+    assert not rate.debe_abortar()
+
+
+def test_prueba_que_nunca_informa_deja_pasar_otra():
+    rate = _controller(cooldown_s=0.01, prueba_timeout_s=0.2)
+    for _ in range(3):
+        rate.registrar(1.0, "sesion")
+    rate.esperar_turno()  # el worker de la prueba muere sin llamar a registrar
+    assert rate.estado()["breaker"] == "semiabierto"
+
+    t0 = time.monotonic()
+    rate.esperar_turno()
+    assert 0.15 <= time.monotonic() - t0 < 1.0
+    rate.registrar(1.0, None)
+    assert rate.estado()["breaker"] == "cerrado"
+
+
+def test_aborta_tras_max_trips_aperturas_seguidas():
+    rate = _controller(max_trips=2, cooldown_s=0.01)
+    for _ in range(3):
+        rate.registrar(1.0, "timeout")
+    rate.esperar_turno()
+    rate.registrar(1.0, "timeout")  # la prueba falla: se reabre
+    assert rate.debe_abortar()
+
+
+def test_clase_de_falla():
+    assert clase_de_falla("AI002LB") is None
+    assert clase_de_falla("ERROR_CAPTCHA") == "ocr"
+    assert clase_de_falla("ERROR_CAPTCHA_INCORRECTA", "El código ya utilizado") == "ya_utilizado"
+    assert clase_de_falla("ERROR_CAPTCHA_INCORRECTA", "Código incorrecto") == "captcha"
+    assert clase_de_falla("Error de Sesión") == "sesion"
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.result_cache import ResultCache, resolver_desde_cache
+
+DIA = 86400
+
+
+class _WriterFake:
+    def __init__(self):
+        self.registros = []
+
+    def registrar(self, vin, resultado, dominio="", **meta):
+        self.registros.append((vin, resultado, dominio, meta))
+
+
+def test_ttl_por_resultado(tmp_path):
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    hace_10_dias = time.time() - 10 * DIA
+    cache.guardar("VIN1", "N", "AI002LB", "AI002LB", ahora=hace_10_dias)
+    cache.guardar("VIN2", "N", "Vigente", "", ahora=hace_10_dias)
+    cache.guardar("VIN3", "N", "Vencido", "", ahora=hace_10_dias)
+
+    assert cache.obtener("VIN1", "N") == ("AI002LB", "AI002LB")
+    assert cache.obtener("VIN2", "N") is None  # Vigente dura 7 días
+    assert cache.obtener("VIN3", "N") == ("Vencido", "")
+    assert cache.obtener("VIN1", "I") is None  # la clave incluye el tipo
+    cache.cerrar()
+
+
+def test_errores_nunca_se_guardan(tmp_path):
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    for error in ("ERROR_CAPTCHA", "ERROR_CAPTCHA_INCORRECTA", "Error de Sesión", "Error: timeout"):
+        assert not cache.guardar("VIN1", "N", error)
+    assert cache.obtener("VIN1", "N") is None
+    cache.cerrar()
+
+
+def test_pagina_sin_resultado_no_se_guarda(tmp_path):
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    # "Consultado" = ninguna palabra de resultado en la página (formulario viejo, sesión expirada...)
+    assert not cache.guardar("VIN1", "N", "Consultado")
+    assert cache.obtener("VIN1", "N") is None
+    cache.cerrar()
+
+
+def test_persistencia_y_tasa_de_hits(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    cache = ResultCache(path)
+    cache.guardar("VIN1", "N", "AI002LB", "AI002LB")
+    cache.cerrar()
+
+    cache = ResultCache(path)  # corrida siguiente
+    writer = _WriterFake()
+    pendientes = resolver_desde_cache(cache, ["VIN1", "VIN2"], {"VIN1": "N", "VIN2": "I"}, writer)
+    assert pendientes == ["VIN2"]
+    assert writer.registros == [("VIN1", "AI002LB", "AI002LB", {"tipo": "N", "origen": "cache"})]
+    assert cache.tasa_hits() == 0.5
+    cache.cerrar()
+
+
+def test_writer_guarda_en_cache_lo_consultado(tmp_path):
+    import pandas as pd
+    from src.utils.data_handler import DataHandler
+    from src.utils.journal import ResultWriter
+
+    excel = tmp_path / "recepci_test.xlsx"
+    pd.DataFrame({"Chasis": ["VIN1", "VIN2"], "Nro.Fabr.": ["TPA2000", "TPA1000"]}).to_excel(excel, index=False)
+    handler = DataHandler(str(excel))
+    handler.load_data()
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    writer = ResultWriter(handler, handler.journal, cache=cache)
+    writer.registrar("VIN1", "AI002LB", "AI002LB", tipo="I")
+    writer.registrar("VIN2", "ERROR_CAPTCHA_INCORRECTA", "", tipo="N")
+    writer.cerrar()
+
+    assert cache.obtener("VIN1", "I") == ("AI002LB", "AI002LB")
+    assert cache.obtener("VIN2", "N") is None
+    cache.cerrar()
@@ -0,0 +1,52 @@
+import os
+import sys
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.retry_queue import RetryQueue
+
+
+def _config(**cfg):
+    base = {"backoff_s": 0, "max_attempts": {"captcha": 3, "sesion": 2}}
+    base.update(cfg)
+    return {"retry": base}
+
+
+def test_reintentos_van_despues_de_la_pasada_principal():
+    cola = RetryQueue(["A", "B", "C"], _config())
+    orden = []
+    while cola:
+        vin, intento = cola.siguiente()
+        orden.append((vin, intento))
+        if vin == "A" and intento == 1:
+            assert cola.fallo(vin, "captcha")
+    assert orden == [("A", 1), ("B", 1), ("C", 1), ("A", 2)]
+
+
+def test_intentos_maximos_por_clase():
+    cola = RetryQueue(["A"], _config())
+    vin, _ = cola.siguiente()
+    assert cola.fallo(vin, "sesion")
+    vin, intento = cola.siguiente()
+    assert intento == 2
+    assert not cola.fallo(vin, "sesion")  # agotó sus 2 intentos: el error es definitivo
+    assert not cola
+
+
+def test_clase_no_reintentable_y_recuperados():
+    cola = RetryQueue(["A", "B"], _config())
+    vin, _ = cola.siguiente()
+    assert not cola.fallo(vin, "otro")
+    vin, _ = cola.siguiente()
+    cola.fallo(vin, "captcha")
+    vin, _ = cola.siguiente()
+    cola.exito(vin)
+    assert cola.reintentos == 1 and cola.recuperados == 1
+
+
+def test_deshabilitada_no_reintenta():
+    cola = RetryQueue(["A"], _config(enabled=False))
+    vin, _ = cola.siguiente()
+    assert not cola.fallo(vin, "captcha")
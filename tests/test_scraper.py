@@ -0,0 +1,222 @@
+import copy
+import os
+import sys
+
+import httpx
+import pandas as pd
+from selenium.common.exceptions import StaleElementReferenceException
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.scraper import DnpraScraper, ordenar_por_tipo
+from src.utils.config_loader import load_config
+
+_CONFIG = load_config(os.path.join(project_root, "config", "mis_ajustes.yaml"))
+
+
+def _scraper(tmp_path, monkeypatch, engine="selenium", **secciones):
+    """Scraper real con el YAML del repo, sin tocar data/, logs/ ni la granja Gemini."""
+    monkeypatch.delenv("GEMINI_API_KEYS", raising=False)
+    excel = tmp_path / "recepci_test.xlsx"
+    pd.DataFrame({"Chasis": ["VIN1"], "Nro.Fabr.": ["TPA1000"]}).to_excel(excel, index=False)
+    config = copy.deepcopy(_CONFIG)
+    config["general"].update(input_excel_path=str(excel), engine=engine)
+    config["tracing"]["enabled"] = False
+    config["rate_control"]["enabled"] = False
+    config["retry"]["enabled"] = False
+    config["ocr"].update(dataset={"enabled": False}, memo={"enabled": False})
+    config["driver_pool"]["hot_standby"] = False
+    for seccion, valores in secciones.items():
+        config.setdefault(seccion, {}).update(valores)
+    scraper = DnpraScraper(config)
+    scraper.work_dir = str(tmp_path)
+    return scraper
+
+
+class _HttpQueFalla:
+    ultimo_texto = ""
+    ultima_latencia_s = None
+
+    def consultar(self, vin, tipo="N"):
+        raise ValueError("src de captcha sin coma")
+
+    def close(self):
+        pass
+
+
+def test_error_inesperado_del_motor_http_cae_a_selenium(tmp_path, monkeypatch):
+    scraper = _scraper(tmp_path, monkeypatch, engine="http")
+    scraper.http_engine = _HttpQueFalla()
+    navegaciones = []
+
+    def _navegar(start_url):
+        navegaciones.append(start_url)
+        raise RuntimeError("sin navegador")
+
+    scraper._is_driver_alive = lambda: True
+    scraper._navegar_y_cambiar_iframe = _navegar
+    entregados = []
+    try:
+        procesados = scraper.procesar_vins(["VIN1"], lambda vin, res, dom, **meta: entregados.append((vin, res)))
+    finally:
+        scraper.close()
+
+    assert procesados == 1
+    assert len(navegaciones) == 1
+    assert entregados == [("VIN1", "Error: sin navegador")]
+
+
+class _HttpSinRed(_HttpQueFalla):
+    reinicios = 0
+
+    def consultar(self, vin, tipo="N"):
+        raise httpx.ConnectError("conexión rechazada")
+
+    def reiniciar_sesion(self):
+        self.reinicios += 1
+
+
+def test_error_de_red_http_reinicia_la_sesion_y_cuenta_una_sola_muestra(tmp_path, monkeypatch):
+    scraper = _scraper(tmp_path, monkeypatch, engine="http")
+    scraper.http_engine = _HttpSinRed()
+    muestras = []
+    scraper.rate.registrar = lambda latencia, clase: muestras.append(clase)
+    scraper._is_driver_alive = lambda: True
+
+    def _sin_navegador(start_url):
+        raise RuntimeError("sin navegador")
+
+    scraper._navegar_y_cambiar_iframe = _sin_navegador
+    try:
+        scraper.procesar_vins(["VIN1"], lambda *a, **k: None)
+    finally:
+        scraper.close()
+
+    assert scraper.http_engine.reinicios == 1
+    assert len(muestras) == 1
+
+
+def test_pipeline_precarga_el_proximo_vin_recien_despues_del_envio(tmp_path, monkeypatch):
+    scraper = _scraper(tmp_path, monkeypatch, pipeline={"enabled": True, "preload_next": True})
+    orden = []
+    scraper._is_driver_alive = lambda: True
+    scraper._navegar_y_cambiar_iframe = lambda url: None
+    scraper._usar_tab_precargada = lambda: None
+    scraper._seleccionar_tipo = lambda tipo, selectors: None
+    scraper._vin_y_captcha_pipeline = lambda vin, selectors: True
+    scraper._enviar_formulario = lambda selectors: orden.append("envio") or "boton"
+    scraper._esperar_envio = lambda boton: orden.append("envio_procesado")
+    scraper._precargar_siguiente = lambda url: orden.append("precarga")
+    scraper._esperar_resultado = lambda: orden.append("resultado")
+    scraper._leer_body = lambda: "El certificado se encuentra VIGENTE."
+    try:
+        scraper.procesar_vins(["VIN1", "VIN2"], lambda *a, **k: None)
+    finally:
+        scraper.close()
+
+    assert orden[:4] == ["envio", "envio_procesado", "precarga", "resultado"]
+
+
+class _BotonVivo:
+    """Botón de envío que nunca queda stale: el portal no respondió."""
+
+    def is_enabled(self):
+        return True
+
+
+def test_resultado_que_no_llega_es_timeout_y_se_reintenta(tmp_path, monkeypatch):
+    scraper = _scraper(
+        tmp_path, monkeypatch,
+        retry={"enabled": True, "backoff_s": 0, "max_attempts": {"timeout": 2}},
+        waits={"poll_interval": 0.01, "resultado": 0.05},
+    )
+    scraper._is_driver_alive = lambda: True
+    scraper._navegar_y_cambiar_iframe = lambda url: None
+    scraper._seleccionar_tipo = lambda tipo, selectors: None
+    scraper._ingresar_vin = lambda vin, selectors: None
+    scraper.solve_captcha_step = lambda *a, **k: True
+    scraper._enviar_formulario = lambda selectors: _BotonVivo()
+    # Si se leyera la página igual, saldría "Consultado" como si fuera un resultado
+    scraper._leer_body = lambda: "Su sesión ha expirado."
+    entregados = []
+    try:
+        scraper.procesar_vins(["VIN1"], lambda vin, res, dom, **meta: entregados.append((res, meta["intentos"])))
+    finally:
+        scraper.close()
+
+    assert entregados == [("Error Lectura", 2)]
+    assert scraper.waits.vencidas["resultado_envio"] == 2
+
+
+def test_ordenar_por_tipo_agrupa_y_respeta_el_orden():
+    tipos = {"A": "N", "B": "I", "C": "N", "D": "I"}
+    assert ordenar_por_tipo(["A", "B", "C", "D", "E"], tipos) == ["B", "D", "A", "C", "E"]
+
+
+class _Radio:
+    def __init__(self, marcado):
+        self.marcado = marcado
+        self.clicks = 0
+
+    def is_selected(self):
+        return self.marcado
+
+    def click(self):
+        self.clicks += 1
+
+    def is_enabled(self):
+        # Tras el click el formulario se recarga: el radio viejo queda stale
+        if self.clicks:
+            raise StaleElementReferenceException("recargado")
+        return True
+
+
+class _Driver:
+    def execute_script(self, script, *args):
+        return "complete"
+
+
+class _Wait:
+    def __init__(self, radio):
+        self.radio = radio
+
+    def until(self, condicion):
+        return self.radio
+
+
+def test_radio_ya_marcado_se_reutiliza_sin_click(tmp_path, monkeypatch):
+    scraper = _scraper(tmp_path, monkeypatch)
+    selectors = scraper.config["selectors"]["certificado_form"]
+    scraper.driver = _Driver()
+    try:
+        marcado = _Radio(marcado=True)
+        scraper.wait = _Wait(marcado)
+        scraper._marcar_radio("N", selectors)
+        assert marcado.clicks == 0 and scraper.radio_reutilizado == 1
+
+        otro_tipo = _Radio(marcado=False)
+        scraper.wait = _Wait(otro_tipo)
+        scraper._marcar_radio("I", selectors)
+        assert otro_tipo.clicks == 1 and scraper.radio_reutilizado == 1
+        assert scraper.waits.vencidas.get("radio_recarga", 0) == 0
+    finally:
+        scraper.driver = None
+        scraper.close()
+
+
+def test_limpieza_de_chromedrivers_solo_en_el_primer_arranque(tmp_path, monkeypatch):
+    scraper = _scraper(tmp_path, monkeypatch)
+    limpiezas = []
+    monkeypatch.setattr("src.scraper.kill_stray_chromedrivers", lambda timeout=2: limpiezas.append(timeout))
+    scraper.driver_manager.obtener = lambda: _Driver()
+    try:
+        scraper.init_driver()
+        # Re-arranque tras una sesión caída con el motor HTTP (driver None → init_driver)
+        scraper.driver = None
+        scraper._reset_driver()
+    finally:
+        scraper.driver = None
+        scraper.close()
+    assert len(limpiezas) == 1
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils import tracing
+
+
+def test_registro_por_vin_y_resumen(tmp_path):
+    tracer = tracing.Tracer(str(tmp_path / "logs" / "trace.jsonl"))
+    tracing.set_tracer(tracer)
+    try:
+        for i, vin in enumerate(["VIN1", "VIN2", "VIN3"]):
+            tracer.iniciar_vin(vin, tipo="N")
+            with tracing.span("navegar"):
+                pass
+            with tracing.span("ocr.gemini"):
+                pass
+            with tracing.span("ocr.gemini"):
+                pass
+            tracing.anotar(tier="gemini")
+            tracing.contar("captcha_reintentos", i)
+            tracer.finalizar_vin("AI002LB" if i else "ERROR_CAPTCHA_INCORRECTA", "AI002LB" if i else "")
+    finally:
+        tracing.set_tracer(None)
+
+    with open(tracer.path, encoding="utf-8") as f:
+        registros = [json.loads(l) for l in f]
+    assert [r["vin"] for r in registros] == ["VIN1", "VIN2", "VIN3"]
+    assert set(registros[0]["etapas"]) == {"navegar", "ocr.gemini"}
+    assert registros[2]["conteos"]["captcha_reintentos"] == 2
+    assert registros[1]["tier"] == "gemini"
+
+    resumen = tracing.resumir(tracing.leer_trazas([str(tmp_path / "logs" / "*.jsonl")]))
+    assert resumen["vins"] == 3
+    assert resumen["etapas"]["ocr.gemini"]["n"] == 3
+    assert resumen["resultados"] == {"ERROR_CAPTCHA_INCORRECTA": 1, "OK": 2}
+    assert resumen["tiers"] == {"gemini": 3}
+
+
+def test_sin_tracer_no_hace_nada():
+    tracing.set_tracer(None)
+    with tracing.span("navegar"):
+        tracing.anotar(tier="easyocr")
+        tracing.contar("x")
+    assert tracing.get_tracer().finalizar_vin("Vigente") is None
+
+
+def test_resumen_sugiere_delay_del_hedge():
+    registros = [
+        {"vin": f"V{i}", "inicio": i, "fin": i + 1, "total_s": 1.0, "gemini_s": s}
+        for i, s in enumerate([1.0, 1.2, 1.1, 0.9, 6.0])
+    ]
+    registros[4]["hedge_ganador"] = "easyocr"
+    hedge = tracing.resumir(registros)["hedge"]
+    assert hedge["gemini_p50"] == 1.1
+    assert hedge["delay_sugerido_s"] == 6.0
+    assert hedge["ganadores"] == {"easyocr": 1}
+
+
+def test_anotacion_tardia_de_otro_hilo_cae_en_su_vin(tmp_path):
+    import threading
+
+    tracer = tracing.Tracer(str(tmp_path / "trace.jsonl"))
+    tracing.set_tracer(tracer)
+    seguir = threading.Event()
+
+    def _ocr_cancelado():
+        seguir.wait(5)
+        tracing.anotar(easyocr_modo="completo")  # llega cuando el VIN1 ya terminó
+
+    try:
+        tracer.iniciar_vin("VIN1")
+        with tracing.span("ocr.easyocr"):
+            hilo = threading.Thread(target=tracing.ligar(_ocr_cancelado))
+            hilo.start()
+        vin1 = tracer.finalizar_vin("Vigente")
+        tracer.iniciar_vin("VIN2")
+        seguir.set()
+        hilo.join()
+        vin2 = tracer.finalizar_vin("Vigente")
+    finally:
+        tracing.set_tracer(None)
+    assert "easyocr_modo" not in vin2
+    assert vin1["easyocr_modo"] == "completo"
+
+
+def test_glob_sin_trazas_no_falla(tmp_path):
+    assert tracing.leer_trazas([str(tmp_path / "trace_*.jsonl")]) == []
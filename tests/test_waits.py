@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.waits import WaitEngine, poll_until
+
+
+def _engine(**timeouts):
+    return WaitEngine({"waits": {"poll_interval": 0.01, **timeouts}})
+
+
+def test_poll_until_toma_excepciones_como_todavia_no():
+    intentos = []
+
+    def _condicion():
+        intentos.append(1)
+        if len(intentos) < 3:
+            raise RuntimeError("DOM a mitad de carga")
+        return "listo"
+
+    assert poll_until(_condicion, timeout=1, intervalo=0.01) == "listo"
+    assert poll_until(lambda: 0, timeout=0.05, intervalo=0.01) is None
+
+
+def test_until_registra_duraciones_y_timeouts():
+    waits = _engine(captcha=0.05)
+    assert waits.until("captcha", lambda: "data:image/png") == "data:image/png"
+    assert waits.until("captcha", lambda: None) is None
+    resumen = waits.resumen()["captcha"]
+    assert resumen["n"] == 2 and resumen["timeouts"] == 1
+    assert resumen["max"] >= 0.05
+
+
+def test_exigir_levanta_timeout():
+    waits = _engine(resultado=0.05)
+    assert waits.exigir("resultado", lambda: True) is True
+    with pytest.raises(TimeoutException):
+        waits.exigir("resultado", lambda: False)
+    assert waits.vencidas == {"resultado": 1}
@@ -0,0 +1,101 @@
+import os
+import queue
+import sys
+import threading
+
+import pandas as pd
+
+# Añadir raíz al path para poder importar módulos de src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from src.utils.journal import ResultWriter
+from src.worker_pool import WorkerPool
+
+
+class _ProcesoFake:
+    """Worker simulado con un hilo: manda sus resultados por la cola como el proceso real."""
+
+    def __init__(self, worker_id, vins, cola, avisa_fin=True):
+        self.exitcode = None if avisa_fin else -9
+        self._hilo = threading.Thread(target=self._correr, args=(worker_id, vins, cola, avisa_fin))
+        self._hilo.start()
+
+    def _correr(self, worker_id, vins, cola, avisa_fin):
+        for vin in vins:
+            cola.put(("resultado", worker_id, vin, "Vigente", "", {"worker": worker_id}))
+        if avisa_fin:
+            cola.put(("fin", worker_id, len(vins), 1.0))
+
+    def is_alive(self):
+        return self._hilo.is_alive()
+
+
+def _pool(tmp_path, vins):
+    excel = tmp_path / "recepci_test.xlsx"
+    pd.DataFrame({"Chasis": vins, "Nro.Fabr.": ["TPA1000"] * len(vins)}).to_excel(excel, index=False)
+    return WorkerPool({"general": {"input_excel_path": str(excel)}}, workers=2)
+
+
+def test_shard_round_robin_balanceado():
+    assert WorkerPool.shard(list("abcdefg"), 3) == [["a", "d", "g"], ["b", "e"], ["c", "f"]]
+    # Más workers que VINs: los lotes sobrantes quedan vacíos (run() limita n a len(vins))
+    assert WorkerPool.shard(["a", "b"], 4) == [["a"], ["b"], [], []]
+
+
+def test_coordinador_es_el_unico_escritor(tmp_path):
+    vins = [f"VIN{i}" for i in range(6)]
+    pool = _pool(tmp_path, vins)
+    pool.data_handler.load_data()
+    writer = ResultWriter(pool.data_handler, pool.data_handler.journal, save_every=100)
+    cola = queue.Queue()
+    procesos = [_ProcesoFake(i, lote, cola) for i, lote in enumerate(pool.shard(vins, 2), start=1)]
+
+    stats = pool._recolectar(cola, procesos, writer, espera_s=0.05)
+    writer.cerrar()
+
+    assert stats == {1: {"vins": 3, "segundos": 1.0}, 2: {"vins": 3, "segundos": 1.0}}
+    df = pd.read_excel(pool.data_handler.output_path)
+    assert df["Resultado DNPRA"].tolist() == ["Vigente"] * 6
+    # Todo llegó al Excel: el journal quedó compactado
+    assert pool.data_handler.journal.leer() == {}
+
+
+def test_worker_que_muere_sin_fin_no_cuelga_al_coordinador(tmp_path):
+    pool = _pool(tmp_path, ["VIN1", "VIN2"])
+    pool.data_handler.load_data()
+    writer = ResultWriter(pool.data_handler, pool.data_handler.journal, save_every=100)
+    cola = queue.Queue()
+    procesos = [_ProcesoFake(1, ["VIN1"], cola), _ProcesoFake(2, ["VIN2"], cola, avisa_fin=False)]
+
+    stats = pool._recolectar(cola, procesos, writer, espera_s=0.05)
+    writer.cerrar()
+
+    assert stats[1]["vins"] == 1
+    assert stats[2]["vins"] == 0
+    # Lo que alcanzó a mandar antes de morir igual quedó guardado
+    df = pd.read_excel(pool.data_handler.output_path)
+    assert df["Resultado DNPRA"].tolist() == ["Vigente", "Vigente"]
+
+
+class _LlavesFake:
+    def __init__(self):
+        self.guardados = 0
+
+    def guardar(self):
+        self.guardados += 1
+
+
+def test_estado_de_la_granja_no_se_guarda_por_cada_vin(tmp_path):
+    vins = [f"VIN{i}" for i in range(6)]
+    pool = _pool(tmp_path, vins)
+    pool.data_handler.load_data()
+    writer = ResultWriter(pool.data_handler, pool.data_handler.journal, save_every=100)
+    cola = queue.Queue()
+    llaves = _LlavesFake()
+    procesos = [_ProcesoFake(i, lote, cola) for i, lote in enumerate(pool.shard(vins, 2), start=1)]
+
+    pool._recolectar(cola, procesos, writer, llaves, espera_s=0.05)
+    writer.cerrar()
+    # Dentro del intervalo (30s por defecto) no hay escrituras: run() guarda una vez al final
+    assert llaves.guardados == 0